@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Simulador de Arduino Mega para BikeJJ
+Cria uma porta serial virtual (pseudo-terminal) e envia exatamente as mesmas
+mensagens de arduino_sketch.ino, com ciclistas sintéticos configuráveis.
+Usado para testes de longa duração (soak) sem hardware.
+
+Uso:
+    python arduino_simulator.py --riders 4 --rpm 90 --profile interval --configure
+    python arduino_simulator.py --rider 1:sprint:120 --rider 2:steady:70:0.1 --duration 3600
+    python arduino_simulator.py --replay capturas/capture-*.bjcap.gz --configure --replay-delay 3
+
+Com --configure a porta virtual é gravada em serial_config.json e o servidor
+(que monitora o arquivo) conecta sozinho, como se fosse um Mega real.
+"""
+
+import argparse
+import errno
+import heapq
+import json
+import math
+import os
+import pty
+import random
+import sys
+import time
+import tty
+
+# Mesmas constantes do arduino_sketch.ino
+NUM_PLAYERS = 4
+READINGS_PER_PEDAL = 4
+PARTIAL_REPORT_EVERY = 0  # 0 = sem leituras parciais (padrão do sketch)
+STATS_INTERVAL = 1.0  # "📈 J<n>: <N> pedaladas total" a cada segundo
+MILLIS_WRAP = 2 ** 32  # millis() do Arduino é unsigned long
+
+CONFIG_FILE = 'serial_config.json'
+PROFILES = ('steady', 'sprint', 'interval', 'random')
+
+class Rider:
+    """Ciclista sintético: gera leituras do sensor Hall conforme um perfil de cadência"""
+
+    def __init__(self, player, profile='steady', rpm=90.0, noise=0.05, dropout=0.0, seed=None,
+                 partial_every=PARTIAL_REPORT_EVERY):
+        self.player = player
+        self.profile = profile
+        self.base_rpm = rpm
+        self.noise = noise  # Desvio padrão relativo do intervalo entre leituras
+        self.dropout = dropout  # Probabilidade por segundo de o ciclista parar de pedalar
+        self.partial_every = partial_every  # Leitura parcial a cada N leituras (0 = nunca)
+        self.rng = random.Random(seed)
+        self.pedal_count = 0
+        self.current_readings = 0
+        self.paused_until = 0.0
+        self.drift = 1.0
+
+    def rpm_at(self, elapsed):
+        if self.profile == 'sprint':
+            # Rampa de 40% a 130% da cadência base em ciclos de 20s
+            return self.base_rpm * (0.4 + 0.9 * ((elapsed % 20.0) / 20.0))
+        if self.profile == 'interval':
+            # 30s forte, 15s parado
+            return self.base_rpm * 1.2 if elapsed % 45.0 < 30.0 else 0.0
+        if self.profile == 'random':
+            # Passeio aleatório lento em torno da cadência base
+            self.drift = min(1.5, max(0.3, self.drift + self.rng.gauss(0, 0.02)))
+            return self.base_rpm * self.drift
+        return self.base_rpm
+
+    def next_reading_delay(self, now, elapsed):
+        """Tempo até a próxima leitura do sensor (ou até voltar de uma pausa)"""
+        if now < self.paused_until:
+            return self.paused_until - now
+
+        rpm = self.rpm_at(elapsed)
+        if rpm <= 0:
+            return 0.25
+        interval = 60.0 / rpm / READINGS_PER_PEDAL
+        delay = max(0.002, self.rng.gauss(interval, interval * self.noise))
+        # dropout é por segundo: chance de a pausa começar dentro deste intervalo entre leituras
+        if self.dropout and self.rng.random() < 1.0 - (1.0 - min(self.dropout, 1.0)) ** delay:
+            self.paused_until = now + self.rng.uniform(2.0, 8.0)
+            return self.paused_until - now
+        return delay
+
+    def reading(self):
+        """Uma passagem do ímã pelo sensor; retorna as linhas que o sketch enviaria"""
+        lines = []
+        self.current_readings += 1
+        if (self.partial_every > 0 and self.current_readings < READINGS_PER_PEDAL
+                and self.current_readings % self.partial_every == 0):
+            lines.append(f"📊 J{self.player}: Leitura {self.current_readings}/{READINGS_PER_PEDAL} (parcial)")
+        if self.current_readings >= READINGS_PER_PEDAL:
+            self.pedal_count += 1
+            self.current_readings = 0
+            lines.append(f"🔍 J{self.player}:{self.pedal_count}")
+        return lines
+
+class VirtualMega:
+    """Pseudo-terminal que se comporta como a serial USB do Arduino Mega"""
+
+    def __init__(self, link=None):
+        self.master, self.slave = pty.openpty()
+        tty.setraw(self.slave)
+        os.set_blocking(self.master, False)
+        self.port = os.ttyname(self.slave)
+        self.link = link
+        if link:
+            if os.path.islink(link):
+                os.unlink(link)
+            os.symlink(self.port, link)
+        self.lines_written = 0
+        self.bytes_written = 0
+        self.bytes_dropped = 0
+
+    def write_line(self, line):
+        if self.write_raw((line + "\r\n").encode('utf-8')):  # Serial.println termina com CRLF
+            self.lines_written += 1
+
+    def write_raw(self, data):
+        try:
+            written = os.write(self.master, data)
+            self.bytes_written += written
+            self.bytes_dropped += len(data) - written
+            return True
+        except BlockingIOError:
+            # Ninguém lendo a porta: o buffer encheu e a USB descarta, como no Mega
+            self.bytes_dropped += len(data)
+        except OSError as e:
+            if e.errno != errno.EIO:
+                raise
+            self.bytes_dropped += len(data)
+        return False
+
+    def drain_input(self):
+        # Descartar o que o host escrever na porta (o sketch não lê a serial)
+        try:
+            while os.read(self.master, 4096):
+                pass
+        except (BlockingIOError, OSError):
+            pass
+
+    def close(self):
+        if self.link and os.path.islink(self.link):
+            os.unlink(self.link)
+        os.close(self.master)
+        os.close(self.slave)
+
+def parse_rider(spec, defaults):
+    """Formato: jogador[:perfil[:rpm[:ruído[:dropout]]]] (ex.: 2:sprint:120:0.1)"""
+    parts = spec.split(':')
+    values = [int(parts[0]), defaults.profile, defaults.rpm, defaults.noise, defaults.dropout]
+    for i, part in enumerate(parts[1:], start=1):
+        if part:
+            values[i] = part if i == 1 else float(part)
+    if not 1 <= values[0] <= NUM_PLAYERS:
+        raise argparse.ArgumentTypeError(f"jogador deve ser 1-{NUM_PLAYERS}: {spec}")
+    if values[1] not in PROFILES:
+        raise argparse.ArgumentTypeError(f"perfil inválido: {values[1]} (use {', '.join(PROFILES)})")
+    return values
+
+def write_serial_config(port):
+    """Apontar o servidor para a porta virtual (gravação atômica, o servidor recarrega sozinho)"""
+    tmp_path = f"{CONFIG_FILE}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({'serial_port': port}, f)
+    os.replace(tmp_path, CONFIG_FILE)
+    print(f"💾 {CONFIG_FILE} atualizado para {port}")
+
+def run(args):
+    mega = VirtualMega(args.link)
+    riders = []
+    specs = args.rider or [f"{player}" for player in range(1, args.riders + 1)]
+    for spec in specs:
+        player, profile, rpm, noise, dropout = parse_rider(spec, args)
+        seed = None if args.seed is None else args.seed + player
+        riders.append(Rider(player, profile, rpm, noise, dropout, seed, args.partial_every))
+
+    print(f"🤖 Arduino Mega virtual em {mega.port}" + (f" (link: {args.link})" if args.link else ""))
+    for rider in riders:
+        print(f"   🚴 J{rider.player}: {rider.profile}, {rider.base_rpm:g} rpm, ruído {rider.noise:g}, dropout {rider.dropout:g}/s")
+    if args.configure:
+        write_serial_config(args.link or mega.port)
+    print("🛑 Pressione Ctrl+C para parar\n")
+
+    start = time.monotonic()
+
+    def stamp(line, event_time):
+        # Sufixo " @<millis()>" do sketch, com a deriva do ressonador da placa
+        if args.no_timestamps:
+            return line
+        millis = int((event_time - start) * (1 + args.clock_drift / 1e6) * 1000 + args.millis_start)
+        return f"{line} @{millis % MILLIS_WRAP}"
+
+    events = [(start + rider.next_reading_delay(start, 0.0), i) for i, rider in enumerate(riders)]
+    heapq.heapify(events)
+    next_stats = start + STATS_INTERVAL
+    next_report = start + args.report_every
+
+    try:
+        while True:
+            now = time.monotonic()
+            elapsed = now - start
+            if args.duration and elapsed >= args.duration:
+                break
+
+            # Próximo evento: leitura de algum ciclista ou o resumo de 1s do sketch
+            next_event = min(events[0][0] if events else math.inf, next_stats)
+            if next_event > now:
+                time.sleep(min(next_event - now, 0.05))
+                mega.drain_input()
+                continue
+
+            if next_stats <= now:
+                for rider in sorted(riders, key=lambda r: r.player):
+                    if rider.pedal_count > 0:
+                        mega.write_line(stamp(f"📈 J{rider.player}: {rider.pedal_count} pedaladas total", next_stats))
+                next_stats += STATS_INTERVAL
+
+            while events and events[0][0] <= now:
+                event_time, i = heapq.heappop(events)
+                rider = riders[i]
+                if now >= rider.paused_until:
+                    for line in rider.reading():
+                        if args.line_loss and rider.rng.random() < args.line_loss:
+                            continue  # Linha perdida (ruído elétrico na serial)
+                        mega.write_line(stamp(line, event_time))
+                heapq.heappush(events, (now + rider.next_reading_delay(now, elapsed), i))
+
+            if args.report_every and now >= next_report:
+                next_report += args.report_every
+                pedals = ' '.join(f"J{r.player}={r.pedal_count}" for r in riders)
+                print(f"📡 {elapsed:7.0f}s | {mega.lines_written} linhas | {mega.bytes_written} bytes | "
+                      f"{mega.bytes_dropped} descartados | {pedals}")
+    except KeyboardInterrupt:
+        print("\n🛑 Simulador interrompido")
+    finally:
+        mega.close()
+
+def replay(args):
+    """Reproduzir capturas do serial_monitor.py com o mesmo ritmo de chegada dos bytes"""
+    from serial_monitor import read_capture
+
+    mega = VirtualMega(args.link)
+    print(f"🤖 Arduino Mega virtual em {mega.port}" + (f" (link: {args.link})" if args.link else ""))
+    if args.configure:
+        write_serial_config(args.link or mega.port)
+    if args.replay_delay:
+        print(f"⏳ Aguardando {args.replay_delay:g}s para o servidor conectar...")
+        time.sleep(args.replay_delay)
+
+    try:
+        for path in args.replay:
+            header, chunks = read_capture(path)
+            print(f"▶️ Reproduzindo {path} ({header['port']}, velocidade {args.speed:g}x)")
+            start = time.monotonic()
+            for offset, data in chunks:
+                delay = start + offset / args.speed - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                mega.write_raw(data)
+                mega.drain_input()
+            print(f"⏹️ {path}: {mega.bytes_written} bytes enviados, {mega.bytes_dropped} descartados")
+    except KeyboardInterrupt:
+        print("\n🛑 Replay interrompido")
+    finally:
+        mega.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Arduino Mega virtual para testes do BikeJJ")
+    parser.add_argument('--riders', type=int, default=NUM_PLAYERS, help="ciclistas padrão (J1..Jn)")
+    parser.add_argument('--rider', action='append', metavar='J[:PERFIL[:RPM[:RUÍDO[:DROPOUT]]]]',
+                        help="ciclista específico (pode repetir); substitui --riders")
+    parser.add_argument('--profile', choices=PROFILES, default='steady')
+    parser.add_argument('--rpm', type=float, default=90.0)
+    parser.add_argument('--noise', type=float, default=0.05, help="desvio relativo entre leituras")
+    parser.add_argument('--dropout', type=float, default=0.0, help="chance por segundo de pausa de 2-8s")
+    parser.add_argument('--partial-every', type=int, default=PARTIAL_REPORT_EVERY,
+                        help="leitura parcial a cada N leituras, como PARTIAL_REPORT_EVERY do sketch (0 = nunca)")
+    parser.add_argument('--line-loss', type=float, default=0.0, help="fração de linhas perdidas na serial")
+    parser.add_argument('--duration', type=float, default=0, help="segundos (0 = até Ctrl+C)")
+    parser.add_argument('--report-every', type=float, default=10.0, help="intervalo do resumo no console")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--clock-drift', type=float, default=0.0, help="deriva do relógio da placa (ppm)")
+    parser.add_argument('--millis-start', type=int, default=0,
+                        help="millis() inicial da placa (ex.: 4294900000 para testar a virada)")
+    parser.add_argument('--no-timestamps', action='store_true', help="formato antigo, sem o sufixo @millis")
+    parser.add_argument('--link', help="criar um symlink estável para a porta (ex.: /tmp/ttyBIKEJJ)")
+    parser.add_argument('--configure', action='store_true', help=f"gravar a porta em {CONFIG_FILE}")
+    parser.add_argument('--replay', nargs='+', metavar='CAPTURA',
+                        help="reproduzir capturas do serial_monitor.py em vez de ciclistas sintéticos")
+    parser.add_argument('--speed', type=float, default=1.0, help="velocidade do replay (2 = dobro)")
+    parser.add_argument('--replay-delay', type=float, default=0.0,
+                        help="segundos de espera antes do replay (tempo para o servidor abrir a porta)")
+    args = parser.parse_args()
+
+    if args.riders < 1 or args.riders > NUM_PLAYERS:
+        parser.error(f"--riders deve ser 1-{NUM_PLAYERS}")
+    if args.replay:
+        replay(args)
+    else:
+        run(args)
+
+if __name__ == "__main__":
+    if os.name == 'nt':
+        print("❌ O simulador usa pseudo-terminais e só funciona no Linux/macOS")
+        sys.exit(1)
+    main()
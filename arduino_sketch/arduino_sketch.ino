@@ -5,6 +5,9 @@
  * J3: Pino 44 - Sensor Hall
  * J4: Pino 48 - Sensor Hall
  * Performance máxima para sensores magnéticos
+ *
+ * Toda linha termina com " @<millis()>" do instante do evento: o servidor
+ * alinha esse relógio ao dele e ignora o atraso da serial nos tempos do jogo.
  */
 
 // Configuração dos pinos dos jogadores
@@ -16,6 +19,7 @@ const int DEBOUNCE_DELAY = 0; // ZERO debounce para máxima velocidade
 int pedalCount[4] = {0, 0, 0, 0};
 int currentReadings[4] = {0, 0, 0, 0};
 const int READINGS_PER_PEDAL = 4; // 4 leituras = 1 pedalada (otimizado para 10 pedaladas/seg)
+const int PARTIAL_REPORT_EVERY = 0; // Enviar leitura parcial a cada N leituras (0 = desligado; 1 com partial_energy no servidor)
 
 // Estados para cada jogador
 bool lastState[4] = {HIGH, HIGH, HIGH, HIGH};
@@ -63,15 +67,18 @@ void loop() {
         currentReadings[player]++;
         readingsPerSecond[player]++;
         
-        // Mostrar leitura parcial apenas a cada 4 leituras para máxima performance
-        if (currentReadings[player] % 4 == 0) {
+        // Mostrar leituras parciais da pedalada em andamento (a leitura que completa
+        // a pedalada já é anunciada pela linha "🔍 J<n>:")
+        if (PARTIAL_REPORT_EVERY > 0 && currentReadings[player] < READINGS_PER_PEDAL &&
+            currentReadings[player] % PARTIAL_REPORT_EVERY == 0) {
           Serial.print("📊 J");
           Serial.print(player + 1);
           Serial.print(": Leitura ");
           Serial.print(currentReadings[player]);
           Serial.print("/");
           Serial.print(READINGS_PER_PEDAL);
-          Serial.println(" (parcial)");
+          Serial.print(" (parcial) @");
+          Serial.println(currentTime);
         }
         
         // Verificar se completou uma pedalada
@@ -92,7 +99,9 @@ void loop() {
           Serial.print("🔍 J");
           Serial.print(player + 1);
           Serial.print(":");
-          Serial.println(pedalCount[player]);
+          Serial.print(pedalCount[player]);
+          Serial.print(" @");
+          Serial.println(currentTime);
         }
       }
     }
@@ -124,7 +133,8 @@ void loop() {
         Serial.print(player + 1);
         Serial.print(": ");
         Serial.print(pedalCount[player]);
-        Serial.println(" pedaladas total");
+        Serial.print(" pedaladas total @");
+        Serial.println(currentTime);
       }
       readingsPerSecond[player] = 0;
     }
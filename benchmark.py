@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Benchmarks do BikeJJ
+Mede o custo dos caminhos quentes do servidor sem precisar de Arduino
+
+Uso:
+    python benchmark.py energy [--players 4 32 256] [--ticks 2000]
+    python benchmark.py pedal [--events 2000] [--batch-sizes 10 50 200]
+    python benchmark.py state [--updates 5000]
+    python benchmark.py keepalive [--requests 2000] [--clients 4]
+"""
+
+import argparse
+import contextlib
+import http.client
+import io
+import json
+import random
+import threading
+import time
+
+import server
+
+@contextlib.contextmanager
+def running_server():
+    """Servidor HTTP do BikeJJ em uma porta livre, com os logs (stdout e access log) descartados"""
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        httpd = server.BikeJJHTTPServer(("127.0.0.1", 0), server.BikeJJHTTPHandler)
+        thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+        thread.start()
+        try:
+            yield httpd.server_address[1]
+        finally:
+            httpd.shutdown()
+            httpd.server_close()
+
+def post_json(port, path, payload):
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    body = json.dumps(payload)
+    conn.request('POST', path, body=body, headers={'Content-Type': 'application/json'})
+    response = conn.getresponse()
+    response.read()
+    conn.close()
+    return response.status
+
+def python_energy_tick(energy, pending_gain, is_pedaling, last_pedal_time, now, decay_amount, decay_due):
+    """Mesma lógica do motor NumPy em laços Python (referência, sem logs)"""
+    winner = -1
+    for i in range(len(energy)):
+        energy[i] += pending_gain[i]
+        pending_gain[i] = 0.0
+        if is_pedaling[i] and last_pedal_time[i] > 0 and now - last_pedal_time[i] > server.PEDALING_TIMEOUT:
+            is_pedaling[i] = False
+        if decay_due and not is_pedaling[i]:
+            energy[i] -= decay_amount
+        energy[i] = max(0.0, min(100.0, energy[i]))
+        if winner < 0 and energy[i] >= 100:
+            winner = i
+    return winner
+
+def make_pedal_events(num_players, ticks, seed=42):
+    """Pedaladas aleatórias por tick (~30% dos jogadores pedalando a cada tick)"""
+    rng = random.Random(seed)
+    return [[p for p in range(num_players) if rng.random() < 0.3] for _ in range(ticks)]
+
+def bench_python(num_players, events, gain, decay_rate):
+    energy = [0.0] * num_players
+    pending_gain = [0.0] * num_players
+    is_pedaling = [False] * num_players
+    last_pedal_time = [0.0] * num_players
+    now = 1000.0
+    decay_amount = decay_rate * server.DECAY_INTERVAL
+    
+    start = time.perf_counter()
+    for tick, pedals in enumerate(events):
+        now += server.ENGINE_TICK_INTERVAL
+        for p in pedals:
+            pending_gain[p] += gain
+            is_pedaling[p] = True
+            last_pedal_time[p] = now
+        python_energy_tick(energy, pending_gain, is_pedaling, last_pedal_time, now, decay_amount, tick % 25 == 0)
+    return time.perf_counter() - start
+
+def bench_numpy(num_players, events, gain, decay_rate):
+    engine = server.NumpyEnergyEngine(num_players)
+    now = 1000.0
+    engine.last_decay_time = now
+    
+    start = time.perf_counter()
+    for pedals in events:
+        now += server.ENGINE_TICK_INTERVAL
+        for p in pedals:
+            engine.pedal(p, now, gain)
+        engine.tick(now, decay_rate, False)
+    return time.perf_counter() - start
+
+def bench_current_server(ticks):
+    """apply_energy_decay() do servidor (4 jogadores fixos, com logs descartados)"""
+    calls = 0
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(ticks):
+            server.last_decay_time = 0  # Forçar o decaimento em todos os ticks
+            server.apply_energy_decay()
+            calls += 1
+    return time.perf_counter() - start
+
+def run_energy(args):
+    gain = server.DEFAULT_ENERGY_GAIN
+    decay_rate = server.DEFAULT_ENERGY_DECAY
+    
+    print(f"⚡ Motor de energia - {args.ticks} ticks por cenário")
+    print(f"{'Jogadores':>10} {'Python (µs/tick)':>18} {'NumPy (µs/tick)':>17} {'Ganho':>8}")
+    for num_players in args.players:
+        events = make_pedal_events(num_players, args.ticks)
+        python_time = bench_python(num_players, events, gain, decay_rate)
+        python_us = python_time / args.ticks * 1e6
+        if server.np is None:
+            print(f"{num_players:>10} {python_us:>18.1f} {'(sem NumPy)':>17} {'-':>8}")
+            continue
+        numpy_time = bench_numpy(num_players, events, gain, decay_rate)
+        numpy_us = numpy_time / args.ticks * 1e6
+        print(f"{num_players:>10} {python_us:>18.1f} {numpy_us:>17.1f} {python_time / numpy_time:>7.1f}x")
+    
+    current_us = bench_current_server(args.ticks) / args.ticks * 1e6
+    print(f"\n📋 apply_energy_decay() atual (4 jogadores, com logs): {current_us:.1f} µs/tick")
+
+def reset_game_for_benchmark():
+    # Ganho zero: ninguém vence no meio da medição (pedaladas congeladas custariam menos)
+    server.set_game_config({**server.game_config, 'energy_gain_rate': 0.0})
+    server.game_state['game_frozen'] = False
+    server.game_state['winner_player'] = 0
+    server.reset_players()
+
+def run_pedal(args):
+    print(f"🚴 Ingestão de pedaladas via HTTP - {args.events} eventos por cenário")
+    results = []
+    with running_server() as port:
+        reset_game_for_benchmark()
+        start = time.perf_counter()
+        for i in range(args.events):
+            post_json(port, '/api/pedal', {'player': i % 4 + 1})
+        results.append(('/api/pedal', args.events, time.perf_counter() - start))
+        
+        for batch_size in args.batch_sizes:
+            reset_game_for_benchmark()
+            requests = 0
+            start = time.perf_counter()
+            for offset in range(0, args.events, batch_size):
+                events = [{'player': i % 4 + 1, 'count': 1, 'ts': i}
+                          for i in range(offset, min(offset + batch_size, args.events))]
+                post_json(port, '/api/pedal/batch', {'events': events})
+                requests += 1
+            results.append((f"/api/pedal/batch ×{batch_size}", requests, time.perf_counter() - start))
+    
+    single_time = results[0][2]
+    print(f"{'Modo':>22} {'Requisições':>12} {'µs/evento':>10} {'Ganho':>8}")
+    for label, requests, elapsed in results:
+        print(f"{label:>22} {requests:>12} {elapsed / args.events * 1e6:>10.1f} {single_time / elapsed:>7.1f}x")
+
+def make_state_updates(updates, seed=42):
+    """Sequência de estados de uma partida (4 jogadores pedalando em ritmos diferentes)"""
+    rng = random.Random(seed)
+    state = json.loads(json.dumps(server.game_state))
+    states = []
+    for _ in range(updates):
+        for i in range(4):
+            if rng.random() < 0.6:
+                state[f'player{i + 1}_energy'] = min(100.0, state[f'player{i + 1}_energy'] + rng.uniform(0.5, 2.0))
+                state['pedal_count'][i] += 1
+                state['is_pedaling'][i] = True
+                state['last_pedal_time'][i] = time.time()
+                state['rpm'][i] = state['rpm_avg'][i] = round(rng.uniform(60, 140), 1)
+                state['power_watts'][i] = round(rng.uniform(100, 300), 1)
+            else:
+                state[f'player{i + 1}_energy'] = max(0.0, state[f'player{i + 1}_energy'] - 2.5)
+                state['is_pedaling'][i] = False
+        states.append(json.loads(json.dumps(state)))
+    return states
+
+def run_state(args):
+    states = make_state_updates(args.updates)
+    
+    def json_full(state, version):
+        return json.dumps(state).encode()
+    
+    def json_delta(state, version, previous=[None]):
+        # Campos alterados em relação à atualização anterior, como no long-poll
+        changed = {k: v for k, v in state.items() if previous[0] is None or previous[0][k] != v}
+        previous[0] = state
+        return json.dumps({'version': version, 'full': False, 'state': changed}).encode()
+    
+    encoders = [('JSON completo', json_full), ('JSON delta (?since=)', json_delta),
+                ('binário (struct)', server.encode_state_binary)]
+    if server.msgpack is not None:
+        encoders.append(('MessagePack', server.encode_state_msgpack))
+    
+    print(f"📦 Codificação do estado - {args.updates} atualizações por formato")
+    print(f"{'Formato':>22} {'µs/atualização':>15} {'bytes/atualização':>18} {'vs JSON':>8}")
+    baseline = None
+    for label, encoder in encoders:
+        total_bytes = 0
+        start = time.perf_counter()
+        for version, state in enumerate(states):
+            total_bytes += len(encoder(state, version))
+        elapsed = time.perf_counter() - start
+        per_update = total_bytes / len(states)
+        baseline = baseline or per_update
+        print(f"{label:>22} {elapsed / len(states) * 1e6:>15.1f} {per_update:>18.1f} {baseline / per_update:>7.1f}x")
+    if server.msgpack is None:
+        print("   (MessagePack indisponível: pip install msgpack)")
+    
+    # Conferir a ida e volta do formato binário (quantização de 0,01% na energia)
+    version, decoded = server.decode_state_binary(server.encode_state_binary(states[-1], 7))
+    error = max(abs(decoded[f'player{i + 1}_energy'] - states[-1][f'player{i + 1}_energy']) for i in range(4))
+    print(f"\n✅ Binário decodificado (versão {version}), erro máximo de energia {error:.4f}%")
+    
+    # Bytes por atualização servidos de verdade por /api/state
+    served = []
+    with running_server() as port:
+        for label, headers in (('JSON', {}), ('binário', {'Accept': server.STATE_BINARY_CONTENT_TYPE})):
+            conn = http.client.HTTPConnection("127.0.0.1", port)
+            conn.request('GET', '/api/state', headers=headers)
+            response = conn.getresponse()
+            served.append((label, len(response.read()), response.getheader('Content-Type')))
+            conn.close()
+    for label, size, content_type in served:
+        print(f"🌐 GET /api/state ({label}): {size} bytes de corpo, {content_type}")
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def poll_state(port, requests, persistent, latencies):
+    """Um display fazendo GET /api/state; nova conexão TCP por requisição ou uma só (keep-alive)"""
+    conn = http.client.HTTPConnection("127.0.0.1", port) if persistent else None
+    for _ in range(requests):
+        start = time.perf_counter()
+        if not persistent:
+            conn = http.client.HTTPConnection("127.0.0.1", port)
+            conn.request('GET', '/api/state', headers={'Connection': 'close'})
+        else:
+            conn.request('GET', '/api/state')
+        response = conn.getresponse()
+        response.read()
+        if not persistent:
+            conn.close()
+        latencies.append(time.perf_counter() - start)
+    if persistent:
+        conn.close()
+
+def run_keepalive(args):
+    per_client = args.requests // args.clients
+    print(f"🔌 GET /api/state - {args.clients} clientes × {per_client} requisições")
+    results = []
+    with running_server() as port:
+        for label, persistent in (('nova conexão', False), ('keep-alive', True)):
+            latencies = []
+            opened_before = server.http_connection_stats.opened_total
+            threads = [threading.Thread(target=poll_state, args=(port, per_client, persistent, latencies))
+                       for _ in range(args.clients)]
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - start
+            results.append((label, server.http_connection_stats.opened_total - opened_before, latencies, elapsed))
+    
+    print(f"{'Modo':>14} {'Conexões':>9} {'req/s':>8} {'média (µs)':>11} {'p50 (µs)':>9} {'p99 (µs)':>9} {'máx (µs)':>9}")
+    for label, connections, latencies, elapsed in results:
+        print(f"{label:>14} {connections:>9} {len(latencies) / elapsed:>8.0f} "
+              f"{sum(latencies) / len(latencies) * 1e6:>11.0f} {percentile(latencies, 0.5) * 1e6:>9.0f} "
+              f"{percentile(latencies, 0.99) * 1e6:>9.0f} {max(latencies) * 1e6:>9.0f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks do servidor BikeJJ")
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+    
+    energy = subparsers.add_parser('energy', help="motor de energia Python vs NumPy")
+    energy.add_argument('--players', type=int, nargs='+', default=[4, 32, 256])
+    energy.add_argument('--ticks', type=int, default=2000)
+    energy.set_defaults(func=run_energy)
+    
+    pedal = subparsers.add_parser('pedal', help="POST /api/pedal vs /api/pedal/batch")
+    pedal.add_argument('--events', type=int, default=2000)
+    pedal.add_argument('--batch-sizes', type=int, nargs='+', default=[10, 50, 200])
+    pedal.set_defaults(func=run_pedal)
+    
+    state = subparsers.add_parser('state', help="JSON vs JSON delta vs binário/MessagePack de /api/state")
+    state.add_argument('--updates', type=int, default=5000)
+    state.set_defaults(func=run_state)
+    
+    keepalive = subparsers.add_parser('keepalive', help="GET /api/state com e sem conexões persistentes")
+    keepalive.add_argument('--requests', type=int, default=2000)
+    keepalive.add_argument('--clients', type=int, default=4)
+    keepalive.set_defaults(func=run_keepalive)
+    
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
@@ -406,7 +406,7 @@ class BikeJJReports {
                         <div class="player-avatar player${playerId}">${playerId}</div>
                         <div class="player-details">
                             <h4>Jogador ${playerId}</h4>
-                            <p>${stats.games} partidas jogadas</p>
+                            <p>${stats.games} partidas jogadas · pico ${Math.round(stats.peakRpm)} rpm</p>
                         </div>
                     </div>
                     <div class="player-metrics">
@@ -443,6 +443,7 @@ class BikeJJReports {
                 totalScore: 0,
                 totalEnergy: 0,
                 totalPedals: 0,
+                peakRpm: 0,
                 avgScore: 0,
                 avgEnergy: 0,
                 avgPedals: 0
@@ -461,6 +462,7 @@ class BikeJJReports {
                 stats[playerId].totalScore += player.finalScore;
                 stats[playerId].totalEnergy += player.finalEnergy;
                 stats[playerId].totalPedals += player.totalPedals;
+                stats[playerId].peakRpm = Math.max(stats[playerId].peakRpm, player.peakRpm || 0);
             });
         });
         
@@ -577,14 +579,25 @@ class BikeJJReports {
         return filtered;
     }
     
-    // Exportar dados
+    // Exportar dados: histórico completo do servidor (streaming) ou os relatórios deste navegador
     exportData() {
-        const dataStr = JSON.stringify(this.gameReports, null, 2);
-        const dataBlob = new Blob([dataStr], {type: 'application/json'});
-        
+        const format = document.getElementById('exportFormat').value;
+        const today = new Date().toISOString().split('T')[0];
         const link = document.createElement('a');
-        link.href = URL.createObjectURL(dataBlob);
-        link.download = `bikejj_reports_${new Date().toISOString().split('T')[0]}.json`;
+        let message;
+        
+        if (format === 'local') {
+            // Relatórios guardados no localStorage deste navegador (não estão no servidor)
+            const dataStr = JSON.stringify(this.gameReports, null, 2);
+            const dataBlob = new Blob([dataStr], {type: 'application/json'});
+            link.href = URL.createObjectURL(dataBlob);
+            link.download = `bikejj_reports_${today}.json`;
+            message = '📊 Relatórios deste navegador exportados!';
+        } else {
+            link.href = this.historyExportUrl(format);
+            link.download = `bikejj_history_${today}.${format}`;
+            message = '📊 Exportação do histórico do servidor iniciada!';
+        }
         
         // Animar botão
         gsap.to('#exportBtn', {
@@ -594,11 +607,27 @@ class BikeJJReports {
             repeat: 1,
             onComplete: () => {
                 link.click();
-                this.showNotification('📊 Dados exportados com sucesso!');
+                this.showNotification(message);
             }
         });
     }
     
+    // URL de /api/history/export com os mesmos filtros da tela: período e jogador vencedor
+    historyExportUrl(format) {
+        const params = new URLSearchParams({ format });
+        if (this.filters.date !== 'all') {
+            const days = { today: 0, week: 7, month: 30 }[this.filters.date];
+            const now = new Date();
+            const from = new Date(now.getFullYear(), now.getMonth(), now.getDate() - days);
+            const pad = (value) => String(value).padStart(2, '0');
+            params.set('from', `${from.getFullYear()}-${pad(from.getMonth() + 1)}-${pad(from.getDate())}`);
+        }
+        if (this.filters.player !== 'all') {
+            params.set('winner', this.filters.player);
+        }
+        return `/api/history/export?${params}`;
+    }
+    
     // Resetar dashboard
     resetDashboard() {
         // Confirmar ação
@@ -242,6 +242,14 @@ async checkInitialConnection() {
                 if (gameState.pedal_count && gameState.pedal_count[i] !== undefined) {
                     player.pedalCount = gameState.pedal_count[i];
                 }
+                
+                // Cadência e potência calculadas no servidor
+                if (gameState.rpm_avg && gameState.rpm_avg[i] !== undefined) {
+                    player.rpm = gameState.rpm_avg[i];
+                    player.powerWatts = gameState.power_watts[i];
+                    player.peakRpm = gameState.peak_rpm[i];
+                    player.peakWatts = gameState.peak_watts[i];
+                }
             }
             
             // Atualizar status do Arduino Mega
@@ -1024,27 +1032,44 @@ async checkInitialConnection() {
         this.updateDisplay();
     }
     
-    // Enviar pedalada para o servidor
-    async sendPedalToServer(playerId) {
+    // Enfileirar pedalada para o servidor (enviadas em lote a cada ~30ms)
+    sendPedalToServer(playerId) {
+        if (!this.pedalQueue) {
+            this.pedalQueue = [];
+        }
+        this.pedalQueue.push({ player: playerId, count: 1, ts: Date.now() });
+        
+        if (!this.pedalFlushTimer) {
+            this.pedalFlushTimer = setTimeout(() => this.flushPedalQueue(), 30);
+        }
+    }
+    
+    // Enviar todas as pedaladas enfileiradas em uma única requisição
+    async flushPedalQueue() {
+        this.pedalFlushTimer = null;
+        const events = this.pedalQueue;
+        this.pedalQueue = [];
+        if (!events || events.length === 0) {
+            return;
+        }
+        
         try {
-            const response = await fetch('/api/pedal', {
+            const response = await fetch('/api/pedal/batch', {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
                 },
-                body: JSON.stringify({
-                    player: playerId
-                })
+                body: JSON.stringify({ events: events })
             });
             
             if (response.ok) {
                 const data = await response.json();
-                console.log(`⌨️ Pedalada enviada para servidor: Jogador ${playerId}, Energia: ${data.energy}%`);
+                console.log(`⌨️ ${data.applied} pedalada(s) enviadas para servidor, Energias: ${data.energy.map(e => e.toFixed(1)).join('% / ')}%`);
             } else {
-                console.log(`❌ Erro ao enviar pedalada: ${response.status}`);
+                console.log(`❌ Erro ao enviar pedaladas: ${response.status}`);
             }
         } catch (error) {
-            console.log(`❌ Erro de conexão ao enviar pedalada: ${error}`);
+            console.log(`❌ Erro de conexão ao enviar pedaladas: ${error}`);
         }
     }
     
@@ -1543,6 +1568,8 @@ async checkInitialConnection() {
                 totalPedals: 0,
                 maxEnergyReached: 0,
                 averageEnergy: 0,
+                peakRpm: 0,
+                peakWatts: 0,
                 energyHistory: [],
                 pedalTimestamps: []
             });
@@ -1573,6 +1600,8 @@ async checkInitialConnection() {
             reportPlayer.finalScore = Math.floor(player.score);
             reportPlayer.finalEnergy = player.energy;
             reportPlayer.maxEnergyReached = Math.max(reportPlayer.maxEnergyReached, player.energy);
+            reportPlayer.peakRpm = Math.max(reportPlayer.peakRpm, player.peakRpm || 0);
+            reportPlayer.peakWatts = Math.max(reportPlayer.peakWatts, player.peakWatts || 0);
             
             // Calcular energia média
             if (reportPlayer.energyHistory.length > 0) {
@@ -1,14 +1,189 @@
 #!/usr/bin/env python3
 """
 Monitor Serial para BikeJJ
-Monitora a porta serial do ESP32 e exibe as pedaladas em tempo real
+Monitora a porta serial do Arduino Mega e exibe as pedaladas em tempo real.
+
+Modos:
+    python serial_monitor.py                          # monitor interativo
+    python serial_monitor.py --port /dev/ttyACM0 --capture capturas/
+    python serial_monitor.py --tap --capture capturas/     # com o server.py dono da porta
+    python serial_monitor.py --analyze capturas/capture-*.bjcap.gz
+
+Capturas guardam os bytes crus com o instante de chegada e podem ser
+reproduzidas no servidor com: python arduino_simulator.py --replay <arquivo> --configure
 """
 
+import argparse
+import gzip
+import json
+import os
+import re
+import socket
+import struct
 import serial
 import serial.tools.list_ports
 import time
 import sys
 
+# Formato do arduino_sketch.ino (sufixo " @<millis>" opcional: firmwares antigos não enviam)
+PEDAL_RE = re.compile(r'^🔍 J([1-4]):(\d+)(?: @(\d+))?$')
+PARTIAL_RE = re.compile(r'^📊 J([1-4]): Leitura (\d+)/(\d+) \(parcial\)(?: @(\d+))?$')
+TOTAL_RE = re.compile(r'^📈 J([1-4]): (\d+) pedaladas total(?: @(\d+))?$')
+
+# Arquivo de captura: cabeçalho + registros (ns desde o início, tamanho, bytes crus), tudo em gzip
+CAPTURE_MAGIC = b'BIKEJJCAP1\n'
+CAPTURE_RECORD = struct.Struct('<qI')
+CAPTURE_ROTATE_BYTES = 16 * 1024 * 1024  # Novo arquivo a cada 16 MB crus
+CAPTURE_ROTATE_SECONDS = 3600  # ... ou a cada hora
+STATS_INTERVAL = 1.0
+TAP_DEFAULT_HOST = '127.0.0.1'
+TAP_DEFAULT_ADDRESS = '127.0.0.1:9100'  # Tap do server.py
+
+class MegaLineParser:
+    """Separa o fluxo de bytes em linhas e classifica no formato do Mega, com contadores"""
+
+    def __init__(self):
+        self.buffer = b''
+        self.lines = 0
+        self.parse_errors = 0
+        self.pedals = [0, 0, 0, 0]
+        self.partials = [0, 0, 0, 0]
+        self.totals = [0, 0, 0, 0]
+        self.player_lines = [0, 0, 0, 0]
+        self.last_total = [None, None, None, None]
+
+    def feed(self, data):
+        """Processar bytes recebidos; retorna a lista de (tipo, jogador, valor, linha)"""
+        self.buffer += data
+        *lines, self.buffer = self.buffer.split(b'\n')
+        return [self.parse_line(raw) for raw in lines if raw.strip()]
+
+    def parse_line(self, raw):
+        self.lines += 1
+        try:
+            line = raw.decode('utf-8').strip()
+        except UnicodeDecodeError:
+            self.parse_errors += 1
+            return ('error', 0, None, raw.decode('utf-8', errors='replace').strip())
+
+        match = PEDAL_RE.match(line)
+        if match:
+            player = int(match.group(1))
+            self.pedals[player - 1] += 1
+            self.player_lines[player - 1] += 1
+            return ('pedal', player, int(match.group(2)), line)
+        match = PARTIAL_RE.match(line)
+        if match:
+            player = int(match.group(1))
+            self.partials[player - 1] += 1
+            self.player_lines[player - 1] += 1
+            return ('partial', player, int(match.group(2)), line)
+        match = TOTAL_RE.match(line)
+        if match:
+            player = int(match.group(1))
+            self.totals[player - 1] += 1
+            self.player_lines[player - 1] += 1
+            self.last_total[player - 1] = int(match.group(2))
+            return ('total', player, int(match.group(2)), line)
+
+        self.parse_errors += 1
+        return ('error', 0, None, line)
+
+class RateMeter:
+    """Taxas por segundo a partir de contadores cumulativos"""
+
+    def __init__(self, parser):
+        self.parser = parser
+        self.last_time = time.monotonic()
+        self.last_lines = 0
+        self.last_player_lines = [0, 0, 0, 0]
+
+    def sample(self):
+        now = time.monotonic()
+        elapsed = max(now - self.last_time, 1e-6)
+        line_rate = (self.parser.lines - self.last_lines) / elapsed
+        player_rates = [(current - previous) / elapsed
+                        for current, previous in zip(self.parser.player_lines, self.last_player_lines)]
+        self.last_time = now
+        self.last_lines = self.parser.lines
+        self.last_player_lines = list(self.parser.player_lines)
+        return line_rate, player_rates
+
+def format_stats(parser, line_rate, player_rates, extra=''):
+    players = ' '.join(f"J{i + 1}:{rate:5.1f}/s" for i, rate in enumerate(player_rates))
+    return (f"📊 {line_rate:7.1f} linhas/s | {players} | pedaladas {sum(parser.pedals)} | "
+            f"erros {parser.parse_errors}{extra}")
+
+class CaptureWriter:
+    """Grava os bytes crus com o instante de chegada em arquivos gzip rotativos"""
+
+    def __init__(self, directory, port, baudrate,
+                 rotate_bytes=CAPTURE_ROTATE_BYTES, rotate_seconds=CAPTURE_ROTATE_SECONDS):
+        self.directory = directory
+        self.port = port
+        self.baudrate = baudrate
+        self.rotate_bytes = rotate_bytes
+        self.rotate_seconds = rotate_seconds
+        self.file = None
+        self.path = None
+        self.files_written = []
+        self.total_bytes = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _open(self, now_ns):
+        self.close()
+        name = f"capture-{time.strftime('%Y%m%d-%H%M%S')}-{len(self.files_written) + 1:03d}.bjcap.gz"
+        self.path = os.path.join(self.directory, name)
+        self.file = gzip.open(self.path, 'wb', compresslevel=6)
+        header = {'port': self.port, 'baudrate': self.baudrate, 'started_at': time.time()}
+        self.file.write(CAPTURE_MAGIC + json.dumps(header).encode('utf-8') + b'\n')
+        self.file_start_ns = now_ns
+        self.file_bytes = 0
+        self.files_written.append(self.path)
+        print(f"\n💾 Gravando captura em {self.path}")
+
+    def write(self, data, arrival_ns):
+        if (self.file is None or self.file_bytes >= self.rotate_bytes
+                or arrival_ns - self.file_start_ns >= self.rotate_seconds * 1_000_000_000):
+            self._open(arrival_ns)
+        self.file.write(CAPTURE_RECORD.pack(arrival_ns - self.file_start_ns, len(data)))
+        self.file.write(data)
+        self.file_bytes += len(data)
+        self.total_bytes += len(data)
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+
+def read_capture(path):
+    """Ler uma captura: retorna (cabeçalho, gerador de (segundos desde o início, bytes))
+
+    Capturas interrompidas (queda de energia) são lidas até o último registro completo.
+    """
+    f = gzip.open(path, 'rb')
+    if f.read(len(CAPTURE_MAGIC)) != CAPTURE_MAGIC:
+        f.close()
+        raise ValueError(f"{path} não é uma captura do BikeJJ")
+    header = json.loads(f.readline())
+
+    def chunks():
+        with f:
+            try:
+                while True:
+                    record = f.read(CAPTURE_RECORD.size)
+                    if len(record) < CAPTURE_RECORD.size:
+                        return
+                    offset_ns, length = CAPTURE_RECORD.unpack(record)
+                    data = f.read(length)
+                    if len(data) < length:
+                        return
+                    yield offset_ns / 1e9, data
+            except (EOFError, OSError):
+                return  # Arquivo truncado
+
+    return header, chunks()
+
 def list_available_ports():
     """Lista todas as portas seriais disponíveis"""
     ports = serial.tools.list_ports.comports()
@@ -47,102 +222,213 @@ def select_port():
         except ValueError:
             print("❌ Digite um número válido!")
 
-def monitor_serial(port, baudrate=115200):
-    """Monitora a porta serial e exibe as mensagens"""
+def print_event(event):
+    kind, player, value, line = event
+    if kind == 'pedal':
+        print(f"⚡ J{player}: pedalada #{value}")
+    elif kind == 'partial':
+        print(f"   J{player}: leitura {value}")
+    elif kind == 'total':
+        print(f"📈 J{player}: {value} pedaladas no total")
+    else:
+        print(f"⚠️ Linha não reconhecida: {line}")
+
+class TapSource:
+    """Linhas cruas do tap do servidor (NDJSON) convertidas de volta em bytes da serial"""
+
+    def __init__(self, host, port):
+        self.label = f"tap://{host}:{port}"
+        self.sock = socket.create_connection((host, port), timeout=5)
+        self.sock.settimeout(0.1)
+        self.buffer = b''
+        self.dropped = 0
+        self.header = None
+
+    def read(self):
+        try:
+            data = self.sock.recv(65536)
+        except socket.timeout:
+            return b''
+        if not data:
+            raise ConnectionError("servidor fechou o tap")
+        self.buffer += data
+        *messages, self.buffer = self.buffer.split(b'\n')
+        raw = []
+        for message in messages:
+            try:
+                message = json.loads(message)
+            except ValueError:
+                continue
+            if message.get('type') == 'raw':
+                raw.append(message['line'].encode('utf-8') + b'\r\n')
+            elif message.get('type') == 'dropped':
+                self.dropped += message['count']  # Monitor lento: o servidor descartou mensagens
+            elif message.get('type') == 'hello':
+                self.header = message
+        return b''.join(raw)
+
+    def close(self):
+        self.sock.close()
+
+def monitor_stream(read_chunk, label, baudrate, capture_dir=None, quiet=False,
+                   rotate_bytes=CAPTURE_ROTATE_BYTES, rotate_seconds=CAPTURE_ROTATE_SECONDS, drops=None):
+    """Laço do monitor: parse, estatísticas e captura opcional de qualquer fonte de bytes"""
+    parser = MegaLineParser()
+    meter = RateMeter(parser)
+    capture = CaptureWriter(capture_dir, label, baudrate, rotate_bytes, rotate_seconds) if capture_dir else None
+    print(f"🚴 Monitorando pedaladas...")
+    print(f"📊 Formato esperado: '🔍 J<n>:<contador>', '📊 J<n>: Leitura x/4 (parcial)', '📈 J<n>: N pedaladas total'")
+    print(f"🔍 Pressione Ctrl+C para parar\n")
+    try:
+        next_stats = time.monotonic() + STATS_INTERVAL
+        while True:
+            data = read_chunk()
+            if data:
+                arrival_ns = time.monotonic_ns()
+                if capture:
+                    capture.write(data, arrival_ns)
+                events = parser.feed(data)
+                if not quiet:
+                    for event in events:
+                        print_event(event)
+
+            if time.monotonic() >= next_stats:
+                next_stats += STATS_INTERVAL
+                line_rate, player_rates = meter.sample()
+                extra = f" | capturado {capture.total_bytes / 1024:.0f} kB" if capture else ''
+                if drops:
+                    extra += f" | descartadas no tap {drops()}"
+                stats = format_stats(parser, line_rate, player_rates, extra)
+                if quiet:
+                    print(f"\r{stats}", end='', flush=True)
+                else:
+                    print(stats)
+    finally:
+        if quiet:
+            print()  # Terminar a linha de estatísticas
+        if capture:
+            capture.close()
+            print(f"💾 {len(capture.files_written)} arquivo(s) de captura, {capture.total_bytes} bytes crus")
+        print_summary(parser)
+
+def monitor_serial(port, baudrate=115200, **options):
+    """Monitora a porta serial; com capture_dir grava os bytes crus para análise/replay"""
     try:
         print(f"📡 Conectando à porta {port} com baudrate {baudrate}...")
-        ser = serial.Serial(port, baudrate, timeout=1)
+        ser = serial.Serial(port, baudrate, timeout=0.1)
         print(f"✅ Conectado com sucesso!")
-        print(f"🚴 Monitorando pedaladas...")
-        print(f"📊 Formato esperado: 'Pedaladas: X' e 'Pedalada: True/False'")
-        print(f"🔍 Pressione Ctrl+C para parar\n")
-        
-        # Aguardar estabilização
-        time.sleep(2)
-        
-        pedal_count = 0
-        last_pedal_state = None
-        
-        while True:
-            if ser.in_waiting:
-                try:
-                    line = ser.readline().decode('utf-8').strip()
-                    if line:
-                        # Processar linha do ESP32
-                        if line.startswith("Pedaladas:"):
-                            try:
-                                count_str = line.split(":")[1].strip()
-                                new_count = int(count_str)
-                                if new_count != pedal_count:
-                                    pedal_count = new_count
-                                    print(f"🚴 Pedaladas: {pedal_count}")
-                            except:
-                                print(f"📡 {line}")
-                        elif line.startswith("Pedalada:"):
-                            try:
-                                state_str = line.split(":")[1].strip()
-                                pedal_state = (state_str == "True")
-                                
-                                if pedal_state != last_pedal_state:
-                                    last_pedal_state = pedal_state
-                                    if pedal_state:
-                                        print(f"⚡ PEDALADA DETECTADA! (Total: {pedal_count})")
-                                    else:
-                                        print(f"🛑 Parou de pedalar")
-                                else:
-                                    print(f"📡 {line}")
-                            except:
-                                print(f"📡 {line}")
-                        elif "Interrupção:" in line:
-                            print(f"🔍 {line}")
-                        elif "✅" in line or "🛑" in line:
-                            print(f"📡 {line}")
-                        else:
-                            print(f"📡 {line}")
-                except UnicodeDecodeError:
-                    print(f"⚠️ Erro de decodificação na linha serial")
-                except Exception as e:
-                    print(f"❌ Erro ao processar linha: {e}")
-            
-            time.sleep(0.01)  # 10ms delay
-            
+        # Bloqueia até chegar ao menos 1 byte (ou o timeout), depois leva tudo o que já está no buffer
+        monitor_stream(lambda: ser.read(max(1, ser.in_waiting)), port, baudrate, **options)
     except serial.SerialException as e:
         print(f"❌ Erro de conexão serial: {e}")
         print(f"💡 Verifique se:")
-        print(f"   - O ESP32 está conectado")
+        print(f"   - O Arduino Mega está conectado")
         print(f"   - A porta está correta")
-        print(f"   - Nenhum outro programa está usando a porta")
+        print(f"   - Nenhum outro programa está usando a porta (com o server.py rodando, use --tap)")
     except KeyboardInterrupt:
         print(f"\n🛑 Monitoramento interrompido pelo usuário")
-    except Exception as e:
-        print(f"❌ Erro inesperado: {e}")
     finally:
         if 'ser' in locals() and ser.is_open:
             ser.close()
             print(f"🔌 Conexão serial fechada")
 
+def monitor_tap(address, **options):
+    """Monitora as linhas pelo tap do server.py (a porta continua com o servidor)"""
+    host, _, port = address.rpartition(':')
+    try:
+        print(f"🔀 Conectando ao tap do servidor em {address}...")
+        tap = TapSource(host or TAP_DEFAULT_HOST, int(port))
+        print(f"✅ Conectado ao tap!")
+        monitor_stream(tap.read, tap.label, 115200, drops=lambda: tap.dropped, **options)
+    except (OSError, ConnectionError) as e:
+        print(f"❌ Erro no tap do servidor: {e}")
+        print(f"💡 Verifique se o server.py está rodando")
+    except KeyboardInterrupt:
+        print(f"\n🛑 Monitoramento interrompido pelo usuário")
+    finally:
+        if 'tap' in locals():
+            tap.close()
+
+def print_summary(parser, duration=None):
+    print(f"📋 {parser.lines} linhas, {parser.parse_errors} erros de parse")
+    for i in range(4):
+        rate = f", {parser.player_lines[i] / duration:.1f} linhas/s" if duration else ''
+        print(f"   J{i + 1}: {parser.pedals[i]} pedaladas, {parser.partials[i]} parciais, "
+              f"último total {parser.last_total[i]}{rate}")
+
+def analyze_captures(paths):
+    """Estatísticas de capturas gravadas (mesmo parser do modo ao vivo)"""
+    for path in paths:
+        parser = MegaLineParser()
+        try:
+            header, chunks = read_capture(path)
+        except (OSError, ValueError) as e:
+            print(f"❌ {path}: {e}")
+            continue
+
+        started = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(header['started_at']))
+        print(f"\n📂 {path} ({header['port']} @ {header['baudrate']}, início {started})")
+        duration = 0.0
+        previous = 0.0
+        max_gap = 0.0
+        total_bytes = 0
+        for offset, data in chunks:
+            max_gap = max(max_gap, offset - previous)
+            previous = duration = offset
+            total_bytes += len(data)
+            parser.feed(data)
+        print(f"   ⏱️ {duration:.1f}s, {total_bytes} bytes, {parser.lines / duration if duration else 0:.1f} linhas/s, "
+              f"maior silêncio {max_gap * 1000:.0f}ms")
+        print_summary(parser, duration)
+
 def main():
+    arg_parser = argparse.ArgumentParser(description="Monitor serial do BikeJJ (Arduino Mega)")
+    arg_parser.add_argument('--port', help="porta serial (sem isso, escolher da lista)")
+    arg_parser.add_argument('--baud', type=int, default=115200)
+    arg_parser.add_argument('--capture', metavar='DIR', help="gravar os bytes crus em capturas gzip rotativas")
+    arg_parser.add_argument('--rotate-mb', type=float, default=CAPTURE_ROTATE_BYTES / 1024 / 1024)
+    arg_parser.add_argument('--rotate-minutes', type=float, default=CAPTURE_ROTATE_SECONDS / 60)
+    arg_parser.add_argument('--quiet', action='store_true', help="só a linha de estatísticas (alto volume)")
+    arg_parser.add_argument('--analyze', nargs='+', metavar='ARQUIVO', help="analisar capturas gravadas")
+    arg_parser.add_argument('--tap', nargs='?', const=TAP_DEFAULT_ADDRESS, metavar='HOST:PORTA',
+                            help=f"ler pelo tap do server.py em vez de abrir a porta (padrão {TAP_DEFAULT_ADDRESS})")
+    args = arg_parser.parse_args()
+
+    if args.analyze:
+        analyze_captures(args.analyze)
+        return
+
+    options = {
+        'capture_dir': args.capture,
+        'quiet': args.quiet,
+        'rotate_bytes': int(args.rotate_mb * 1024 * 1024),
+        'rotate_seconds': args.rotate_minutes * 60
+    }
+    if args.tap:
+        monitor_tap(args.tap, **options)
+        return
+
     print("🚴 BikeJJ - Monitor Serial")
     print("=" * 40)
-    
-    # Listar portas disponíveis
-    ports = list_available_ports()
-    if not ports:
-        print("💡 Conecte o ESP32 e tente novamente")
-        return
-    
-    # Selecionar porta
-    selected_port = select_port()
+
+    selected_port = args.port
     if not selected_port:
-        print("👋 Saindo...")
-        return
-    
-    # Configurar baudrate
-    baudrate = 115200
-    print(f"⚙️ Baudrate: {baudrate}")
-    
+        # Listar portas disponíveis
+        ports = list_available_ports()
+        if not ports:
+            print("💡 Conecte o Arduino Mega e tente novamente")
+            return
+
+        # Selecionar porta
+        selected_port = select_port()
+        if not selected_port:
+            print("👋 Saindo...")
+            return
+
+    print(f"⚙️ Baudrate: {args.baud}")
+
     # Iniciar monitoramento
-    monitor_serial(selected_port, baudrate)
+    monitor_serial(selected_port, args.baud, **options)
 
 if __name__ == "__main__":
     main()
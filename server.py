@@ -14,6 +14,31 @@ import json
 import os
 import platform
 import socket
+import select
+import sys
+import gc
+import collections
+import tracemalloc
+import math
+import heapq
+import hashlib
+import csv
+import io
+import bisect
+import urllib.parse
+import struct
+import ctypes
+import ctypes.util
+from array import array
+
+try:
+    import numpy as np  # Opcional: motor de energia vetorizado
+except ImportError:
+    np = None
+try:
+    import msgpack  # Opcional: estado em MessagePack para overlays
+except ImportError:
+    msgpack = None
 
 # Configurações
 HTTP_PORT = 9000
@@ -29,12 +54,14 @@ GAME_CONFIG_FILE = 'game_config.json'
 DEFAULT_ENERGY_GAIN = 2.0  # 2.0% por pedalada (mais responsivo)
 DEFAULT_ENERGY_DECAY = 5.0  # 5.0% por segundo (decaimento mais instantâneo)
 DEFAULT_LED_STROBE = 200  # 200ms
+DEFAULT_PARTIAL_ENERGY = False  # Energia fracionada a cada leitura parcial do sensor (opt-in)
 
 # Configurações atuais do jogo
 game_config = {
     'energy_gain_rate': DEFAULT_ENERGY_GAIN,
     'energy_decay_rate': DEFAULT_ENERGY_DECAY,
-    'led_strobe_rate': DEFAULT_LED_STROBE
+    'led_strobe_rate': DEFAULT_LED_STROBE,
+    'partial_energy': DEFAULT_PARTIAL_ENERGY
 }
 
 def test_arduino_connection(port, timeout=3):
@@ -109,27 +136,45 @@ def load_serial_config():
         print(f"❌ Erro ao carregar configuração: {e}")
         SERIAL_PORT = None
 
+def parse_config_bool(value, name):
+    """Booleano da configuração: true/false do JSON ou as strings "true"/"false" (qualquer outra coisa é erro)"""
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.strip().lower() in ('true', 'false'):
+        return value.strip().lower() == 'true'
+    raise ValueError(f"{name} deve ser true ou false, recebido {value!r}")
+
+def validate_game_config(raw):
+    """Montar uma configuração completa e validada a partir de um dicionário (pode lançar ValueError)"""
+    if not isinstance(raw, dict):
+        raise ValueError("configuração deve ser um objeto JSON")
+    # Validar valores com range maior para sensibilidade
+    return {
+        'energy_gain_rate': max(0.1, min(50.0, float(raw.get('energy_gain_rate', DEFAULT_ENERGY_GAIN)))),
+        'energy_decay_rate': max(0.1, min(100.0, float(raw.get('energy_decay_rate', DEFAULT_ENERGY_DECAY)))),
+        'led_strobe_rate': max(50, min(2000, int(raw.get('led_strobe_rate', DEFAULT_LED_STROBE)))),
+        'partial_energy': parse_config_bool(raw.get('partial_energy', DEFAULT_PARTIAL_ENERGY), 'partial_energy')
+    }
+
+def set_game_config(new_config):
+    """Trocar a configuração ativa de uma vez (leitores nunca veem um dict pela metade)"""
+    global game_config
+    game_config = new_config
+
 def load_game_config():
     """Carregar configurações do jogo do arquivo"""
     global game_config
     try:
         if os.path.exists(GAME_CONFIG_FILE):
             with open(GAME_CONFIG_FILE, 'r', encoding='utf-8') as f:
-                config = json.load(f)
                 # Carregar com validação
-                game_config['energy_gain_rate'] = float(config.get('energy_gain_rate', DEFAULT_ENERGY_GAIN))
-                game_config['energy_decay_rate'] = float(config.get('energy_decay_rate', DEFAULT_ENERGY_DECAY))
-                game_config['led_strobe_rate'] = int(config.get('led_strobe_rate', DEFAULT_LED_STROBE))
-                
-                # Validar valores com range maior para sensibilidade
-                game_config['energy_gain_rate'] = max(0.1, min(50.0, game_config['energy_gain_rate']))
-                game_config['energy_decay_rate'] = max(0.1, min(100.0, game_config['energy_decay_rate']))
-                game_config['led_strobe_rate'] = max(50, min(2000, game_config['led_strobe_rate']))
+                set_game_config(validate_game_config(json.load(f)))
                 
                 print(f"⚙️ Configurações do jogo carregadas:")
                 print(f"   📈 Ganho de energia: {game_config['energy_gain_rate']}% por pedalada")
                 print(f"   📉 Decaimento: {game_config['energy_decay_rate']}% por segundo")
                 print(f"   💡 LED strobe: {game_config['led_strobe_rate']}ms")
+                print(f"   📊 Energia por leitura parcial: {'ativada' if game_config['partial_energy'] else 'desativada'}")
         else:
             print("💡 Arquivo de configuração não encontrado, criando com valores padrão")
             save_game_config()  # Salvar configurações padrão
@@ -140,23 +185,145 @@ def load_game_config():
         game_config = {
             'energy_gain_rate': DEFAULT_ENERGY_GAIN,
             'energy_decay_rate': DEFAULT_ENERGY_DECAY,
-            'led_strobe_rate': DEFAULT_LED_STROBE
+            'led_strobe_rate': DEFAULT_LED_STROBE,
+            'partial_energy': DEFAULT_PARTIAL_ENERGY
         }
 
+# Gravação atômica de arquivos JSON (temp + fsync + rename)
+json_write_lock = threading.Lock()
+json_written_digests = {}  # Caminho absoluto -> hash do conteúdo da nossa última gravação
+
+def is_own_json_write(path, content):
+    """O arquivo ainda tem exatamente o que write_json_atomic gravou por último?"""
+    with json_write_lock:
+        digest = json_written_digests.get(os.path.abspath(path))
+    return digest is not None and digest == hashlib.sha1(content).digest()
+
+def write_json_atomic(path, data, **dump_kwargs):
+    """Gravar JSON sem nunca deixar o arquivo pela metade (temp + fsync + rename)"""
+    directory = os.path.dirname(os.path.abspath(path))
+    tmp_path = f"{path}.tmp"
+    content = json.dumps(data, **dump_kwargs).encode('utf-8')
+    with json_write_lock:
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+        json_written_digests[os.path.abspath(path)] = hashlib.sha1(content).digest()
+        
+        # fsync do diretório para o rename sobreviver a uma queda de energia (POSIX)
+        if os.name != 'nt':
+            try:
+                dir_fd = os.open(directory, os.O_RDONLY)
+                try:
+                    os.fsync(dir_fd)
+                finally:
+                    os.close(dir_fd)
+            except OSError:
+                pass
+
 def save_game_config():
     """Salvar configurações do jogo no arquivo"""
     try:
-        with open(GAME_CONFIG_FILE, 'w', encoding='utf-8') as f:
-            json.dump(game_config, f, indent=2, ensure_ascii=False)
+        write_json_atomic(GAME_CONFIG_FILE, game_config, indent=2, ensure_ascii=False)
         print(f"💾 Configurações do jogo salvas:")
         print(f"   📈 Ganho de energia: {game_config['energy_gain_rate']}% por pedalada")
         print(f"   📉 Decaimento: {game_config['energy_decay_rate']}% por segundo")
         print(f"   💡 LED strobe: {game_config['led_strobe_rate']}ms")
+        print(f"   📊 Energia por leitura parcial: {'ativada' if game_config['partial_energy'] else 'desativada'}")
         return True
     except Exception as e:
         print(f"❌ Erro ao salvar configurações do jogo: {e}")
         return False
 
+# Gravação em background de /api/config/save (sliders postam a cada mudança)
+CONFIG_SAVE_DEBOUNCE = 0.5  # Agrupar alterações feitas dentro de 500ms
+
+class DebouncedConfigWriter:
+    """Agrupar pedidos de gravação da configuração e gravar em uma thread própria"""
+
+    def __init__(self, debounce=CONFIG_SAVE_DEBOUNCE):
+        self.debounce = debounce
+        self.condition = threading.Condition()
+        self.running = False
+        self.dirty = False
+        self.last_request = 0
+        self.write_count = 0
+        self.coalesced_count = 0
+        self.last_error = None
+        self.thread = None
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name='config-writer', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Parar a thread gravando o que ainda estiver pendente"""
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+        if self.thread:
+            self.thread.join(timeout=2)
+        self.flush()
+
+    def schedule(self):
+        """Marcar a configuração em memória como pendente de gravação"""
+        if not self.running:
+            return save_game_config()
+        with self.condition:
+            if self.dirty:
+                self.coalesced_count += 1
+            self.dirty = True
+            self.last_request = time.monotonic()
+            self.condition.notify_all()
+        return True
+
+    def flush(self):
+        with self.condition:
+            if not self.dirty:
+                return True
+            self.dirty = False
+        return self._write()
+
+    def _write(self):
+        if save_game_config():
+            self.write_count += 1
+            self.last_error = None
+            return True
+        self.last_error = 'falha ao gravar'
+        return False
+
+    def _run(self):
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.dirty or not self.running)
+                if not self.running:
+                    return
+                
+                # Esperar a janela de debounce ficar sem novos pedidos
+                while self.running:
+                    remaining = self.last_request + self.debounce - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+                if not self.running:
+                    return
+                self.dirty = False
+            self._write()
+
+config_writer = DebouncedConfigWriter()
+
 def is_valid_serial_port(port):
     """Verificar se uma porta serial é válida para Arduino Mega"""
     if not port:
@@ -190,11 +357,14 @@ def is_valid_serial_port(port):
         'ttyUSB',
         'ttyACM',
         'cu.usbserial',
-        'cu.usbmodem'
+        'cu.usbmodem',
+        '/dev/pts/'  # Pseudo-terminal do arduino_simulator.py
     ]
     
+    # Symlinks estáveis (ex.: /dev/serial/by-id, --link do simulador) valem pelo destino
+    candidates = {port.lower(), os.path.realpath(port).lower()}
     for pattern in valid_patterns:
-        if pattern.lower() in port.lower():
+        if any(pattern.lower() in candidate for candidate in candidates):
             return True
     
     return False
@@ -203,8 +373,7 @@ def save_serial_config(port):
     """Salvar configuração da porta serial no arquivo"""
     try:
         config = {'serial_port': port}
-        with open(CONFIG_FILE, 'w') as f:
-            json.dump(config, f)
+        write_json_atomic(CONFIG_FILE, config)
         print(f"💾 Configuração salva: {port}")
     except Exception as e:
         print(f"❌ Erro ao salvar configuração: {e}")
@@ -221,7 +390,9 @@ def list_available_ports():
                 'manufacturer': port.manufacturer if port.manufacturer else 'N/A',
                 'hwid': port.hwid,
                 'vid': port.vid,
-                'pid': port.pid
+                'pid': port.pid,
+                'serial_number': port.serial_number,
+                'valid': is_valid_serial_port(port.device)
             }
             ports.append(port_info)
         
@@ -237,16 +408,261 @@ def list_available_ports():
         
         ports.sort(key=sort_key)
         
-        print(f"🔍 {len(ports)} portas seriais detectadas:")
-        for port in ports:
-            status = "✅ Válida" if is_valid_serial_port(port['port']) else "❌ Inválida"
-            print(f"   📡 {port['port']} - {port['description']} ({port['manufacturer']}) - {status}")
-        
         return ports
     except Exception as e:
         print(f"❌ Erro ao listar portas: {e}")
         return []
 
+# Inventário de portas seriais mantido em memória (hotplug)
+DEV_WATCH_INTERVAL = 0.25  # Verificar o diretório /dev a cada 250ms (Linux)
+PORT_POLL_INTERVAL = 2.0  # Polling completo de comports() nos outros sistemas
+PORT_RESYNC_INTERVAL = 30.0  # Ressincronização completa de segurança (Linux)
+
+class SerialPortInventory:
+    """Lista de portas seriais atualizada em background por detecção de hotplug"""
+
+    def __init__(self):
+        self.ports = []
+        self.version = 0
+        self.updated_at = 0
+        self.running = False
+        self.thread = None
+        self.condition = threading.Condition()
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.refresh()
+        self.thread = threading.Thread(target=self._watch, name='port-inventory', daemon=True)
+        self.thread.start()
+        print("🔌 Inventário de portas seriais iniciado")
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+
+    def refresh(self):
+        """Reler as portas do sistema e notificar os interessados se algo mudou"""
+        ports = list_available_ports()
+        with self.condition:
+            changed = ports != self.ports
+            if changed:
+                self.ports = ports
+                self.version += 1
+                self.condition.notify_all()
+            self.updated_at = time.time()
+        
+        if changed:
+            print(f"🔍 {len(ports)} portas seriais detectadas:")
+            for port in ports:
+                status = "✅ Válida" if port['valid'] else "❌ Inválida"
+                print(f"   📡 {port['port']} - {port['description']} ({port['manufacturer']}) - {status}")
+        return changed
+
+    def snapshot(self):
+        """Retornar (portas, versão) sem tocar no sistema"""
+        with self.condition:
+            return self.ports, self.version
+
+    def current(self):
+        """(portas, versão) da memória; sem a thread de hotplug rodando, relê o sistema antes"""
+        if not self.running:
+            self.refresh()
+        return self.snapshot()
+
+    def wait_for_change(self, version, timeout):
+        """Bloquear até a versão mudar (ou timeout) e retornar (portas, versão)"""
+        with self.condition:
+            self.condition.wait_for(lambda: self.version != version or not self.running, timeout)
+            return self.ports, self.version
+
+    def _dev_signature(self):
+        # O mtime do diretório muda quando um device node é criado ou removido
+        signature = []
+        for path in ('/dev', '/dev/serial/by-id'):
+            try:
+                signature.append(os.stat(path).st_mtime_ns)
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+
+    def _watch(self):
+        watch_dev = platform.system() == 'Linux' and os.path.isdir('/dev')
+        last_signature = self._dev_signature() if watch_dev else None
+        last_refresh = time.time()
+        
+        while self.running:
+            try:
+                if watch_dev:
+                    time.sleep(DEV_WATCH_INTERVAL)
+                    signature = self._dev_signature()
+                    if signature != last_signature:
+                        last_signature = signature
+                        time.sleep(0.2)  # Dar tempo ao udev para criar links e permissões
+                        self.refresh()
+                        last_refresh = time.time()
+                    elif time.time() - last_refresh >= PORT_RESYNC_INTERVAL:
+                        self.refresh()
+                        last_refresh = time.time()
+                else:
+                    time.sleep(PORT_POLL_INTERVAL)
+                    self.refresh()
+            except Exception as e:
+                print(f"❌ Erro no inventário de portas: {e}")
+                time.sleep(1)
+
+port_inventory = SerialPortInventory()
+
+# Hot reload dos arquivos de configuração
+CONFIG_POLL_INTERVAL = 0.5  # Fallback por mtime quando não há inotify
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+INOTIFY_EVENT = struct.Struct('iIII')
+
+def open_inotify(directory):
+    """Abrir um descritor inotify para o diretório (Linux) ou None se indisponível"""
+    if platform.system() != 'Linux':
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            return None
+        mask = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+        if libc.inotify_add_watch(fd, os.fsencode(directory), mask) < 0:
+            os.close(fd)
+            return None
+        return fd
+    except (OSError, AttributeError):
+        return None
+
+class ConfigWatcher:
+    """Detectar edições em game_config.json/serial_config.json e aplicá-las fora das requisições"""
+
+    def __init__(self):
+        self.running = False
+        self.thread = None
+        self.mode = None
+        self.reload_count = 0
+        self.last_error = None
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._watch, name='config-watcher', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+
+    def _files(self):
+        return {
+            os.path.basename(GAME_CONFIG_FILE): self._apply_game_config,
+            os.path.basename(CONFIG_FILE): self._apply_serial_config
+        }
+
+    def _watch(self):
+        directory = os.path.dirname(os.path.abspath(GAME_CONFIG_FILE))
+        fd = open_inotify(directory)
+        self.mode = 'inotify' if fd is not None else 'polling'
+        print(f"👀 Monitorando arquivos de configuração ({self.mode})")
+        try:
+            if fd is not None:
+                self._watch_inotify(fd)
+            else:
+                self._watch_polling()
+        finally:
+            if fd is not None:
+                os.close(fd)
+
+    def _watch_inotify(self, fd):
+        files = self._files()
+        while self.running:
+            readable, _, _ = select.select([fd], [], [], 1.0)
+            if not readable:
+                continue
+            try:
+                data = os.read(fd, 4096)
+            except BlockingIOError:
+                continue
+            
+            changed = set()
+            offset = 0
+            while offset < len(data):
+                _, _, _, name_len = INOTIFY_EVENT.unpack_from(data, offset)
+                offset += INOTIFY_EVENT.size
+                name = data[offset:offset + name_len].rstrip(b'\0').decode(errors='ignore')
+                offset += name_len
+                if name in files:
+                    changed.add(name)
+            
+            for name in changed:
+                files[name]()
+
+    def _watch_polling(self):
+        files = self._files()
+        signatures = {name: self._signature(name) for name in files}
+        while self.running:
+            time.sleep(CONFIG_POLL_INTERVAL)
+            for name, apply in files.items():
+                signature = self._signature(name)
+                if signature != signatures[name]:
+                    signatures[name] = signature
+                    apply()
+
+    def _signature(self, name):
+        try:
+            stat = os.stat(name)
+            return (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            return None
+
+    def _read_json(self, path):
+        try:
+            with open(path, 'rb') as f:
+                content = f.read()
+            # Nossas próprias gravações também disparam o evento; a memória já pode estar
+            # à frente do arquivo (nova alteração esperando o config_writer), então ignorar
+            if is_own_json_write(path, content):
+                return None
+            return json.loads(content.decode('utf-8'))
+        except (OSError, ValueError) as e:
+            # Arquivo ausente ou ainda sendo escrito: manter configuração atual
+            self.last_error = f"{path}: {e}"
+            print(f"⚠️ Ignorando {path} inválido: {e}")
+            return None
+
+    def _apply_game_config(self):
+        raw = self._read_json(GAME_CONFIG_FILE)
+        if raw is None:
+            return
+        try:
+            new_config = validate_game_config(raw)
+        except (TypeError, ValueError) as e:
+            self.last_error = f"{GAME_CONFIG_FILE}: {e}"
+            print(f"⚠️ Configuração inválida em {GAME_CONFIG_FILE}, mantendo a atual: {e}")
+            return
+        
+        set_game_config(new_config)
+        self.reload_count += 1
+        print(f"🔄 {GAME_CONFIG_FILE} alterado - nova configuração aplicada: {new_config}")
+
+    def _apply_serial_config(self):
+        raw = self._read_json(CONFIG_FILE)
+        if not isinstance(raw, dict):
+            return
+        new_port = raw.get('serial_port')
+        if new_port and new_port != SERIAL_PORT:
+            self.reload_count += 1
+            print(f"🔄 {CONFIG_FILE} alterado - trocando porta serial para {new_port}")
+            change_serial_port(new_port)
+
+config_watcher = ConfigWatcher()
+
 def change_serial_port(new_port):
     """Alterar porta serial e reconectar"""
     global SERIAL_PORT
@@ -258,6 +674,8 @@ def change_serial_port(new_port):
         # Atualizar porta
         SERIAL_PORT = new_port
         save_serial_config(new_port)
+        if arduino_reader:
+            arduino_reader.port = new_port
         
         # Reconectar se uma nova porta foi especificada
         if new_port and arduino_reader:
@@ -276,6 +694,13 @@ def change_serial_port(new_port):
         print(f"❌ Erro ao alterar porta: {e}")
         return False
 
+# Relógio do jogo: monotônico (não salta com ajustes de NTP/fuso), na escala de time.time()
+GAME_CLOCK_EPOCH = time.time() - time.monotonic()
+
+def game_clock():
+    """Instante atual para toda a lógica de tempo do jogo (pedaladas, timeout, decaimento)"""
+    return time.monotonic() + GAME_CLOCK_EPOCH
+
 # Estado do jogo
 game_state = {
     'player1_energy': 0,
@@ -291,155 +716,1759 @@ game_state = {
     'players_ready': [False, False, False, False],  # NOVO: Jogadores que deram primeira pedalada
     'game_can_start': False,  # NOVO: Se todos os jogadores estão prontos
     'game_frozen': False,  # NOVO: Se o jogo está congelado (alguém venceu)
-    'winner_player': 0  # NOVO: Jogador que venceu (0 = ninguém)
+    'winner_player': 0,  # NOVO: Jogador que venceu (0 = ninguém)
+    'rpm': [0, 0, 0, 0],  # Cadência instantânea (última pedalada)
+    'rpm_avg': [0, 0, 0, 0],  # Cadência média das últimas pedaladas
+    'power_watts': [0, 0, 0, 0],  # Potência estimada
+    'peak_rpm': [0, 0, 0, 0],  # Maior cadência da partida
+    'peak_watts': [0, 0, 0, 0]  # Maior potência da partida
 }
 
-# Timer para decaimento de energia (funciona independentemente do jogo)
-last_decay_time = time.time()
-DECAY_INTERVAL = 0.5  # Verificar decaimento a cada 0.5 segundos
+# Serial, handlers HTTP (uma thread por conexão) e decaimento alteram o estado: pedalada,
+# vitória e reset acontecem inteiros sob este lock (reentrante: pedalada -> vitória)
+game_lock = threading.RLock()
 
-def apply_energy_decay():
-    """Aplicar decaimento de energia para todos os jogadores"""
-    global last_decay_time
-    current_time = time.time()
-    
-    # Verificar se é hora de aplicar decaimento
-    if current_time - last_decay_time >= DECAY_INTERVAL:
-        last_decay_time = current_time
+# Análise de cadência por jogador
+CADENCE_RING_SIZE = 16  # Últimas 16 pedaladas por jogador
+CADENCE_MAX_GAP = 2.0  # Intervalo maior que isso = jogador parou (recomeça a janela)
+PEDALS_PER_REVOLUTION = 1.0  # Pedaladas reportadas pelo Arduino por volta do pedivela
+ESTIMATED_CRANK_TORQUE = 20.0  # Torque médio estimado no pedivela (N·m)
+
+class PedalCadenceTracker:
+    """Anel fixo de timestamps de pedaladas com cadência, RPM e potência em O(1) por evento"""
+
+    def __init__(self, size=CADENCE_RING_SIZE):
+        self.size = size
+        self.timestamps = array('d', [0.0]) * size
+        self.reset()
+
+    def reset(self):
+        self.head = 0  # Próxima posição a escrever
+        self.count = 0  # Pedaladas válidas na janela atual
+        self.total_pedals = 0
+        self.rpm = 0.0
+        self.rpm_avg = 0.0
+        self.watts = 0.0
+        self.peak_rpm = 0.0
+        self.peak_watts = 0.0
+        self.rpm_sum = 0.0  # Soma das cadências da partida (média sem varrer histórico)
+        self.rpm_samples = 0
+
+    def record(self, timestamp):
+        previous = self.timestamps[(self.head - 1) % self.size] if self.count else None
+        self.total_pedals += 1
+        if previous is not None and timestamp <= previous:
+            return  # Mesmo instante (ex.: lote de pedaladas): não dá para medir intervalo
         
-        # Se o jogo está congelado, não aplicar decaimento
-        if game_state['game_frozen']:
-            print(f"🧊 Jogo congelado - Jogador {game_state['winner_player']} venceu! Decaimento pausado.")
+        self.timestamps[self.head] = timestamp
+        self.head = (self.head + 1) % self.size
+        
+        if previous is None or timestamp - previous > CADENCE_MAX_GAP:
+            # Primeira pedalada após uma pausa: janela recomeça nela
+            self.count = 1
+            self.rpm = self.rpm_avg = self.watts = 0.0
             return
         
-        print(f"⏰ Aplicando decaimento de energia... (Taxa: {game_config['energy_decay_rate']}%/s)")
+        self.count = min(self.count + 1, self.size)
+        oldest = self.timestamps[(self.head - self.count) % self.size]
         
-        for player_idx in range(4):
-            energy_key = f'player{player_idx + 1}_energy'
-            is_pedaling = game_state['is_pedaling'][player_idx]
-            current_energy = game_state[energy_key]
-            
-            print(f"🔍 Jogador {player_idx + 1}: Energia={current_energy:.1f}%, Pedalando={is_pedaling}")
-            
-            # Resetar is_pedaling se passou muito tempo desde a última pedalada (modo teclado)
-            last_pedal_time = game_state['last_pedal_time'][player_idx]
-            if last_pedal_time > 0 and current_time - last_pedal_time > 2.0:  # 2s sem pedalada
-                game_state['is_pedaling'][player_idx] = False
-                is_pedaling = False
-                print(f"🔄 Jogador {player_idx + 1}: Resetando estado de pedalada (tempo: {current_time - last_pedal_time:.1f}s)")
-            
-            # Aplicar decaimento apenas se o jogador não estiver pedalando
-            if not is_pedaling and current_energy > 0:
-                # Calcular decaimento para o intervalo usando configuração
-                decay_amount = game_config['energy_decay_rate'] * DECAY_INTERVAL
-                new_energy = max(0, current_energy - decay_amount)
-                game_state[energy_key] = new_energy
-                
-                # Log da mudança
-                if new_energy > 0:
-                    print(f"🛑 Jogador {player_idx + 1}: {current_energy:.1f}% → {new_energy:.1f}% (Decaimento: {decay_amount:.1f}%)")
-                else:
-                    print(f"🛑 Jogador {player_idx + 1}: {current_energy:.1f}% → 0% (Energia esgotada)")
-            elif is_pedaling:
-                print(f"✅ Jogador {player_idx + 1}: Pedalando, sem decaimento")
-            else:
-                print(f"⏸️ Jogador {player_idx + 1}: Energia já em 0%")
+        self.rpm = 60.0 / ((timestamp - previous) * PEDALS_PER_REVOLUTION)
+        self.rpm_avg = 60.0 * (self.count - 1) / ((timestamp - oldest) * PEDALS_PER_REVOLUTION)
+        self.watts = ESTIMATED_CRANK_TORQUE * 2 * math.pi * self.rpm_avg / 60.0
         
-        print("=" * 50)
+        self.peak_rpm = max(self.peak_rpm, self.rpm_avg)
+        self.peak_watts = max(self.peak_watts, self.watts)
+        self.rpm_sum += self.rpm_avg
+        self.rpm_samples += 1
 
-# Thread independente para decaimento de energia
-decay_thread = None
-decay_running = False
+    def idle(self):
+        """Jogador parou de pedalar: zerar valores instantâneos (picos são mantidos)"""
+        self.count = 0
+        self.rpm = self.rpm_avg = self.watts = 0.0
 
-def start_decay_thread():
-    """Iniciar thread independente para decaimento de energia"""
-    global decay_thread, decay_running
-    if not decay_running:
-        decay_running = True
-        decay_thread = threading.Thread(target=decay_worker, daemon=True)
-        decay_thread.start()
-        print("⏰ Thread de decaimento iniciada")
+    def snapshot(self):
+        """Acumulados da partida (a janela de cadência recomeça após um restart)"""
+        return {
+            'total_pedals': self.total_pedals,
+            'peak_rpm': self.peak_rpm,
+            'peak_watts': self.peak_watts,
+            'rpm_sum': self.rpm_sum,
+            'rpm_samples': self.rpm_samples
+        }
 
-def stop_decay_thread():
-    """Parar thread de decaimento"""
-    global decay_running
-    decay_running = False
-    print("⏰ Thread de decaimento parada")
+    def restore(self, data):
+        self.reset()
+        self.total_pedals = int(data.get('total_pedals', 0))
+        self.peak_rpm = float(data.get('peak_rpm', 0.0))
+        self.peak_watts = float(data.get('peak_watts', 0.0))
+        self.rpm_sum = float(data.get('rpm_sum', 0.0))
+        self.rpm_samples = int(data.get('rpm_samples', 0))
 
-def decay_worker():
-    """Worker thread para aplicar decaimento continuamente"""
-    global last_decay_time
-    while decay_running:
-        try:
-            apply_energy_decay()
-            time.sleep(0.1)  # Verificar a cada 100ms
-        except Exception as e:
-            print(f"❌ Erro na thread de decaimento: {e}")
-            time.sleep(1)
+    def summary(self):
+        return {
+            'total_pedals': self.total_pedals,
+            'peak_rpm': round(self.peak_rpm, 1),
+            'average_rpm': round(self.rpm_sum / self.rpm_samples, 1) if self.rpm_samples else 0,
+            'peak_watts': round(self.peak_watts, 1)
+        }
 
-class ArduinoMegaReader:
-    def __init__(self, port=None):
-        self.port = port or SERIAL_PORT
-        self.serial_conn = None
-        self.running = False
+cadence_trackers = [PedalCadenceTracker() for _ in range(4)]
 
-    def start(self):
-        if not self.port:
-            print("⚠️ Nenhuma porta serial configurada")
-            return False
-            
-        try:
-            self.serial_conn = serial.Serial(self.port, SERIAL_BAUDRATE, timeout=1)
-            self.running = True
-            print(f"📡 Conectado ao Arduino Mega na porta {self.port}")
+def publish_cadence(player_idx):
+    """Copiar os valores do tracker para o estado enviado aos clientes"""
+    tracker = cadence_trackers[player_idx]
+    game_state['rpm'][player_idx] = round(tracker.rpm, 1)
+    game_state['rpm_avg'][player_idx] = round(tracker.rpm_avg, 1)
+    game_state['power_watts'][player_idx] = round(tracker.watts, 1)
+    game_state['peak_rpm'][player_idx] = round(tracker.peak_rpm, 1)
+    game_state['peak_watts'][player_idx] = round(tracker.peak_watts, 1)
 
-            # Thread de leitura serial
-            self.read_thread = threading.Thread(target=self._read_serial, daemon=True)
-            self.read_thread.start()
+def record_pedal_cadence(player_idx, timestamp, missed=0):
+    """Registrar uma pedalada completa na análise de cadência
+
+    missed = pedaladas perdidas na serial antes desta; entram com instantes
+    interpolados desde a anterior para não distorcer a cadência. Só as últimas
+    que cabem no anel são interpoladas (custo limitado); as demais só contam.
+    """
+    tracker = cadence_trackers[player_idx]
+    if missed and tracker.count:
+        previous = tracker.timestamps[(tracker.head - 1) % tracker.size]
+        step = (timestamp - previous) / (missed + 1)
+        skipped = max(0, missed - tracker.size)
+        tracker.total_pedals += skipped
+        for k in range(skipped + 1, missed + 1):
+            tracker.record(previous + step * k)
+    else:
+        tracker.total_pedals += missed
+    tracker.record(timestamp)
+    publish_cadence(player_idx)
+
+def reset_cadence():
+    for player_idx, tracker in enumerate(cadence_trackers):
+        tracker.reset()
+        publish_cadence(player_idx)
+    for player_idx in range(4):
+        partial_energy_credit[player_idx] = 0.0
+
+# Energia já creditada por leituras parciais da pedalada em andamento (modo partial_energy)
+partial_energy_credit = [0.0, 0.0, 0.0, 0.0]
+
+# Histórico de partidas e ranking do dia / geral
+GAME_HISTORY_FILE = 'game_history.jsonl'  # Uma linha JSON por partida terminada (só acrescenta)
+LEADERBOARD_FILE = 'leaderboard.json'
+LEADERBOARD_SIZE = 10  # Posições guardadas por métrica
+
+# Métrica -> (descrição, menor é melhor)
+LEADERBOARD_METRICS = {
+    'fastest_win': ('Mais rápido até 100% (s)', True),
+    'peak_rpm': ('Maior cadência (RPM)', False),
+    'most_pedals': ('Mais pedaladas', False)
+}
+
+current_game_started_at = None  # Primeira pedalada após o reset (início real da disputa)
+history_lock = threading.Lock()
+
+def build_game_record(winner_idx, finished_at):
+    """Resumo da partida terminada, com as estatísticas de cada jogador"""
+    started_at = current_game_started_at or finished_at
+    players = []
+    for player_idx, tracker in enumerate(cadence_trackers):
+        summary = tracker.summary()
+        summary['player'] = player_idx + 1
+        summary['energy'] = round(game_state[f'player{player_idx + 1}_energy'], 1)
+        players.append(summary)
+    return {
+        'finished_at': finished_at,
+        'started_at': started_at,
+        'duration': round(finished_at - started_at, 2),
+        'winner_player': winner_idx + 1,
+        'energy_gain_rate': game_config['energy_gain_rate'],
+        'energy_decay_rate': game_config['energy_decay_rate'],
+        'players': players
+    }
+
+def append_game_history(record):
+    """Acrescentar a partida ao histórico (append + fsync, nunca reescreve o arquivo)"""
+    line = json.dumps(record, ensure_ascii=False) + '\n'
+    with history_lock:
+        with open(GAME_HISTORY_FILE, 'a', encoding='utf-8') as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+
+def iter_game_history(since=None, until=None, player=None, winner=None):
+    """Partidas do histórico uma a uma, filtradas durante a leitura (memória constante)
+
+    since/until: intervalo [since, until) de finished_at; player: só partidas em
+    que o jogador pedalou; winner: só partidas que o jogador venceu. Linhas
+    corrompidas (ou a última, ainda sendo escrita) são ignoradas.
+    """
+    try:
+        with open(GAME_HISTORY_FILE, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    finished_at = record['finished_at']
+                except (ValueError, TypeError, KeyError):
+                    continue
+                if since is not None and finished_at < since:
+                    continue
+                if until is not None and finished_at >= until:
+                    continue
+                if winner is not None and record.get('winner_player') != winner:
+                    continue
+                if player is not None and not any(
+                        p.get('player') == player and p.get('total_pedals', 0) > 0
+                        for p in record.get('players', [])):
+                    continue
+                yield record
+    except FileNotFoundError:
+        return
+
+def local_day(timestamp):
+    return time.strftime('%Y-%m-%d', time.localtime(timestamp))
+
+def next_midnight(timestamp):
+    tm = time.localtime(timestamp)
+    return time.mktime((tm.tm_year, tm.tm_mon, tm.tm_mday + 1, 0, 0, 0, 0, 0, -1))
+
+class Leaderboard:
+    """Top-N por métrica (heap limitado), geral e do dia, com a resposta HTTP já codificada
+
+    Cada heap guarda as N melhores marcas com a pior delas na raiz: uma partida
+    nova custa O(log N) por métrica e nunca é preciso varrer o histórico.
+    """
+
+    def __init__(self, size=LEADERBOARD_SIZE):
+        self.size = size
+        self.lock = threading.Lock()
+        self.sequence = 0
+        self.day = local_day(time.time())
+        self.rollover_at = next_midnight(time.time())
+        self.all_time = {metric: [] for metric in LEADERBOARD_METRICS}
+        self.today = {metric: [] for metric in LEADERBOARD_METRICS}
+        self.games_total = 0
+        self.games_today = 0
+        self.encoded = b''
+        self._encode()
+
+    def _push(self, heap, metric, entry):
+        lower_is_better = LEADERBOARD_METRICS[metric][1]
+        # Chave maior = marca melhor; o desempate favorece quem chegou primeiro
+        key = (-entry['value'] if lower_is_better else entry['value'], -self.sequence)
+        self.sequence += 1
+        if len(heap) < self.size:
+            heapq.heappush(heap, (key, entry))
+        elif key > heap[0][0]:
+            heapq.heapreplace(heap, (key, entry))
+
+    def _entries(self, record):
+        """Marcas da partida para cada métrica"""
+        base = {'finished_at': record['finished_at'], 'day': local_day(record['finished_at'])}
+        winner = record['winner_player']
+        if winner and record.get('duration', 0) > 0:
+            yield 'fastest_win', dict(base, player=winner, value=record['duration'])
+        for player in record['players']:
+            if player.get('peak_rpm', 0) > 0:
+                yield 'peak_rpm', dict(base, player=player['player'], value=player['peak_rpm'])
+            if player.get('total_pedals', 0) > 0:
+                yield 'most_pedals', dict(base, player=player['player'], value=player['total_pedals'])
+
+    def _check_rollover(self, now):
+        if now >= self.rollover_at:
+            self.day = local_day(now)
+            self.rollover_at = next_midnight(now)
+            self.today = {metric: [] for metric in LEADERBOARD_METRICS}
+            self.games_today = 0
             return True
+        return False
 
-        except Exception as e:
-            print(f"❌ Erro ao conectar com Arduino Mega: {e}")
-            return False
+    def _add(self, record):
+        is_today = local_day(record['finished_at']) == self.day
+        self.games_total += 1
+        if is_today:
+            self.games_today += 1
+        for metric, entry in self._entries(record):
+            self._push(self.all_time[metric], metric, entry)
+            if is_today:
+                self._push(self.today[metric], metric, entry)
 
-    def stop(self):
-        self.running = False
-        if self.serial_conn:
-            self.serial_conn.close()
+    def add_game(self, record):
+        with self.lock:
+            self._check_rollover(record['finished_at'])
+            self._add(record)
+            self._encode()
+            snapshot = self.to_dict()
+        return snapshot
 
-    def _read_serial(self):
-        print("🔄 Thread de leitura serial iniciada")
-        while self.running:
-            try:
-                # OTIMIZAÇÃO: Processar múltiplas linhas de uma vez
-                if self.serial_conn and self.serial_conn.in_waiting:
-                    print(f"📡 Dados disponíveis: {self.serial_conn.in_waiting} bytes")
-                    while self.serial_conn.in_waiting > 0:
-                        line = self.serial_conn.readline().decode('utf-8', errors='ignore').strip()
-                        if line:
-                            print(f"📨 Linha recebida: {line}")
-                            self._process_line(line)
-                time.sleep(0.001)  # Reduzido de 10ms para 1ms
-            except Exception as e:
-                print(f"❌ Erro na leitura serial: {e}")
-                time.sleep(1)
+    def _ranking(self, heap):
+        return [entry for _, entry in sorted(heap, reverse=True)]
 
-    def _process_line(self, line):
-        # Processar mensagens do Arduino Mega com 4 jogadores
-        current_time = time.time()
-        
-        print(f"📨 Arduino: {line}")  # Debug: mostrar todas as mensagens
+    def to_dict(self):
+        return {
+            'day': self.day,
+            'games_total': self.games_total,
+            'games_today': self.games_today,
+            'metrics': {metric: {'label': label, 'lower_is_better': lower}
+                        for metric, (label, lower) in LEADERBOARD_METRICS.items()},
+            'today': {metric: self._ranking(heap) for metric, heap in self.today.items()},
+            'all_time': {metric: self._ranking(heap) for metric, heap in self.all_time.items()}
+        }
+
+    def _encode(self):
+        self.encoded = json.dumps(self.to_dict(), ensure_ascii=False).encode('utf-8')
+
+    def response_body(self):
+        """Resposta pronta para /api/leaderboard (recodificada só quando muda)"""
+        now = time.time()
+        if now >= self.rollover_at:
+            with self.lock:
+                if self._check_rollover(now):
+                    self._encode()
+        return self.encoded
+
+    def load(self):
+        """Carregar o ranking salvo; sem arquivo, reconstruir a partir do histórico"""
+        try:
+            with open(LEADERBOARD_FILE, encoding='utf-8') as f:
+                data = json.load(f)
+            with self.lock:
+                self.games_total = int(data.get('games_total', 0))
+                same_day = data.get('day') == self.day
+                self.games_today = int(data.get('games_today', 0)) if same_day else 0
+                for metric in LEADERBOARD_METRICS:
+                    # Reinserir do melhor para o pior mantém o desempate por ordem de chegada
+                    for entry in data.get('all_time', {}).get(metric, []):
+                        self._push(self.all_time[metric], metric, entry)
+                    for entry in data.get('today', {}).get(metric, []) if same_day else []:
+                        self._push(self.today[metric], metric, entry)
+                self._encode()
+            print(f"🏅 Ranking carregado: {self.games_total} partidas ({self.games_today} hoje)")
+            return
+        except FileNotFoundError:
+            pass
+        except (ValueError, TypeError, AttributeError, KeyError) as e:
+            print(f"⚠️ {LEADERBOARD_FILE} inválido ({e}) - reconstruindo a partir do histórico")
         
-        # CAPTURAR PEDALADAS POR JOGADOR (Arduino Mega) - FORMATO OTIMIZADO
-        if "🔍 J" in line and ":" in line:
-            try:
-                # Verificar se o jogo está congelado
-                if game_state['game_frozen']:
-                    print(f"🧊 Jogo congelado - Jogador {game_state['winner_player']} venceu! Pedaladas ignoradas.")
-                    return
-                
-                # Extrair número do jogador do formato otimizado "🔍 J1:5"
-                if "J1:" in line:
+        games = 0
+        with self.lock:
+            for record in iter_game_history():
+                self._add(record)
+                games += 1
+            self._encode()
+        if games:
+            print(f"🏅 Ranking reconstruído a partir de {games} partidas do histórico")
+            self.save()
+
+    def save(self):
+        with self.lock:
+            data = self.to_dict()
+        write_json_atomic(LEADERBOARD_FILE, data, indent=2, ensure_ascii=False)
+
+leaderboard = Leaderboard()
+
+# Exportação do histórico em streaming (/api/history/export)
+HISTORY_EXPORT_CHUNK = 64 * 1024  # Bytes acumulados antes de enviar um pedaço
+HISTORY_EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+    'json': 'application/json'
+}
+# CSV: uma linha por jogador de cada partida
+HISTORY_CSV_COLUMNS = ('finished_at', 'started_at', 'duration', 'winner_player', 'player', 'energy',
+                       'total_pedals', 'peak_rpm', 'average_rpm', 'peak_watts')
+
+def parse_history_bound(value, end=False):
+    """Data local AAAA-MM-DD (como fim, inclui o dia inteiro) ou timestamp em segundos"""
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    tm = time.strptime(value, '%Y-%m-%d')
+    start = time.mktime((tm.tm_year, tm.tm_mon, tm.tm_mday, 0, 0, 0, 0, 0, -1))
+    return next_midnight(start) if end else start
+
+def format_history_time(timestamp):
+    return time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(timestamp))
+
+def _history_csv(records, player):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow(HISTORY_CSV_COLUMNS)
+    for record in records:
+        for summary in record.get('players', []):
+            if player is not None and summary.get('player') != player:
+                continue
+            writer.writerow((
+                format_history_time(record['finished_at']),
+                format_history_time(record.get('started_at', record['finished_at'])),
+                record.get('duration'),
+                record.get('winner_player'),
+                summary.get('player'),
+                summary.get('energy'),
+                summary.get('total_pedals'),
+                summary.get('peak_rpm'),
+                summary.get('average_rpm'),
+                summary.get('peak_watts')
+            ))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+def _history_ndjson(records):
+    for record in records:
+        yield json.dumps(record, ensure_ascii=False) + '\n'
+
+def _history_json(records):
+    separator = '\n'
+    yield '['
+    for record in records:
+        yield separator + json.dumps(record, ensure_ascii=False)
+        separator = ',\n'
+    yield '\n]\n'
+
+def export_game_history(export_format, since=None, until=None, player=None, winner=None):
+    """Gerador de pedaços (~HISTORY_EXPORT_CHUNK bytes) do histórico filtrado
+
+    O arquivo é lido linha a linha enquanto a resposta sai, então a memória
+    não cresce com o tamanho do histórico. Não segura o history_lock: uma
+    partida gravada durante o download entra ou não, mas nunca pela metade.
+    """
+    records = iter_game_history(since, until, player, winner)
+    if export_format == 'csv':
+        pieces = _history_csv(records, player)
+    elif export_format == 'ndjson':
+        pieces = _history_ndjson(records)
+    else:
+        pieces = _history_json(records)
+    
+    chunk = []
+    size = 0
+    for piece in pieces:
+        data = piece.encode('utf-8')
+        chunk.append(data)
+        size += len(data)
+        if size >= HISTORY_EXPORT_CHUNK:
+            yield b''.join(chunk)
+            chunk = []
+            size = 0
+    if chunk:
+        yield b''.join(chunk)
+
+def record_finished_game(winner_idx, finished_at=None):
+    """Guardar a partida no histórico e atualizar o ranking"""
+    try:
+        record = build_game_record(winner_idx, finished_at or game_clock())
+        append_game_history(record)
+        leaderboard.add_game(record)
+        leaderboard.save()
+        print(f"🏅 Partida registrada: Jogador {winner_idx + 1} em {record['duration']:.1f}s")
+    except Exception as e:
+        print(f"❌ Erro ao registrar partida no histórico: {e}")
+
+def declare_winner(player_idx, timestamp=None):
+    """Congelar o jogo com o jogador como vencedor (timestamp = instante da pedalada decisiva)"""
+    with game_lock:
+        if game_state['game_frozen']:
+            return  # Outra thread declarou a vitória primeiro
+        print(f"🏆 VITÓRIA! Jogador {player_idx + 1} atingiu 100% de energia!")
+        game_state['game_frozen'] = True
+        game_state['winner_player'] = player_idx + 1
+        game_state['game_active'] = False
+        print(f"🧊 JOGO CONGELADO! Jogador {player_idx + 1} venceu!")
+        send_udp_message('winner', player_idx + 1)
+        record_finished_game(player_idx, timestamp)
+        state_snapshotter.request()
+
+def add_player_energy(player_idx, amount, timestamp=None):
+    """Somar energia ao jogador (máx. 100%) e declarar vitória ao chegar em 100%"""
+    if energy_engine is not None:
+        return energy_engine.add_energy(player_idx, amount)
+    energy_key = f'player{player_idx + 1}_energy'
+    with game_lock:
+        game_state[energy_key] = min(100, game_state[energy_key] + amount)
+        if game_state[energy_key] >= 100 and not game_state['game_frozen']:
+            declare_winner(player_idx, timestamp)
+        return game_state[energy_key]
+
+def mark_pedaling(player_idx, timestamp):
+    """Marcar o jogador como pedalando agora (sem completar uma pedalada)"""
+    if energy_engine is not None:
+        energy_engine.mark_pedaling(player_idx, timestamp)
+        return
+    with game_lock:
+        game_state['is_pedaling'][player_idx] = True
+        game_state['inactivity_count'][player_idx] = 0
+        game_state['last_pedal_time'][player_idx] = timestamp
+
+def register_pedal(player_idx, timestamp, energy_gain, pedal_count=None, missed=0):
+    """Aplicar uma pedalada completa (sensor ou teclado) e retornar a nova energia
+
+    missed = pedaladas anteriores perdidas na serial, já incluídas em energy_gain.
+    """
+    global current_game_started_at
+    with game_lock:
+        if game_state['game_frozen']:
+            # Vitória declarada por outra thread depois da checagem de quem chamou
+            return game_state[f'player{player_idx + 1}_energy']
+        if current_game_started_at is None:
+            current_game_started_at = timestamp
+        record_pedal_cadence(player_idx, timestamp, missed)
+        if energy_engine is not None:
+            return energy_engine.pedal(player_idx, timestamp, energy_gain, pedal_count)
+        
+        mark_pedaling(player_idx, timestamp)
+        if pedal_count is None:
+            game_state['pedal_count'][player_idx] += 1
+        else:
+            game_state['pedal_count'][player_idx] = pedal_count
+        return add_player_energy(player_idx, energy_gain, timestamp)
+
+def credit_missed_pedals(player_idx, timestamp, energy_gain, pedal_count):
+    """Creditar pedaladas recuperadas pelo total da placa (energia e contador) e retornar a nova energia
+
+    O instante delas é desconhecido: não entram na cadência nem marcam o jogador como pedalando.
+    """
+    global current_game_started_at
+    with game_lock:
+        if game_state['game_frozen']:
+            return game_state[f'player{player_idx + 1}_energy']
+        if current_game_started_at is None:
+            current_game_started_at = timestamp
+        if energy_engine is not None:
+            return energy_engine.credit_pedals(player_idx, energy_gain, pedal_count)
+        
+        game_state['pedal_count'][player_idx] = pedal_count
+        return add_player_energy(player_idx, energy_gain, timestamp)
+
+def is_finite_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+MAX_BATCH_EVENTS = 1000  # Limite de eventos por POST /api/pedal/batch
+MAX_EVENT_COUNT = 50  # Limite de pedaladas agrupadas em um único evento
+
+def apply_pedal_batch(events, now=None):
+    """Aplicar em ordem uma lista de eventos {player, count, ts}; retorna (aplicados, ignorados)
+
+    ts é o relógio do cliente em ms; só os intervalos entre eventos são usados
+    (o evento mais recente corresponde a agora), limitados a PEDALING_TIMEOUT
+    para um ts absurdo não jogar a pedalada para longe no passado. Evento com
+    ts que não é número finito é ignorado.
+    """
+    now = game_clock() if now is None else now
+    timestamps = [event.get('ts') for event in events if isinstance(event, dict)]
+    timestamps = [ts for ts in timestamps if is_finite_number(ts)]
+    newest_ts = max(timestamps) if timestamps else None
+    energy_gain = game_config['energy_gain_rate']
+    
+    applied = ignored = 0
+    with game_lock:  # O lote inteiro é aplicado sem outra pedalada ou reset no meio
+        for event in events:
+            if game_state['game_frozen']:
+                ignored += len(events) - applied - ignored
+                break
+            try:
+                player_id = int(event.get('player', 0))
+                count = min(MAX_EVENT_COUNT, int(event.get('count', 1)))
+            except (AttributeError, TypeError, ValueError):
+                ignored += 1
+                continue
+            if not 1 <= player_id <= 4 or count <= 0:
+                ignored += 1
+                continue
+        
+            ts = event.get('ts')
+            if ts is None:
+                timestamp = now
+            elif is_finite_number(ts):
+                timestamp = now - min(PEDALING_TIMEOUT, (newest_ts - ts) / 1000.0)
+            else:
+                ignored += 1
+                continue
+            for _ in range(count):
+                if game_state['game_frozen']:
+                    break  # Vitória no meio do evento: o resto não conta
+                register_pedal(player_id - 1, timestamp, energy_gain)
+            applied += 1
+    return applied, ignored
+
+def reset_players():
+    """Zerar energia, contadores e estado de pedalada de todos os jogadores"""
+    global current_game_started_at
+    with game_lock:
+        current_game_started_at = None
+        if energy_engine is not None:
+            energy_engine.reset()
+        for i in range(4):
+            game_state[f'player{i+1}_energy'] = 0
+            game_state['pedal_count'][i] = 0
+            game_state['is_pedaling'][i] = False
+            game_state['inactivity_count'][i] = 0
+            game_state['last_pedal_time'][i] = 0
+            game_state['inactivity_timer'][i] = 0
+            game_state['players_ready'][i] = False
+        game_state['game_can_start'] = False
+        reset_cadence()
+        state_snapshotter.request()
+        state_versions.refresh()
+
+# Snapshots do estado do jogo para retomar a partida após um restart
+STATE_SNAPSHOT_FILE = 'game_state_snapshot.json'
+STATE_SNAPSHOT_INTERVAL = 0.5  # Gravar no máximo a cada 500ms (só se algo mudou)
+STATE_SNAPSHOT_MAX_AGE = 900.0  # Snapshot com mais de 15 minutos não é restaurado
+
+def build_state_snapshot():
+    """Estado completo da partida em formato compacto"""
+    return {
+        'saved_at': time.time(),
+        'game_state': game_state,
+        'game_started_at': current_game_started_at,
+        'partial_energy_credit': partial_energy_credit,
+        'cadence': [tracker.snapshot() for tracker in cadence_trackers]
+    }
+
+class StateSnapshotter:
+    """Gravar o estado do jogo periodicamente (temp + rename) quando ele muda"""
+
+    def __init__(self, interval=STATE_SNAPSHOT_INTERVAL):
+        self.interval = interval
+        self.wake = threading.Event()
+        self.running = False
+        self.thread = None
+        self.last_encoded = None
+        self.write_count = 0
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name='state-snapshot', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Parar a thread gravando o estado final"""
+        self.running = False
+        self.wake.set()
+        if self.thread:
+            self.thread.join(timeout=2)
+        self.write()
+
+    def request(self):
+        """Gravar logo (vitória, início ou reset de partida)"""
+        self.wake.set()
+
+    def write(self):
+        snapshot = build_state_snapshot()
+        saved_at = snapshot.pop('saved_at')
+        encoded = json.dumps(snapshot, separators=(',', ':'))
+        if encoded == self.last_encoded:
+            return False
+        snapshot['saved_at'] = saved_at
+        write_json_atomic(STATE_SNAPSHOT_FILE, snapshot, separators=(',', ':'))
+        self.last_encoded = encoded
+        self.write_count += 1
+        return True
+
+    def _run(self):
+        while self.running:
+            self.wake.wait(self.interval)
+            self.wake.clear()
+            try:
+                self.write()
+            except Exception as e:
+                print(f"❌ Erro ao gravar snapshot do estado: {e}")
+                time.sleep(1)
+
+state_snapshotter = StateSnapshotter()
+
+def restore_state_snapshot():
+    """Restaurar a partida do último snapshot (chamado antes de iniciar as threads)"""
+    global current_game_started_at
+    try:
+        with open(STATE_SNAPSHOT_FILE, encoding='utf-8') as f:
+            snapshot = json.load(f)
+    except FileNotFoundError:
+        return False
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Snapshot do estado ilegível ({e}) - começando do zero")
+        return False
+    
+    try:
+        age = time.time() - float(snapshot['saved_at'])
+        if age > STATE_SNAPSHOT_MAX_AGE:
+            print(f"⏭️ Snapshot do estado tem {age / 60:.0f} minutos - ignorado")
+            return False
+        
+        saved_state = snapshot['game_state']
+        for key, value in saved_state.items():
+            if key not in game_state:
+                continue
+            if isinstance(game_state[key], list):
+                if isinstance(value, list) and len(value) == len(game_state[key]):
+                    game_state[key][:] = value
+            else:
+                game_state[key] = value
+        for player_idx, data in enumerate(snapshot.get('cadence', [])[:len(cadence_trackers)]):
+            cadence_trackers[player_idx].restore(data)
+            publish_cadence(player_idx)
+        credits = snapshot.get('partial_energy_credit', [])
+        if len(credits) == len(partial_energy_credit):
+            partial_energy_credit[:] = credits
+        current_game_started_at = snapshot.get('game_started_at')
+    except (KeyError, TypeError, ValueError, AttributeError) as e:
+        print(f"⚠️ Snapshot do estado inválido ({e}) - começando do zero")
+        return False
+    
+    energies = ', '.join(f"J{i + 1}={game_state[f'player{i + 1}_energy']:.1f}%" for i in range(4))
+    status = f"congelado, vencedor J{game_state['winner_player']}" if game_state['game_frozen'] else 'em andamento'
+    print(f"♻️ Estado restaurado de {age:.1f}s atrás ({status}): {energies}")
+    return True
+
+# Versões do estado para long-poll (/api/state?since=<versão>) com respostas só do que mudou
+STATE_POLL_TIMEOUT = 25.0  # Espera padrão de um long-poll sem mudanças
+STATE_POLL_MAX_TIMEOUT = 60.0
+STATE_POLL_COALESCE = 0.05  # Juntar mudanças próximas numa única resposta
+
+class StateVersions:
+    """Número de versão do game_state e a versão em que cada campo mudou pela última vez
+
+    As versões começam no instante de início do servidor (ms), então um cursor
+    de uma execução anterior é sempre menor que a base e recebe o estado completo.
+    """
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.base_version = int(time.time() * 1000)
+        self.version = self.base_version
+        self.values = {}
+        self.field_versions = {}
+
+    def refresh(self):
+        """Comparar o game_state com a última cópia e avançar a versão se algo mudou"""
+        with self.condition:
+            changed = False
+            for key, value in game_state.items():
+                if isinstance(value, list):
+                    value = list(value)
+                if self.values.get(key, self) != value:
+                    if not changed:
+                        changed = True
+                        self.version += 1
+                    self.values[key] = value
+                    self.field_versions[key] = self.version
+            if changed:
+                self.condition.notify_all()
+            return changed
+
+    def changes_since(self, since):
+        """(versão, completo?, campos) — completo se o cursor é desconhecido ou de outra execução"""
+        with self.condition:
+            if since is None or since < self.base_version or since > self.version:
+                return self.version, True, dict(self.values)
+            fields = {key: self.values[key] for key, version in self.field_versions.items() if version > since}
+            return self.version, False, fields
+
+    def wait_for_change(self, since, timeout):
+        """Bloquear até haver versão mais nova que o cursor (ou timeout)"""
+        with self.condition:
+            return self.condition.wait_for(lambda: self.version != since, timeout)
+
+state_versions = StateVersions()
+
+# Codificação compacta do estado para displays e overlays (opt-in por Accept ou ?format=)
+# Ordem fixa dos campos; o JSON de /api/state continua sendo o superconjunto
+STATE_BINARY_CONTENT_TYPE = 'application/vnd.bikejj.state'
+STATE_MSGPACK_CONTENT_TYPE = 'application/msgpack'
+STATE_BINARY_FORMAT_VERSION = 1
+STATE_BINARY_STRUCT = struct.Struct('<BBBBQ4H4I4H4H')  # 52 bytes
+STATE_ENERGY_SCALE = 100  # Energia em centésimos de % (0..10000)
+STATE_RPM_SCALE = 10  # RPM em décimos
+STATE_FLAG_ACTIVE = 0x01
+STATE_FLAG_CAN_START = 0x02
+STATE_FLAG_FROZEN = 0x04
+
+def _quantize(value, scale, limit):
+    return max(0, min(limit, int(round(value * scale))))
+
+def compact_state_fields(state, version):
+    """Campos na ordem do formato binário:
+    formato, flags, vencedor, bits (pedalando | prontos << 4), versão,
+    energia ×4, pedaladas ×4, rpm médio ×4, watts ×4
+    """
+    flags = ((STATE_FLAG_ACTIVE if state['game_active'] else 0)
+             | (STATE_FLAG_CAN_START if state['game_can_start'] else 0)
+             | (STATE_FLAG_FROZEN if state['game_frozen'] else 0))
+    bits = 0
+    for i in range(4):
+        if state['is_pedaling'][i]:
+            bits |= 1 << i
+        if state['players_ready'][i]:
+            bits |= 1 << (i + 4)
+    return (
+        STATE_BINARY_FORMAT_VERSION, flags, state['winner_player'], bits, version,
+        [_quantize(state[f'player{i + 1}_energy'], STATE_ENERGY_SCALE, 10000) for i in range(4)],
+        [_quantize(count, 1, 0xFFFFFFFF) for count in state['pedal_count'][:4]],
+        [_quantize(rpm, STATE_RPM_SCALE, 0xFFFF) for rpm in state['rpm_avg'][:4]],
+        [_quantize(watts, 1, 0xFFFF) for watts in state['power_watts'][:4]]
+    )
+
+def encode_state_binary(state, version):
+    fmt, flags, winner, bits, version, energy, counts, rpm, watts = compact_state_fields(state, version)
+    return STATE_BINARY_STRUCT.pack(fmt, flags, winner, bits, version, *energy, *counts, *rpm, *watts)
+
+def encode_state_msgpack(state, version):
+    return msgpack.packb(compact_state_fields(state, version))
+
+def decode_state_binary(data):
+    """Inverso de encode_state_binary (referência para clientes e benchmark)"""
+    values = STATE_BINARY_STRUCT.unpack(data)
+    _, flags, winner, bits, version = values[:5]
+    energy, counts, rpm, watts = values[5:9], values[9:13], values[13:17], values[17:21]
+    state = {f'player{i + 1}_energy': energy[i] / STATE_ENERGY_SCALE for i in range(4)}
+    state.update({
+        'game_active': bool(flags & STATE_FLAG_ACTIVE),
+        'game_can_start': bool(flags & STATE_FLAG_CAN_START),
+        'game_frozen': bool(flags & STATE_FLAG_FROZEN),
+        'winner_player': winner,
+        'is_pedaling': [bool(bits & (1 << i)) for i in range(4)],
+        'players_ready': [bool(bits & (1 << (i + 4))) for i in range(4)],
+        'pedal_count': list(counts),
+        'rpm_avg': [value / STATE_RPM_SCALE for value in rpm],
+        'power_watts': list(watts)
+    })
+    return version, state
+
+# Formato -> (content type, codificador)
+STATE_ENCODERS = {
+    'binary': (STATE_BINARY_CONTENT_TYPE, encode_state_binary),
+    'msgpack': (STATE_MSGPACK_CONTENT_TYPE, encode_state_msgpack)
+}
+
+# Timer para decaimento de energia (funciona independentemente do jogo)
+last_decay_time = game_clock()
+DECAY_INTERVAL = 0.5  # Verificar decaimento a cada 0.5 segundos
+PEDALING_TIMEOUT = 2.0  # Sem pedalada por 2s = jogador parou
+
+# Motor de energia vetorizado (opcional) para instalações com muitas bicicletas
+ENERGY_ENGINE = os.environ.get('BIKEJJ_ENERGY_ENGINE', 'python')  # 'python' ou 'numpy'
+ENGINE_TICK_INTERVAL = 0.02  # Tick do motor NumPy (ganhos pendentes aplicados a cada 20ms)
+
+class NumpyEnergyEngine:
+    """Estado dos jogadores em arrays NumPy; ganho, decaimento, timeout e vitória calculados por tick
+
+    Pedaladas só são enfileiradas (append em listas, O(1)); cada tick troca as
+    filas por listas novas sob o lock e aplica as antigas com operações de array.
+    """
+
+    def __init__(self, num_players):
+        self.num_players = num_players
+        self.lock = threading.Lock()  # Filas: thread serial e HTTP enfileiram, o tick consome
+        self.energy = np.zeros(num_players)
+        self.is_pedaling = np.zeros(num_players, dtype=bool)
+        self.last_pedal_time = np.zeros(num_players)
+        self.pedal_count = np.zeros(num_players, dtype=np.int64)
+        self.last_decay_time = game_clock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.energy.fill(0)
+            self.is_pedaling.fill(False)
+            self.last_pedal_time.fill(0)
+            self.pedal_count.fill(0)
+            self._clear_events()
+            self._in_flight = {}  # Ganho retirado da fila pelo tick em andamento
+            self._finished = False  # Alguém chegou a 100%: pedaladas seguintes não contam
+            self._energy_cache = [0.0] * self.num_players  # Energia do último tick (respostas imediatas)
+
+    def load(self, state, players=4):
+        """Continuar a partir do dicionário de estado (ex.: snapshot restaurado)"""
+        for i in range(players):
+            self.energy[i] = state[f'player{i + 1}_energy']
+        self.is_pedaling[:players] = state['is_pedaling'][:players]
+        self.last_pedal_time[:players] = state['last_pedal_time'][:players]
+        self.pedal_count[:players] = state['pedal_count'][:players]
+        self._energy_cache = self.energy.tolist()
+
+    def _clear_events(self):
+        self._gain_players = []
+        self._gain_amounts = []
+        self._pending_gain = {}
+        self._pedal_players = []
+        self._pedal_times = []
+        self._counted_players = []
+        self._count_overrides = {}
+
+    def _take_events(self):
+        """Trocar as filas por listas novas e devolver as antigas para o tick aplicar"""
+        with self.lock:
+            events = (self._gain_players, self._gain_amounts, self._pedal_players,
+                      self._pedal_times, self._counted_players, self._count_overrides)
+            self._in_flight = self._pending_gain  # Continua visível até o tick publicar a energia
+            self._clear_events()
+        return events
+
+    def _current_energy(self, player_idx):
+        return (self._energy_cache[player_idx] + self._in_flight.get(player_idx, 0.0)
+                + self._pending_gain.get(player_idx, 0.0))
+
+    def _add_energy(self, player_idx, amount):
+        if self._finished:
+            return min(100.0, self._current_energy(player_idx))
+        self._gain_players.append(player_idx)
+        self._gain_amounts.append(amount)
+        self._pending_gain[player_idx] = self._pending_gain.get(player_idx, 0.0) + amount
+        energy = self._current_energy(player_idx)
+        if energy >= 100:
+            self._finished = True  # Vitória sai no próximo tick; até lá nada mais entra
+        return min(100.0, energy)
+
+    def add_energy(self, player_idx, amount):
+        with self.lock:
+            return self._add_energy(player_idx, amount)
+
+    def mark_pedaling(self, player_idx, timestamp):
+        with self.lock:
+            if not self._finished:
+                self._pedal_players.append(player_idx)
+                self._pedal_times.append(timestamp)
+
+    def pedal(self, player_idx, timestamp, energy_gain, pedal_count=None):
+        with self.lock:
+            if self._finished:
+                return min(100.0, self._current_energy(player_idx))
+            self._pedal_players.append(player_idx)
+            self._pedal_times.append(timestamp)
+            if pedal_count is not None:
+                self._count_overrides[player_idx] = pedal_count  # Contador absoluto da placa
+            elif player_idx in self._count_overrides:
+                self._count_overrides[player_idx] += 1
+            else:
+                self._counted_players.append(player_idx)
+            return self._add_energy(player_idx, energy_gain)
+
+    def credit_pedals(self, player_idx, energy_gain, pedal_count):
+        """Pedaladas sem instante conhecido: contador e energia, sem marcar pedalando"""
+        with self.lock:
+            if self._finished:
+                return min(100.0, self._current_energy(player_idx))
+            self._count_overrides[player_idx] = pedal_count
+            return self._add_energy(player_idx, energy_gain)
+
+    def tick(self, now, decay_rate, frozen):
+        """Avançar um tick; retorna (índice do vencedor ou -1, jogadores que pararam de pedalar)"""
+        gain_players, gain_amounts, pedal_players, pedal_times, counted_players, count_overrides = self._take_events()
+        if frozen:
+            with self.lock:
+                self._in_flight = {}
+            return -1, np.empty(0, dtype=np.intp)
+        
+        # Aplicar de uma vez só os eventos retirados da fila (os que chegarem agora ficam para o próximo tick)
+        if gain_players:
+            self.energy += np.bincount(gain_players, weights=gain_amounts, minlength=self.num_players)
+        if pedal_players:
+            players = np.array(pedal_players, dtype=np.intp)
+            self.is_pedaling[players] = True
+            self.last_pedal_time[players] = pedal_times  # Eventos em ordem: o último vence
+        if counted_players:
+            self.pedal_count += np.bincount(counted_players, minlength=self.num_players)
+        if count_overrides:
+            self.pedal_count[list(count_overrides)] = list(count_overrides.values())
+        
+        # Timeout de pedalada
+        stopped = self.is_pedaling & (self.last_pedal_time > 0) & (now - self.last_pedal_time > PEDALING_TIMEOUT)
+        self.is_pedaling &= ~stopped
+        
+        # Decaimento para quem não está pedalando
+        if now - self.last_decay_time >= DECAY_INTERVAL:
+            self.last_decay_time = now
+            self.energy -= np.where(self.is_pedaling, 0.0, decay_rate * DECAY_INTERVAL)
+        np.maximum(self.energy, 0, out=self.energy)
+        np.minimum(self.energy, 100, out=self.energy)
+        
+        # Vitória: entre quem chegou a 100% no tick, a pedalada mais antiga (relógio da placa)
+        reached = (self.energy >= 100).nonzero()[0]
+        winner = int(reached[self.last_pedal_time[reached].argmin()]) if len(reached) else -1
+        with self.lock:
+            self._energy_cache = self.energy.tolist()
+            self._in_flight = {}
+            # Quem cruzou 100% depois da troca das filas ainda bloqueia novas pedaladas
+            self._finished = winner >= 0 or any(self._energy_cache[i] + gain >= 100
+                                                for i, gain in self._pending_gain.items())
+        return winner, stopped.nonzero()[0]
+
+    def publish(self, state, players=4):
+        """Copiar os primeiros jogadores para o dicionário servido em /api/state"""
+        for i in range(players):
+            state[f'player{i + 1}_energy'] = self._energy_cache[i]
+        state['is_pedaling'][:players] = self.is_pedaling[:players].tolist()
+        state['last_pedal_time'][:players] = self.last_pedal_time[:players].tolist()
+        state['pedal_count'][:players] = self.pedal_count[:players].tolist()
+
+energy_engine = None
+
+def init_energy_engine(num_players=4):
+    """Ativar o motor NumPy se configurado (BIKEJJ_ENERGY_ENGINE=numpy) e disponível"""
+    global energy_engine
+    if ENERGY_ENGINE != 'numpy':
+        return
+    if np is None:
+        print("⚠️ BIKEJJ_ENERGY_ENGINE=numpy mas o NumPy não está instalado - usando motor Python")
+        return
+    energy_engine = NumpyEnergyEngine(num_players)
+    energy_engine.load(game_state)  # Continuar do estado atual (snapshot restaurado)
+    print(f"🧮 Motor de energia NumPy ativo ({num_players} jogadores, tick de {ENGINE_TICK_INTERVAL * 1000:.0f}ms)")
+
+def apply_engine_tick():
+    """Tick do motor NumPy: aplica ganhos/decaimento e publica o estado"""
+    winner, stopped = energy_engine.tick(game_clock(), game_config['energy_decay_rate'], game_state['game_frozen'])
+    energy_engine.publish(game_state)
+    for player_idx in stopped.tolist():
+        if player_idx < 4:
+            cadence_trackers[player_idx].idle()
+            publish_cadence(player_idx)
+    if winner >= 0 and not game_state['game_frozen']:
+        declare_winner(winner, float(energy_engine.last_pedal_time[winner]) or None)
+
+def apply_energy_decay():
+    """Aplicar decaimento de energia para todos os jogadores"""
+    global last_decay_time
+    current_time = game_clock()
+    
+    # Verificar se é hora de aplicar decaimento
+    if current_time - last_decay_time >= DECAY_INTERVAL:
+        last_decay_time = current_time
+        
+        # Se o jogo está congelado, não aplicar decaimento
+        if game_state['game_frozen']:
+            print(f"🧊 Jogo congelado - Jogador {game_state['winner_player']} venceu! Decaimento pausado.")
+            return
+        
+        print(f"⏰ Aplicando decaimento de energia... (Taxa: {game_config['energy_decay_rate']}%/s)")
+        
+        for player_idx in range(4):
+            energy_key = f'player{player_idx + 1}_energy'
+            is_pedaling = game_state['is_pedaling'][player_idx]
+            current_energy = game_state[energy_key]
+            
+            print(f"🔍 Jogador {player_idx + 1}: Energia={current_energy:.1f}%, Pedalando={is_pedaling}")
+            
+            # Resetar is_pedaling se passou muito tempo desde a última pedalada (modo teclado)
+            last_pedal_time = game_state['last_pedal_time'][player_idx]
+            if last_pedal_time > 0 and current_time - last_pedal_time > PEDALING_TIMEOUT:  # 2s sem pedalada
+                game_state['is_pedaling'][player_idx] = False
+                is_pedaling = False
+                cadence_trackers[player_idx].idle()
+                publish_cadence(player_idx)
+                print(f"🔄 Jogador {player_idx + 1}: Resetando estado de pedalada (tempo: {current_time - last_pedal_time:.1f}s)")
+            
+            # Aplicar decaimento apenas se o jogador não estiver pedalando
+            if not is_pedaling and current_energy > 0:
+                # Calcular decaimento para o intervalo usando configuração
+                decay_amount = game_config['energy_decay_rate'] * DECAY_INTERVAL
+                new_energy = max(0, current_energy - decay_amount)
+                game_state[energy_key] = new_energy
+                
+                # Log da mudança
+                if new_energy > 0:
+                    print(f"🛑 Jogador {player_idx + 1}: {current_energy:.1f}% → {new_energy:.1f}% (Decaimento: {decay_amount:.1f}%)")
+                else:
+                    print(f"🛑 Jogador {player_idx + 1}: {current_energy:.1f}% → 0% (Energia esgotada)")
+            elif is_pedaling:
+                print(f"✅ Jogador {player_idx + 1}: Pedalando, sem decaimento")
+            else:
+                print(f"⏸️ Jogador {player_idx + 1}: Energia já em 0%")
+        
+        print("=" * 50)
+
+# Thread independente para decaimento de energia
+decay_thread = None
+decay_running = False
+
+decay_heartbeat = None  # Última volta do loop de decaimento (/healthz)
+
+def start_decay_thread():
+    """Iniciar thread independente para decaimento de energia"""
+    global decay_thread, decay_running
+    if not decay_running:
+        decay_running = True
+        decay_thread = threading.Thread(target=decay_worker, name='decay-worker', daemon=True)
+        decay_thread.start()
+        print("⏰ Thread de decaimento iniciada")
+
+def stop_decay_thread():
+    """Parar thread de decaimento"""
+    global decay_running
+    decay_running = False
+    print("⏰ Thread de decaimento parada")
+
+def decay_worker():
+    """Worker thread para aplicar decaimento continuamente"""
+    global last_decay_time, decay_heartbeat
+    while decay_running:
+        decay_heartbeat = time.monotonic()
+        try:
+            if energy_engine is not None:
+                with game_lock:
+                    apply_engine_tick()
+                state_versions.refresh()
+                time.sleep(ENGINE_TICK_INTERVAL)
+                continue
+            with game_lock:
+                apply_energy_decay()
+            state_versions.refresh()
+            time.sleep(0.1)  # Verificar a cada 100ms
+        except Exception as e:
+            print(f"❌ Erro na thread de decaimento: {e}")
+            time.sleep(1)
+
+# Tap local da serial: monitores e gravadores recebem as linhas sem abrir a porta
+TAP_HOST = '127.0.0.1'  # Só conexões locais
+TAP_PORT = 9100
+TAP_BUFFER_MESSAGES = 2000  # Mensagens pendentes por inscrito (as mais antigas são descartadas)
+
+class TapSubscriber:
+    """Inscrito do tap com fila limitada e thread de envio própria"""
+
+    def __init__(self, conn, address, buffer_size=TAP_BUFFER_MESSAGES):
+        self.conn = conn
+        self.address = address
+        self.buffer_size = buffer_size
+        self.queue = collections.deque()
+        self.condition = threading.Condition()
+        self.closed = False
+        self.sent = 0
+        self.dropped = 0
+        self.unreported_drops = 0
+
+    def offer(self, data):
+        """Enfileirar sem nunca bloquear quem publica (fila cheia descarta a mais antiga)"""
+        with self.condition:
+            if len(self.queue) >= self.buffer_size:
+                self.queue.popleft()
+                self.dropped += 1
+                self.unreported_drops += 1
+            self.queue.append(data)
+            self.condition.notify()
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+
+    def run(self, on_exit):
+        try:
+            while True:
+                with self.condition:
+                    self.condition.wait_for(lambda: self.queue or self.closed)
+                    if self.closed:
+                        return
+                    batch = list(self.queue)
+                    self.queue.clear()
+                    drops, self.unreported_drops = self.unreported_drops, 0
+                if drops:
+                    batch.insert(0, (json.dumps({'type': 'dropped', 'count': drops}) + '\n').encode())
+                self.conn.sendall(b''.join(batch))
+                self.sent += len(batch)
+        except OSError:
+            pass
+        finally:
+            try:
+                self.conn.close()
+            except OSError:
+                pass
+            on_exit(self)
+
+class SerialTap:
+    """Distribuir linhas cruas da serial e eventos interpretados (NDJSON) para inscritos locais"""
+
+    def __init__(self, host=TAP_HOST, port=TAP_PORT, buffer_size=TAP_BUFFER_MESSAGES):
+        self.host = host
+        self.port = port
+        self.buffer_size = buffer_size
+        self.lock = threading.Lock()
+        self.subscribers = ()  # Tupla trocada inteira: publish() lê sem lock
+        self.listener = None
+        self.running = False
+        self.published = 0
+        self.dropped_closed = 0  # Descartes de inscritos que já saíram
+
+    def start(self):
+        if self.running:
+            return
+        try:
+            self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            self.listener.bind((self.host, self.port))
+            self.listener.listen()
+        except OSError as e:
+            print(f"⚠️ Tap serial indisponível em {self.host}:{self.port}: {e}")
+            self.listener = None
+            return
+        self.running = True
+        threading.Thread(target=self._accept_loop, name='serial-tap', daemon=True).start()
+        print(f"🔀 Tap serial em {self.host}:{self.port} (python serial_monitor.py --tap)")
+
+    def stop(self):
+        self.running = False
+        if self.listener:
+            self.listener.close()
+        for subscriber in self.subscribers:
+            subscriber.close()
+
+    def _accept_loop(self):
+        while self.running:
+            try:
+                conn, address = self.listener.accept()
+            except OSError:
+                return
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            subscriber = TapSubscriber(conn, address, self.buffer_size)
+            hello = {'type': 'hello', 'port': SERIAL_PORT, 'baudrate': SERIAL_BAUDRATE,
+                     'buffer': self.buffer_size, 't': time.time()}
+            subscriber.offer((json.dumps(hello) + '\n').encode())
+            with self.lock:
+                self.subscribers = self.subscribers + (subscriber,)
+            threading.Thread(target=subscriber.run, args=(self._remove,),
+                             name=f'serial-tap-{address[1]}', daemon=True).start()
+            print(f"🔀 Inscrito no tap serial: {address[0]}:{address[1]} ({len(self.subscribers)} ativos)")
+
+    def _remove(self, subscriber):
+        with self.lock:
+            self.subscribers = tuple(s for s in self.subscribers if s is not subscriber)
+            self.dropped_closed += subscriber.dropped
+        print(f"🔀 Inscrito saiu do tap serial: {subscriber.address[0]}:{subscriber.address[1]}")
+
+    def publish(self, message):
+        subscribers = self.subscribers
+        if not subscribers:
+            return  # Sem inscritos: nem serializa
+        data = (json.dumps(message, ensure_ascii=False) + '\n').encode('utf-8')
+        for subscriber in subscribers:
+            subscriber.offer(data)
+        self.published += 1
+
+    def publish_raw(self, line, timestamp):
+        if self.subscribers:
+            self.publish({'type': 'raw', 't': timestamp, 'line': line})
+
+    def publish_event(self, kind, player_idx, timestamp, **fields):
+        if self.subscribers:
+            self.publish({'type': 'event', 'kind': kind, 'player': player_idx + 1, 't': timestamp, **fields})
+
+    def status(self):
+        subscribers = self.subscribers
+        return {
+            'running': self.running,
+            'address': f"{self.host}:{self.port}",
+            'subscribers': len(subscribers),
+            'published': self.published,
+            'dropped': self.dropped_closed + sum(s.dropped for s in subscribers),
+            'queued': sum(len(s.queue) for s in subscribers)
+        }
+
+serial_tap = SerialTap()
+
+# Fila entre o enquadramento de linhas da serial e o processamento dos eventos
+SERIAL_RING_SIZE = 4096  # Linhas pendentes (~10s de 4 ciclistas em sprint com leituras parciais)
+SERIAL_READ_CHUNK = 4096  # Bytes máximos por leitura da porta
+SERIAL_PROCESSOR_WAIT = 0.5  # Espera máxima da thread de processamento (mantém o heartbeat vivo)
+
+class LineRing:
+    """Fila circular limitada: um produtor (leitura serial) e um consumidor (processamento)
+
+    deque.append/popleft são atômicos no CPython, então o produtor nunca espera
+    por lock; cheia, a fila descarta a linha mais antiga e conta o descarte.
+    """
+
+    def __init__(self, size=SERIAL_RING_SIZE):
+        self.size = size
+        self.items = collections.deque(maxlen=size)
+        self.ready = threading.Event()
+        self.pushed = 0
+        self.dropped = 0
+        self.max_depth = 0
+        self.batches = 0
+        self.batch_items = 0
+        self.last_batch = 0
+        self.max_batch = 0
+
+    def push(self, item):
+        items = self.items
+        if len(items) >= self.size:
+            self.dropped += 1  # deque com maxlen descarta a mais antiga no append
+        items.append(item)
+        self.pushed += 1
+        depth = len(items)
+        if depth > self.max_depth:
+            self.max_depth = depth
+        if not self.ready.is_set():
+            self.ready.set()
+
+    def drain(self, timeout):
+        """Esperar até haver linhas e retirar todas as pendentes de uma vez (lote)"""
+        if not self.ready.wait(timeout):
+            return []
+        self.ready.clear()
+        items = self.items
+        batch = []
+        try:
+            while True:
+                batch.append(items.popleft())
+        except IndexError:
+            pass
+        if batch:
+            self.batches += 1
+            self.batch_items += len(batch)
+            self.last_batch = len(batch)
+            if len(batch) > self.max_batch:
+                self.max_batch = len(batch)
+        return batch
+
+    def wake(self):
+        self.ready.set()
+
+    def status(self):
+        return {
+            'depth': len(self.items),
+            'capacity': self.size,
+            'max_depth': self.max_depth,
+            'framed': self.pushed,
+            'dropped': self.dropped,
+            'batches': self.batches,
+            'last_batch': self.last_batch,
+            'max_batch': self.max_batch,
+            'avg_batch': round(self.batch_items / self.batches, 2) if self.batches else 0
+        }
+
+# Relógio da placa: cada linha do sketch termina com " @<millis()>" do instante do evento
+DEVICE_MILLIS_WRAP = 2 ** 32  # millis() é unsigned long: volta a zero a cada ~49,7 dias
+DEVICE_CLOCK_BUCKET = 2.0  # Segundos de placa por balde de atraso mínimo
+DEVICE_CLOCK_BUCKETS = 30  # Baldes na janela da deriva (~1 minuto)
+DEVICE_CLOCK_MAX_DRIFT = 0.01  # Ressonador do Mega erra até ~0,5%; mais que isso é ruído
+DEVICE_CLOCK_RESET_JUMP = 1000  # millis() recuando mais que isso (ms) = placa reiniciou
+
+def split_device_timestamp(line):
+    """Separar o sufixo " @<millis>" da linha; retorna (linha, millis ou None)"""
+    head, sep, tail = line.rpartition(' @')
+    if sep and tail.isdigit():
+        return head.rstrip(), int(tail)
+    return line, None
+
+class DeviceClock:
+    """Converte millis() da placa para o relógio do jogo
+
+    Toda linha chega com atraso >= 0 (USB, agendamento, fila), então
+    chegada - placa = offset + atraso. O menor valor de cada balde aproxima
+    o offset real; a reta pelos mínimos dá a deriva entre os dois relógios.
+    """
+
+    def __init__(self):
+        self.board_resets = 0
+        self.untimed_lines = 0
+        self.reset()
+
+    def reset(self):
+        self.wraps = 0
+        self.last_millis = None
+        self.buckets = collections.deque(maxlen=DEVICE_CLOCK_BUCKETS)  # [balde, segundos da placa, chegada - placa]
+        self.offset = None
+        self.drift = 0.0
+        self.reference = 0.0
+        self.last_aligned = None
+        self.samples = 0
+        self.delay_avg = 0.0
+        self.delay_max = 0.0
+
+    def _unwrap(self, millis):
+        last = self.last_millis
+        if last is not None and millis < last:
+            if last - millis > DEVICE_MILLIS_WRAP // 2:
+                self.wraps += 1
+            elif last - millis > DEVICE_CLOCK_RESET_JUMP:
+                # Placa reiniciou (reset/auto-reset ao abrir a porta): recomeçar a estimativa
+                self.board_resets += 1
+                print(f"🕒 Relógio da placa reiniciou ({last} → {millis} ms)")
+                self.reset()
+        self.last_millis = millis
+        return (millis + self.wraps * DEVICE_MILLIS_WRAP) / 1000.0
+
+    def _fit(self):
+        buckets = self.buckets
+        self.reference = buckets[-1][1]
+        if len(buckets) >= 3:
+            # Deriva por mínimos quadrados; o offset fica no envelope inferior dos mínimos
+            n = len(buckets)
+            mean_x = sum(b[1] for b in buckets) / n
+            mean_y = sum(b[2] for b in buckets) / n
+            var = sum((b[1] - mean_x) ** 2 for b in buckets)
+            slope = sum((b[1] - mean_x) * (b[2] - mean_y) for b in buckets) / var if var else 0.0
+            self.drift = max(-DEVICE_CLOCK_MAX_DRIFT, min(DEVICE_CLOCK_MAX_DRIFT, slope))
+        self.offset = min(b[2] - self.drift * (b[1] - self.reference) for b in buckets)
+
+    def align(self, millis, arrival):
+        """Instante do evento no relógio do jogo (nunca depois da chegada, nunca recua)"""
+        device = self._unwrap(millis)
+        delta = arrival - device
+        self.samples += 1
+        buckets = self.buckets
+        bucket = int(device // DEVICE_CLOCK_BUCKET)
+        if not buckets or bucket != buckets[-1][0]:
+            buckets.append([bucket, device, delta])
+            self._fit()
+        elif delta < buckets[-1][2]:
+            buckets[-1] = [bucket, device, delta]
+            self._fit()
+
+        aligned = min(device + self.offset + self.drift * (device - self.reference), arrival)
+        if self.last_aligned is not None and aligned < self.last_aligned:
+            aligned = self.last_aligned
+        self.last_aligned = aligned
+
+        delay = arrival - aligned
+        self.delay_avg += (delay - self.delay_avg) * 0.05
+        self.delay_max = max(self.delay_max, delay)
+        return aligned
+
+    def status(self):
+        return {
+            'synced': self.offset is not None,
+            'samples': self.samples,
+            'untimed_lines': self.untimed_lines,
+            'drift_ppm': round(self.drift * 1e6, 1),
+            'delay_avg_ms': round(self.delay_avg * 1000, 2),
+            'delay_max_ms': round(self.delay_max * 1000, 2),
+            'wraps': self.wraps,
+            'board_resets': self.board_resets
+        }
+
+# Lacunas nos contadores da placa (linhas perdidas por ruído na serial)
+SERIAL_MAX_PEDAL_RATE = 15.0  # Pedaladas/s fisicamente possíveis; salto maior = contador corrompido
+SERIAL_DEBUG_LINES = os.environ.get('BIKEJJ_SERIAL_DEBUG', '') == '1'  # Imprimir cada linha recebida (um print por linha pesa com 4 ciclistas)
+
+# Reconexão automática do Arduino (cabo USB desconectado/reconectado)
+RECONNECT_BACKOFF_MIN = 0.05  # Primeira tentativa quase imediata
+RECONNECT_BACKOFF_MAX = 1.0  # Teto do backoff exponencial
+
+def port_identity(port_info):
+    """Identidade da placa (independente do caminho do device)"""
+    if not port_info:
+        return None
+    if port_info.get('serial_number'):
+        return ('serial', port_info['serial_number'])
+    if port_info.get('vid') is not None and port_info.get('pid') is not None:
+        return ('usb', port_info['vid'], port_info['pid'])
+    return None
+
+class ArduinoMegaReader:
+    def __init__(self, port=None):
+        self.port = port or SERIAL_PORT
+        self.serial_conn = None
+        self.running = False
+        self.connected = False
+        self.stop_event = threading.Event()
+        
+        # Supervisão da conexão
+        self.device_identity = None
+        self.reconnect_count = 0
+        self.total_downtime = 0.0
+        self.disconnected_since = None
+        self.last_disconnect_reason = None
+        self.last_recovery_time = None
+        self.heartbeat = None  # Última volta do loop da thread de leitura (/healthz)
+        self.processor_heartbeat = None  # Última volta da thread de processamento
+
+        # Leitura só enquadra linhas; o processamento drena a fila em lotes
+        self.line_ring = LineRing()
+        self.rx_buffer = b''
+        self.lines_processed = 0
+        self.device_clock = DeviceClock()  # millis() da placa → relógio do jogo
+
+        # Último contador de pedaladas visto por jogador (evita pedaladas duplicadas)
+        self.last_pedal_counts = [None, None, None, None]
+        self.counter_rebase = [False, False, False, False]
+        self.last_count_time = [None, None, None, None]
+        self.duplicate_pedals = 0
+        
+        # Métricas de perda por jogador (linhas 🔍 recebidas x pedaladas recuperadas pelo contador)
+        self.pedal_lines = [0, 0, 0, 0]
+        self.missed_pedals = [0, 0, 0, 0]
+        self.counter_jumps = [0, 0, 0, 0]
+
+    def start(self):
+        if not self.port:
+            print("⚠️ Nenhuma porta serial configurada")
+            return False
+        
+        # Reiniciar se já estiver rodando (evita duas threads lendo a mesma porta)
+        if self.running:
+            self.stop()
+            
+        try:
+            self.serial_conn = serial.Serial(self.port, SERIAL_BAUDRATE, timeout=1)
+            self.running = True
+            self.connected = True
+            self.disconnected_since = None
+            self.device_identity = self._lookup_identity(self.port)
+            print(f"📡 Conectado ao Arduino Mega na porta {self.port}")
+
+            # Thread de leitura serial (com supervisão/reconexão)
+            self.stop_event = threading.Event()
+            self.read_thread = threading.Thread(target=self._read_serial, args=(self.stop_event,),
+                                                name='serial-reader', daemon=True)
+            self.read_thread.start()
+            self.process_thread = threading.Thread(target=self._process_serial, args=(self.stop_event,),
+                                                   name='serial-processor', daemon=True)
+            self.process_thread.start()
+            return True
+
+        except Exception as e:
+            print(f"❌ Erro ao conectar com Arduino Mega: {e}")
+            return False
+
+    def stop(self):
+        self.running = False
+        self.connected = False
+        self.stop_event.set()
+        if self.serial_conn:
+            try:
+                self.serial_conn.close()
+            except Exception:
+                pass
+        # Esperar o processador antigo sair para nunca haver dois consumidores na fila
+        self.line_ring.wake()
+        process_thread = getattr(self, 'process_thread', None)
+        if process_thread and process_thread is not threading.current_thread():
+            process_thread.join(timeout=2)
+        self.rx_buffer = b''
+
+    def status(self):
+        """Métricas da conexão para /api/serial/status"""
+        downtime = self.total_downtime
+        if self.disconnected_since is not None:
+            downtime += time.time() - self.disconnected_since
+        return {
+            'connected': self.connected,
+            'reconnecting': self.running and not self.connected,
+            'reconnect_count': self.reconnect_count,
+            'downtime_seconds': round(downtime, 3),
+            'last_disconnect_reason': self.last_disconnect_reason,
+            'last_recovery_seconds': self.last_recovery_time,
+            'duplicate_pedals_skipped': self.duplicate_pedals,
+            'pedal_loss': self.loss_status(),
+            'queue': dict(self.line_ring.status(), processed=self.lines_processed),
+            'device_clock': self.device_clock.status()
+        }
+
+    def loss_status(self):
+        """Pedaladas perdidas na serial por jogador (recuperadas pelos contadores da placa)"""
+        players = []
+        for i in range(4):
+            expected = self.pedal_lines[i] + self.missed_pedals[i]
+            players.append({
+                'player': i + 1,
+                'received': self.pedal_lines[i],
+                'missed': self.missed_pedals[i],
+                'loss_rate': round(self.missed_pedals[i] / expected, 4) if expected else 0.0,
+                'counter_jumps': self.counter_jumps[i]
+            })
+        return players
+
+    def _lookup_identity(self, device):
+        ports, _ = port_inventory.current()
+        for port_info in ports:
+            if port_info['port'] == device:
+                return port_identity(port_info)
+        return None
+
+    def _read_serial(self, stop_event):
+        print("🔄 Thread de leitura serial iniciada")
+        while not stop_event.is_set():
+            self.heartbeat = time.monotonic()
+            if not self.connected:
+                self._reconnect(stop_event)
+                continue
+            try:
+                # Só ler e enquadrar: o processamento roda na thread serial-processor
+                waiting = self.serial_conn.in_waiting
+                if waiting:
+                    self._frame_lines(self.serial_conn.read(min(waiting, SERIAL_READ_CHUNK)), game_clock())
+                else:
+                    time.sleep(0.001)  # Reduzido de 10ms para 1ms
+            except (serial.SerialException, OSError) as e:
+                if not stop_event.is_set():
+                    self._handle_disconnect(e)
+            except Exception as e:
+                print(f"❌ Erro na leitura serial: {e}")
+                time.sleep(0.1)
+        print("🛑 Thread de leitura serial finalizada")
+
+    def _frame_lines(self, data, timestamp):
+        """Separar os bytes recebidos em linhas e enfileirar (timestamp de chegada, bytes)"""
+        *lines, self.rx_buffer = (self.rx_buffer + data).split(b'\n')
+        for raw in lines:
+            if raw.strip():
+                self.line_ring.push((timestamp, raw))
+
+    def _process_serial(self, stop_event):
+        """Drenar a fila em lotes e aplicar os eventos ao estado do jogo"""
+        print("🔄 Thread de processamento serial iniciada")
+        while not stop_event.is_set():
+            self.processor_heartbeat = time.monotonic()
+            batch = self.line_ring.drain(SERIAL_PROCESSOR_WAIT)
+            for timestamp, raw in batch:
+                line = raw.decode('utf-8', errors='ignore').strip()
+                serial_tap.publish_raw(line, timestamp)
+                try:
+                    self._process_line(line, timestamp)
+                except Exception as e:
+                    print(f"❌ Erro ao processar linha serial: {e}")
+                self.lines_processed += 1
+            if batch:
+                state_versions.refresh()  # Acordar os long-polls uma vez por lote
+        print("🛑 Thread de processamento serial finalizada")
+
+    def _handle_disconnect(self, error):
+        """Marcar a conexão como perdida e descartar o handle morto"""
+        self.connected = False
+        self.disconnected_since = time.time()
+        self.last_disconnect_reason = str(error)
+        print(f"🔌 Arduino desconectado ({self.port}): {error}")
+        try:
+            self.serial_conn.close()
+        except Exception:
+            pass
+        self.serial_conn = None
+
+    def _candidate_ports(self, ports):
+        # Primeiro o mesmo caminho; depois a mesma placa em outro caminho
+        candidates = [self.port]
+        if self.device_identity:
+            for port_info in ports:
+                if port_info['port'] != self.port and port_identity(port_info) == self.device_identity:
+                    candidates.append(port_info['port'])
+        return candidates
+
+    def _reconnect(self, stop_event):
+        """Reabrir a porta com backoff exponencial até a placa voltar"""
+        global SERIAL_PORT
+        backoff = RECONNECT_BACKOFF_MIN
+        while not stop_event.is_set():
+            self.heartbeat = time.monotonic()
+            # Versão lida antes das tentativas: hotplug durante elas também encurta a espera
+            ports, version = port_inventory.current()
+            for candidate in self._candidate_ports(ports):
+                try:
+                    conn = serial.Serial(candidate, SERIAL_BAUDRATE, timeout=1)
+                except (serial.SerialException, OSError, ValueError):
+                    continue
+                
+                if stop_event.is_set():
+                    conn.close()
+                    return
+                
+                downtime = time.time() - self.disconnected_since
+                self.serial_conn = conn
+                self.rx_buffer = b''  # Linha incompleta da conexão anterior
+                self.device_clock.reset()
+                self.total_downtime += downtime
+                self.disconnected_since = None
+                self.last_recovery_time = round(downtime, 3)
+                self.reconnect_count += 1
+                # Contadores da placa podem ter reiniciado (auto-reset do Mega ao abrir a porta)
+                self.counter_rebase = [True, True, True, True]
+                
+                if candidate != self.port:
+                    print(f"🔀 Arduino reapareceu em outro caminho: {self.port} → {candidate}")
+                    self.port = candidate
+                    if SERIAL_PORT != candidate:
+                        SERIAL_PORT = candidate
+                        save_serial_config(candidate)
+                
+                self.connected = True
+                print(f"✅ Arduino reconectado em {self.port} após {downtime:.2f}s (reconexão #{self.reconnect_count})")
+                return
+            
+            # Esperar o backoff, mas acordar imediatamente se o inventário detectar hotplug
+            if port_inventory.running:
+                port_inventory.wait_for_change(version, timeout=backoff)
+            else:
+                stop_event.wait(backoff)
+            backoff = min(backoff * 2, RECONNECT_BACKOFF_MAX)
+
+    def _advance_counter(self, player_idx, count, timestamp, line_is_pedal=True):
+        """Avançar o contador conhecido da placa; retorna quantas pedaladas ficaram sem linha"""
+        last = self.last_pedal_counts[player_idx]
+        last_time = self.last_count_time[player_idx]
+        self.last_pedal_counts[player_idx] = count
+        self.last_count_time[player_idx] = timestamp
+        if last is None or self.counter_rebase[player_idx] or count <= last:
+            # Sem referência confiável (início, reconexão, placa reiniciou): só sincronizar
+            self.counter_rebase[player_idx] = False
+            return 0
+        
+        missed = count - last - (1 if line_is_pedal else 0)
+        if missed <= 0:
+            return 0
+        limit = SERIAL_MAX_PEDAL_RATE * max(0.0, timestamp - last_time) + 2 if last_time is not None else 0
+        if missed > limit:
+            # Salto impossível nesse intervalo (dígito corrompido?): aceitar o contador mas
+            # ressincronizar na próxima linha em vez de creditar pedaladas fantasmas
+            self.counter_jumps[player_idx] += 1
+            self.counter_rebase[player_idx] = True
+            print(f"⚠️ Jogador {player_idx + 1}: contador saltou {last} → {count} em {timestamp - last_time:.2f}s, ignorando lacuna")
+            return 0
+        self.missed_pedals[player_idx] += missed
+        print(f"🧩 Jogador {player_idx + 1}: {missed} pedalada(s) perdida(s) na serial ({last} → {count})")
+        return missed
+
+    def _check_pedal_counter(self, player_idx, pedal_num, timestamp):
+        """Linha de pedalada: None se repetida, senão quantas pedaladas anteriores se perderam"""
+        last = self.last_pedal_counts[player_idx]
+        if last is not None:
+            if self.counter_rebase[player_idx]:
+                # Primeira pedalada após reconexão: aceitar reinício do contador
+                duplicate = pedal_num == last
+            else:
+                # Contador voltando para 1 = placa reiniciou; qualquer outro recuo é repetição
+                duplicate = pedal_num == last or 1 < pedal_num < last
+            if duplicate:
+                self.duplicate_pedals += 1
+                print(f"♻️ Jogador {player_idx + 1}: Pedalada #{pedal_num} já processada, ignorando")
+                return None
+        self.pedal_lines[player_idx] += 1
+        return self._advance_counter(player_idx, pedal_num, timestamp)
+
+    def _check_pedal_total(self, player_idx, total, timestamp):
+        """Linha "📈 total": pedaladas além do último contador visto tiveram a linha perdida"""
+        if total == self.last_pedal_counts[player_idx]:
+            # Em dia (caso comum); o instante conta como referência para o limite de salto
+            self.last_count_time[player_idx] = timestamp
+            return 0
+        return self._advance_counter(player_idx, total, timestamp, line_is_pedal=False)
+
+    def _process_line(self, line, current_time=None):
+        # Processar mensagens do Arduino Mega com 4 jogadores
+        # (current_time = chegada da linha na serial, não o momento do processamento)
+        if current_time is None:
+            current_time = game_clock()
+        
+        # Sketch com timestamp: usar o instante do evento na placa, alinhado ao relógio do jogo
+        line, device_millis = split_device_timestamp(line)
+        if device_millis is not None:
+            current_time = self.device_clock.align(device_millis, current_time)
+        else:
+            self.device_clock.untimed_lines += 1
+        
+        if SERIAL_DEBUG_LINES:
+            print(f"📨 Arduino: {line}")
+        
+        # CAPTURAR PEDALADAS POR JOGADOR (Arduino Mega) - FORMATO OTIMIZADO
+        if "🔍 J" in line and ":" in line:
+            try:
+                # Extrair número do jogador do formato otimizado "🔍 J1:5"
+                if "J1:" in line:
                     player_idx = 0
                 elif "J2:" in line:
                     player_idx = 1
@@ -455,35 +2484,72 @@ class ArduinoMegaReader:
                 
                 # Extrair número da pedalada do formato "🔍 J1:5"
                 pedal_num = line.split(":")[1].strip()
+                missed = self._check_pedal_counter(player_idx, int(pedal_num), current_time)
+                if missed is None:
+                    serial_tap.publish_event('duplicate_pedal', player_idx, current_time, count=int(pedal_num))
+                    return
                 
-                # Processar pedalada completa
-                game_state['is_pedaling'][player_idx] = True
-                game_state['inactivity_count'][player_idx] = 0
-                game_state['last_pedal_time'][player_idx] = current_time
-                game_state['pedal_count'][player_idx] = int(pedal_num)
-                
-                # Incrementar energia usando configuração
-                energy_key = f'player{player_idx + 1}_energy'
-                energy_gain = game_config['energy_gain_rate']
-                game_state[energy_key] = min(100, game_state[energy_key] + energy_gain)
+                # Verificar se o jogo está congelado (o contador acima segue acompanhado)
+                if game_state['game_frozen']:
+                    print(f"🧊 Jogo congelado - Jogador {game_state['winner_player']} venceu! Pedaladas ignoradas.")
+                    return
                 
-                print(f"✅ ARDUINO MEGA - Jogador {player_idx + 1}: Pedalada #{pedal_num} - Energia = {game_state[energy_key]:.1f}% (+{energy_gain}%)")
+                # Processar pedalada completa (mais as perdidas na serial), incrementando energia
+                # usando configuração (descontando o que as leituras parciais já deram)
+                energy_gain = max(0.0, game_config['energy_gain_rate'] * (1 + missed) - partial_energy_credit[player_idx])
+                partial_energy_credit[player_idx] = 0.0
+                energy = register_pedal(player_idx, current_time, energy_gain, int(pedal_num), missed)
+                serial_tap.publish_event('pedal', player_idx, current_time, count=int(pedal_num), missed=missed,
+                                         energy=round(energy, 2), rpm=game_state['rpm_avg'][player_idx])
                 
-                # Verificar se ganhou
-                if game_state[energy_key] >= 100:
-                    print(f"🏆 VITÓRIA! Jogador {player_idx + 1} atingiu 100% de energia!")
-                    # Congelar o jogo
-                    game_state['game_frozen'] = True
-                    game_state['winner_player'] = player_idx + 1
-                    game_state['game_active'] = False
-                    print(f"🧊 JOGO CONGELADO! Jogador {player_idx + 1} venceu!")
-                    send_udp_message('winner', player_idx + 1)
+                print(f"✅ ARDUINO MEGA - Jogador {player_idx + 1}: Pedalada #{pedal_num} - Energia = {energy:.1f}% (+{energy_gain:g}%)")
             
             except Exception as e:
                 print(f"❌ Erro ao processar mensagem do jogador: {e}")
                 import traceback
                 traceback.print_exc()
         
+        # CAPTURAR LEITURAS PARCIAIS "📊 J1: Leitura 2/4 (parcial)" (modo partial_energy)
+        elif "📊 J" in line and "(parcial)" in line:
+            if not game_config.get('partial_energy') or game_state['game_frozen']:
+                return
+            try:
+                player_idx = int(line.split("📊 J")[1].split(":")[0]) - 1
+                if not 0 <= player_idx < 4:
+                    return
+                reading, readings_per_pedal = [int(v) for v in line.split("Leitura")[1].split("(")[0].split("/")]
+                fraction = min(reading, readings_per_pedal) / readings_per_pedal
+                
+                # Creditar só a diferença para a fração já creditada nesta pedalada
+                target = game_config['energy_gain_rate'] * fraction
+                energy_gain = target - partial_energy_credit[player_idx]
+                if energy_gain > 0:
+                    partial_energy_credit[player_idx] = target
+                    energy = add_player_energy(player_idx, energy_gain, current_time)
+                    print(f"📊 Jogador {player_idx + 1}: Leitura parcial {reading}/{readings_per_pedal} - Energia = {energy:.1f}% (+{energy_gain:.2f}%)")
+                
+                mark_pedaling(player_idx, current_time)
+                serial_tap.publish_event('partial', player_idx, current_time, reading=reading)
+            
+            except Exception as e:
+                print(f"❌ Erro ao processar leitura parcial: {e}")
+        
+        # CAPTURAR TOTAIS "📈 J1: 57 pedaladas total" (recupera pedaladas cuja linha se perdeu)
+        elif "📈 J" in line and "pedaladas total" in line:
+            try:
+                player_idx = int(line.split("📈 J")[1].split(":")[0]) - 1
+                total = int(line.split(":")[1].split("pedaladas")[0])
+            except ValueError:
+                return
+            if not 0 <= player_idx < 4:
+                return
+            missed = self._check_pedal_total(player_idx, total, current_time)
+            if missed and not game_state['game_frozen']:
+                energy = credit_missed_pedals(player_idx, current_time, game_config['energy_gain_rate'] * missed, total)
+                serial_tap.publish_event('recovered_pedals', player_idx, current_time, count=total, missed=missed,
+                                         energy=round(energy, 2))
+                print(f"🧩 Jogador {player_idx + 1}: {missed} pedalada(s) recuperada(s) pelo total - Energia = {energy:.1f}%")
+        
         # CAPTURAR INTERRUPÇÕES DE SENSOR (mensagens principais do Arduino Mega)
         elif "🔍 Jogador" in line and "Pedalada #" in line:
             try:
@@ -507,6 +2573,9 @@ class ArduinoMegaReader:
                 # Extrair número da pedalada
                 if "Pedalada #" in line:
                     pedal_num = line.split("Pedalada #")[1].split(" ")[0]
+                    missed = self._check_pedal_counter(player_idx, int(pedal_num), current_time)
+                    if missed is None:
+                        return
                     print(f"🚴 ARDUINO MEGA - Jogador {player_idx + 1}: Pedalada #{pedal_num}")
                     
                     # MARCAR JOGADOR COMO PRONTO (primeira pedalada)
@@ -524,29 +2593,9 @@ class ArduinoMegaReader:
                             print(f"📊 Progresso: {ready_count}/4 jogadores prontos")
                     
                     # Incrementar energia imediatamente na interrupção usando configuração
-                    energy_key = f'player{player_idx + 1}_energy'
-                    if game_state[energy_key] < 100:
-                        energy_gain = game_config['energy_gain_rate']
-                        game_state[energy_key] = min(100, game_state[energy_key] + energy_gain)
-                        print(f"⚡ Jogador {player_idx + 1}: Energia incrementada para {game_state[energy_key]:.1f}% (+{energy_gain}%)")
-                        
-                        # Verificar se ganhou
-                        if game_state[energy_key] >= 100:
-                            print(f"🏆 VITÓRIA! Jogador {player_idx + 1} atingiu 100% de energia!")
-                            # Congelar o jogo
-                            game_state['game_frozen'] = True
-                            game_state['winner_player'] = player_idx + 1
-                            game_state['game_active'] = False
-                            print(f"🧊 JOGO CONGELADO! Jogador {player_idx + 1} venceu!")
-                            send_udp_message('winner', player_idx + 1)
-                    
-                    # Atualizar estado de pedalada
-                    game_state['is_pedaling'][player_idx] = True
-                    game_state['last_pedal_time'][player_idx] = current_time
-                    game_state['inactivity_count'][player_idx] = 0
-                    
-                    # Atualizar contador de pedaladas
-                    game_state['pedal_count'][player_idx] = int(pedal_num)
+                    energy_gain = game_config['energy_gain_rate'] * (1 + missed)
+                    energy = register_pedal(player_idx, current_time, energy_gain, int(pedal_num), missed)
+                    print(f"⚡ Jogador {player_idx + 1}: Energia incrementada para {energy:.1f}% (+{energy_gain}%)")
             
             except Exception as e:
                 print(f"❌ Erro ao processar interrupção: {e}")
@@ -646,186 +2695,1030 @@ def send_udp_message(message_type, player_id=0):
     except Exception as e:
         print(f"❌ Erro ao enviar UDP: {e}")
 
-class BikeJJHTTPHandler(http.server.BaseHTTPRequestHandler):
+# Diagnóstico de memória para eventos longos (opt-in, tracemalloc)
+MEMORY_DIAGNOSTICS = os.environ.get('BIKEJJ_MEMORY_DIAGNOSTICS', '') == '1'  # Ligar já na inicialização
+MEMORY_DUMP_INTERVAL = 600.0  # Gravar um relatório em disco a cada 10 minutos
+MEMORY_TRACE_FRAMES = 10  # Profundidade do traceback guardado por alocação
+MEMORY_TOP_N = 15  # Linhas em cada ranking do relatório
+DIAGNOSTICS_DIR = 'diagnostics'
+
+def read_process_rss_kb():
+    """Memória residente do processo (Linux); None nos outros sistemas"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+def count_objects_by_type(limit=MEMORY_TOP_N):
+    """Contagem de objetos vivos por tipo (coletados pelo gc)"""
+    counts = collections.Counter(type(obj).__name__ for obj in gc.get_objects())
+    return [{'type': name, 'count': count} for name, count in counts.most_common(limit)]
+
+def describe_thread_stacks():
+    """Profundidade da pilha e função atual de cada thread"""
+    frames = sys._current_frames()
+    threads = []
+    for thread in threading.enumerate():
+        frame = frames.get(thread.ident)
+        depth = 0
+        current = None
+        if frame is not None:
+            current = f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_lineno} {frame.f_code.co_name}"
+            while frame is not None:
+                depth += 1
+                frame = frame.f_back
+        threads.append({'name': thread.name, 'daemon': thread.daemon, 'stack_depth': depth, 'current': current})
+    return threads
+
+class MemoryDiagnostics:
+    """Snapshots periódicos do tracemalloc com diferença contra a linha de base e o snapshot anterior"""
+
+    def __init__(self, dump_interval=MEMORY_DUMP_INTERVAL):
+        self.dump_interval = dump_interval
+        self.lock = threading.Lock()
+        self.running = False
+        self.stop_event = None
+        self.thread = None
+        self.started_at = None
+        self.baseline = None
+        self.previous = None
+        self.dump_count = 0
+        self.last_dump_path = None
+        self.owns_tracing = False  # tracemalloc ligado por nós (não por PYTHONTRACEMALLOC/-X)
+
+    def start(self):
+        with self.lock:
+            if self.running:
+                return False
+            self.owns_tracing = not tracemalloc.is_tracing()
+            if self.owns_tracing:
+                tracemalloc.start(MEMORY_TRACE_FRAMES)
+            self.baseline = self.previous = self._take_snapshot()
+            self.started_at = time.time()
+            self.running = True
+            self.stop_event = threading.Event()
+            self.thread = threading.Thread(target=self._dump_worker, args=(self.stop_event,),
+                                           name='memory-diagnostics', daemon=True)
+            self.thread.start()
+        print(f"🧠 Diagnóstico de memória ativado (relatório a cada {self.dump_interval:.0f}s em {DIAGNOSTICS_DIR}/)")
+        return True
+
+    def stop(self):
+        with self.lock:
+            if not self.running:
+                return False
+            self.running = False
+            self.stop_event.set()
+            self.baseline = self.previous = None
+            if self.owns_tracing:
+                tracemalloc.stop()
+                self.owns_tracing = False
+        print("🧠 Diagnóstico de memória desativado")
+        return True
+
+    def _take_snapshot(self):
+        # Ignorar as alocações do próprio tracemalloc e do import
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+            tracemalloc.Filter(False, '<unknown>'),
+        ))
+
+    @staticmethod
+    def _format_diff(stats):
+        return [{
+            'location': str(stat.traceback[0]),
+            'size_kb': round(stat.size / 1024, 1),
+            'size_diff_kb': round(stat.size_diff / 1024, 1),
+            'count': stat.count,
+            'count_diff': stat.count_diff
+        } for stat in stats[:MEMORY_TOP_N]]
+
+    def report(self):
+        """Relatório completo; com o tracemalloc ligado inclui as diferenças entre snapshots"""
+        report = {
+            'timestamp': time.time(),
+            'tracing': self.running,
+            'rss_kb': read_process_rss_kb(),
+            'gc_counts': gc.get_count(),
+            'objects_by_type': count_objects_by_type(),
+            'threads': describe_thread_stacks()
+        }
+        with self.lock:
+            if not self.running:
+                return report
+            current = self._take_snapshot()
+            traced, peak = tracemalloc.get_traced_memory()
+            report.update({
+                'started_at': self.started_at,
+                'traced_kb': round(traced / 1024, 1),
+                'traced_peak_kb': round(peak / 1024, 1),
+                'growth_since_start': self._format_diff(current.compare_to(self.baseline, 'lineno')),
+                'growth_since_previous': self._format_diff(current.compare_to(self.previous, 'lineno'))
+            })
+            self.previous = current
+        return report
+
+    def dump(self):
+        """Gravar o relatório atual em diagnostics/memory-<data>.json"""
+        os.makedirs(DIAGNOSTICS_DIR, exist_ok=True)
+        path = os.path.join(DIAGNOSTICS_DIR, f"memory-{time.strftime('%Y%m%d-%H%M%S')}.json")
+        report = self.report()
+        write_json_atomic(path, report, indent=2)
+        self.dump_count += 1
+        self.last_dump_path = path
+        print(f"🧠 Relatório de memória gravado em {path} (RSS: {report['rss_kb']} kB)")
+        return path
+
+    def _dump_worker(self, stop_event):
+        while not stop_event.wait(self.dump_interval):
+            try:
+                self.dump()
+            except Exception as e:
+                print(f"❌ Erro ao gravar relatório de memória: {e}")
+
+memory_diagnostics = MemoryDiagnostics()
+
+# Profiler por amostragem (sys._current_frames), ligado sob demanda
+PROFILER_INTERVAL = 0.005  # 200 amostras por segundo
+PROFILER_MAX_DURATION = 300.0  # Desligar sozinho após 5 minutos
+PROFILER_STATS_LIMIT = 40  # Funções listadas no relatório estilo pstats
+
+def profile_thread_label(thread):
+    """Nome estável da thread para agrupar as pilhas (handlers HTTP viram um grupo só)"""
+    if 'process_request_thread' in thread.name:
+        return 'http-handler'
+    return thread.name
+
+class SamplingProfiler:
+    """Amostra as pilhas de todas as threads; sem custo nenhum enquanto desligado"""
+
+    def __init__(self, interval=PROFILER_INTERVAL, max_duration=PROFILER_MAX_DURATION):
+        self.interval = interval
+        self.max_duration = max_duration
+        self.lock = threading.Lock()
+        self.running = False
+        self.stop_event = None
+        self.thread = None
+        self.started_at = None
+        self.stopped_at = None
+        self.sample_count = 0
+        self.stacks = collections.Counter()  # "thread;f1;f2;..." -> amostras
+        self.self_samples = collections.Counter()
+        self.total_samples = collections.Counter()
+
+    def start(self):
+        with self.lock:
+            if self.running:
+                return False
+            self.stacks.clear()
+            self.self_samples.clear()
+            self.total_samples.clear()
+            self.sample_count = 0
+            self.started_at = time.time()
+            self.stopped_at = None
+            self.running = True
+            self.stop_event = threading.Event()
+            self.thread = threading.Thread(target=self._sample_loop, args=(self.stop_event,),
+                                           name='profiler', daemon=True)
+            self.thread.start()
+        print(f"🔬 Profiler ativado ({1 / self.interval:.0f} amostras/s, máximo {self.max_duration:.0f}s)")
+        return True
+
+    def stop(self):
+        with self.lock:
+            if not self.running:
+                return False
+            self.running = False
+            self.stopped_at = time.time()
+            self.stop_event.set()
+        print(f"🔬 Profiler desativado ({self.sample_count} amostras)")
+        return True
+
+    def _sample_loop(self, stop_event):
+        own_ident = threading.get_ident()
+        deadline = time.monotonic() + self.max_duration
+        labels = {}
+        while not stop_event.wait(self.interval):
+            if time.monotonic() >= deadline:
+                self.stop()
+                return
+            frames = sys._current_frames()
+            with self.lock:
+                if not self.running:
+                    return
+                for thread in threading.enumerate():
+                    if thread.ident == own_ident or thread.ident not in frames:
+                        continue
+                    labels[thread.ident] = profile_thread_label(thread)
+                    self._record(labels[thread.ident], frames[thread.ident])
+                self.sample_count += 1
+
+    def _record(self, label, frame):
+        functions = []
+        while frame is not None:
+            code = frame.f_code
+            functions.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        if not functions:
+            return
+        functions.reverse()
+        self.stacks[';'.join([label] + functions)] += 1
+        self.self_samples[functions[-1]] += 1
+        for function in set(functions):
+            self.total_samples[function] += 1
+
+    def collapsed(self):
+        """Pilhas no formato 'collapsed' (flamegraph.pl, speedscope, inferno)"""
+        with self.lock:
+            return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def stats(self, limit=PROFILER_STATS_LIMIT):
+        """Tabela no estilo pstats, ordenada pelo tempo acumulado estimado"""
+        with self.lock:
+            end = self.stopped_at or time.time()
+            duration = end - self.started_at if self.started_at else 0
+            lines = [
+                f"{self.sample_count} amostras em {duration:.1f}s "
+                f"(intervalo {self.interval * 1000:.0f}ms, {'ativo' if self.running else 'parado'})",
+                "",
+                f"{'amostras':>9} {'tottime':>9} {'cumtime':>9}  função",
+            ]
+            for function, total in self.total_samples.most_common(limit):
+                own = self.self_samples.get(function, 0)
+                lines.append(f"{total:>9} {own * self.interval:>9.3f} {total * self.interval:>9.3f}  {function}")
+        return '\n'.join(lines) + '\n'
+
+    def status(self):
+        return {
+            'running': self.running,
+            'samples': self.sample_count,
+            'stacks': len(self.stacks),
+            'started_at': self.started_at,
+            'stopped_at': self.stopped_at,
+            'interval': self.interval
+        }
+
+sampling_profiler = SamplingProfiler()
+
+# Saúde do servidor para o watchdog do start_bikejj.py
+HEALTH_MAX_HEARTBEAT_AGE = 2.0  # Thread sem dar sinal por mais que isso = travada
+server_started_at = time.monotonic()
+server_ready = False  # Tudo iniciado e aceitando conexões
+http_heartbeat = None  # Última volta do loop do serve_forever
+
+def heartbeat_check(heartbeat, now):
+    age = None if heartbeat is None else round(now - heartbeat, 3)
+    return {'ok': age is not None and age <= HEALTH_MAX_HEARTBEAT_AGE, 'age': age}
+
+def health_status():
+    """Liveness/readiness: loop HTTP, thread de decaimento e leitor serial
+
+    O leitor serial só derruba a saúde se a thread estiver travada; Arduino
+    desconectado é apenas 'degraded' (o jogo segue com o teclado).
+    """
+    now = time.monotonic()
+    checks = {
+        'http': heartbeat_check(http_heartbeat, now),
+        'decay': heartbeat_check(decay_heartbeat, now)
+    }
+    serial_check = {'ok': True, 'age': None, 'running': False, 'connected': False}
+    if arduino_reader and arduino_reader.running:
+        serial_check.update(heartbeat_check(arduino_reader.heartbeat, now))
+        serial_check['running'] = True
+        serial_check['connected'] = arduino_reader.connected
+        processor = heartbeat_check(arduino_reader.processor_heartbeat, now)
+        serial_check['processor_age'] = processor['age']
+        serial_check['queue_depth'] = len(arduino_reader.line_ring.items)
+        serial_check['ok'] = serial_check['ok'] and processor['ok']
+    checks['serial'] = serial_check
+    
+    live = all(check['ok'] for check in checks.values())
+    if not live:
+        status = 'fail'
+    elif not server_ready:
+        status = 'starting'
+    elif not serial_check['connected']:
+        status = 'degraded'
+    else:
+        status = 'ok'
+    return {
+        'status': status,
+        'live': live,
+        'ready': server_ready and live,
+        'pid': os.getpid(),  # O watchdog confere que respondeu o processo que ele abriu
+        'uptime': round(now - server_started_at, 1),
+        'checks': checks,
+        'connections': http_connection_stats.status()
+    }
+
+# Conexões HTTP/1.1 persistentes (keep-alive)
+HTTP_KEEPALIVE_TIMEOUT = 5.0  # Segundos sem nova requisição antes de fechar a conexão
+HTTP_MAX_REQUESTS_PER_CONNECTION = 1000  # Depois disso a resposta pede para o cliente reconectar
+
+class HTTPConnectionStats:
+    """Contadores de conexões abertas/fechadas e requisições por conexão"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.active = 0
+        self.opened_total = 0
+        self.closed_total = 0
+        self.requests_total = 0
+        self.max_requests = 0
+
+    def opened(self):
+        with self.lock:
+            self.active += 1
+            self.opened_total += 1
+
+    def closed(self, requests):
+        with self.lock:
+            self.active -= 1
+            self.closed_total += 1
+            self.requests_total += requests
+            self.max_requests = max(self.max_requests, requests)
+
+    def status(self):
+        with self.lock:
+            return {
+                'active': self.active,
+                'opened': self.opened_total,
+                'requests_per_connection': round(self.requests_total / self.closed_total, 1) if self.closed_total else 0,
+                'max_requests_per_connection': self.max_requests
+            }
+
+http_connection_stats = HTTPConnectionStats()
+
+# Tabela de rotas HTTP (montada uma vez na carga do módulo) e métricas por rota
+ROUTE_LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                         0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0, 30.0)  # Limites superiores (s)
+
+http_routes = {}  # (método, caminho) -> método do handler
+
+def route(method, *paths):
+    """Decorador: registrar o método do handler para os caminhos exatos (sem query string)"""
+    def register(func):
+        for path in paths:
+            http_routes[(method, path)] = func
+        return func
+    return register
+
+class RouteStats:
+    """Contagem, latência (histograma), bytes e status de cada rota"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.routes = {}
+            self.started_at = time.time()
+
+    def record(self, method, path, elapsed, status, sent):
+        bucket = bisect.bisect_left(ROUTE_LATENCY_BUCKETS, elapsed)
+        with self.lock:
+            entry = self.routes.get((method, path))
+            if entry is None:
+                entry = self.routes[(method, path)] = {
+                    'count': 0, 'total': 0.0, 'max': 0.0, 'bytes': 0, 'status': {},
+                    'histogram': [0] * (len(ROUTE_LATENCY_BUCKETS) + 1)
+                }
+            entry['count'] += 1
+            entry['total'] += elapsed
+            entry['max'] = max(entry['max'], elapsed)
+            entry['bytes'] += sent
+            entry['status'][status] = entry['status'].get(status, 0) + 1
+            entry['histogram'][bucket] += 1
+
+    @staticmethod
+    def _percentile(histogram, count, fraction, maximum):
+        """Limite superior do balde que contém o percentil (nunca acima do máximo visto)"""
+        target = count * fraction
+        seen = 0
+        for i, n in enumerate(histogram):
+            seen += n
+            if seen >= target and i < len(ROUTE_LATENCY_BUCKETS):
+                return min(ROUTE_LATENCY_BUCKETS[i], maximum)
+        return maximum
+
+    def report(self):
+        with self.lock:
+            entries = [(key, dict(entry, status=dict(entry['status']), histogram=list(entry['histogram'])))
+                       for key, entry in self.routes.items()]
+            started_at = self.started_at
+        busy = sum(entry['total'] for _, entry in entries) or 1.0
+        routes = []
+        for (method, path), entry in sorted(entries, key=lambda item: item[1]['total'], reverse=True):
+            count = entry['count']
+            routes.append({
+                'method': method,
+                'path': path,
+                'count': count,
+                'avg_ms': round(entry['total'] / count * 1000, 3),
+                'p50_ms': round(self._percentile(entry['histogram'], count, 0.5, entry['max']) * 1000, 3),
+                'p99_ms': round(self._percentile(entry['histogram'], count, 0.99, entry['max']) * 1000, 3),
+                'max_ms': round(entry['max'] * 1000, 3),
+                'time_share': round(entry['total'] / busy, 3),
+                'bytes': entry['bytes'],
+                'avg_bytes': entry['bytes'] // count,
+                'status': {str(code): n for code, n in entry['status'].items()}
+            })
+        return {'since': started_at, 'uptime': round(time.time() - started_at, 1), 'routes': routes}
+
+route_stats = RouteStats()
+
+class BikeJJHTTPHandler(http.server.BaseHTTPRequestHandler):
+    # HTTP/1.1: displays reaproveitam a conexão entre polls (toda resposta tem Content-Length)
+    protocol_version = 'HTTP/1.1'
+    timeout = HTTP_KEEPALIVE_TIMEOUT  # Conexão ociosa por mais que isso é fechada
+    disable_nagle_algorithm = True  # Cabeçalho e corpo saem em writes separados: sem Nagle + ACK atrasado (40ms)
+
+    def setup(self):
+        super().setup()
+        self.requests_on_connection = 0
+        http_connection_stats.opened()
+
+    def finish(self):
+        super().finish()
+        http_connection_stats.closed(self.requests_on_connection)
+
+    def handle_one_request(self):
+        self.requests_on_connection += 1
+        super().handle_one_request()
+
     def end_headers(self):
         # Adicionar CORS headers
         self.send_header('Access-Control-Allow-Origin', '*')
         self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
         self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        if self.requests_on_connection >= HTTP_MAX_REQUESTS_PER_CONNECTION:
+            self.close_connection = True  # Limite por conexão: o cliente abre outra
+        if self.close_connection:
+            self.send_header('Connection', 'close')
+        else:
+            self.send_header('Keep-Alive', f'timeout={HTTP_KEEPALIVE_TIMEOUT:g}, max={HTTP_MAX_REQUESTS_PER_CONNECTION}')
         super().end_headers()
 
+    def log_error(self, format, *args):
+        if format.startswith('Request timed out'):
+            return  # Conexão keep-alive ociosa encerrada pelo timeout (normal)
+        super().log_error(format, *args)
+
+    def send_response(self, code, message=None):
+        self.response_status = code  # Para as métricas por rota
+        super().send_response(code, message)
+
+    def send_body(self, status, body, content_type='application/json', headers=None):
+        """Resposta completa com Content-Length (a conexão pode continuar aberta)"""
+        self.response_bytes += len(body)
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, status, payload, headers=None):
+        self.send_body(status, json.dumps(payload).encode(), headers=headers)
+
+    def send_chunked(self, status, chunks, content_type, headers=None):
+        """Resposta em streaming (Transfer-Encoding: chunked) a partir de um iterável de bytes"""
+        chunked = self.request_version == 'HTTP/1.1'
+        if not chunked:
+            self.close_connection = True  # HTTP/1.0: o fim do corpo é o fechamento da conexão
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        if chunked:
+            self.send_header('Transfer-Encoding', 'chunked')
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        try:
+            for chunk in chunks:
+                if not chunk:
+                    continue  # Pedaço vazio encerraria a resposta
+                if chunked:
+                    self.wfile.write(b'%x\r\n%s\r\n' % (len(chunk), chunk))
+                else:
+                    self.wfile.write(chunk)
+                self.response_bytes += len(chunk)
+            if chunked:
+                self.wfile.write(b'0\r\n\r\n')
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True  # Cliente desistiu no meio
+        except Exception as e:
+            # Cabeçalho já enviado: fechar sem o pedaço final sinaliza o corte ao cliente
+            self.close_connection = True
+            print(f"❌ Erro durante resposta em streaming {self.route_path}: {e}")
+        finally:
+            close = getattr(chunks, 'close', None)
+            if close is not None:
+                close()
+
     def do_OPTIONS(self):
         self.send_response(200)
+        self.send_header('Content-Length', '0')
         self.end_headers()
 
-    def do_GET(self):
-        print(f"🔍 GET request: {self.path}")
+    def requested_state_format(self):
+        """'json', 'binary' ou 'msgpack' (?format= tem prioridade sobre o Accept)"""
+        if 'format' in self.query:
+            return self.query['format'][0]
+        accept = self.headers.get('Accept', '')
+        for name, (content_type, _) in STATE_ENCODERS.items():
+            if content_type in accept:
+                return name
+        return 'json'
+
+    def handle_state_poll(self):
+        """GET /api/state?since=<versão>&timeout=<s>&format=json|binary|msgpack"""
+        query = self.query
+        state_format = self.requested_state_format()
+        if state_format != 'json' and (state_format not in STATE_ENCODERS
+                                       or (state_format == 'msgpack' and msgpack is None)):
+            self.send_json(406, {'success': False, 'message': f'Formato indisponível: {state_format}'})
+            return
+        try:
+            since = int(query['since'][0]) if 'since' in query else None
+            timeout = float(query.get('timeout', [STATE_POLL_TIMEOUT])[0])
+        except ValueError:
+            self.send_json(400, {'success': False, 'message': 'since/timeout inválidos'})
+            return
+        timeout = max(0.0, min(timeout, STATE_POLL_MAX_TIMEOUT))
+        
+        state_versions.refresh()
+        version, full, fields = state_versions.changes_since(since)
+        if not full and not fields and timeout > 0:
+            if state_versions.wait_for_change(since, timeout):
+                time.sleep(STATE_POLL_COALESCE)
+                state_versions.refresh()
+            version, full, fields = state_versions.changes_since(since)
         
-        # Rotas da API têm prioridade
-        if self.path == '/api/state':
-            # Retornar estado do jogo
-            print(f"📊 Retornando estado do jogo: {game_state}")
-            self.send_response(200)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
-            self.wfile.write(json.dumps(game_state).encode())
+        content_type = 'application/json'
+        if state_format != 'json':
+            # Formatos compactos sempre trazem o estado inteiro (52 bytes não compensam delta)
+            content_type, encoder = STATE_ENCODERS[state_format]
+            version, _, fields = state_versions.changes_since(None)
+            body = encoder(fields, version)
+        else:
+            body = json.dumps({'version': version, 'full': full, 'state': fields}).encode()
+        self.send_body(200, body, content_type, {'Cache-Control': 'no-cache'})
+
+    def dispatch(self, method):
+        """Encontrar a rota pelo caminho (sem a query string) e medir a requisição"""
+        url = urllib.parse.urlsplit(self.path)
+        self.route_path = url.path
+        self.query = urllib.parse.parse_qs(url.query)
+        self.response_status = None
+        self.response_bytes = 0
+        handler = http_routes.get((method, url.path))
+        start = time.perf_counter()
+        try:
+            if handler is not None:
+                handler(self)
+            elif method == 'GET':
+                self.serve_static()
+            else:
+                self.close_connection = True  # Corpo da requisição não foi lido
+                self.send_body(404, b"Not found", 'text/plain')
+        finally:
+            # Estáticos e 404 agrupados: caminhos arbitrários não criam entradas novas
+            name = url.path if handler is not None else ('<static>' if method == 'GET' else '<404>')
+            route_stats.record(method, name, time.perf_counter() - start, self.response_status, self.response_bytes)
+
+    def do_GET(self):
+        if self.path != '/healthz':  # Watchdog consulta várias vezes por segundo
+            print(f"🔍 GET request: {self.path}")
+        self.dispatch('GET')
+
+    def do_POST(self):
+        self.dispatch('POST')
+
+    @route('GET', '/api/state')
+    def get_state(self):
+        """Retornar estado do jogo"""
+        # Só since/timeout (long-poll) ou um formato pedido mudam a resposta; qualquer outro
+        # parâmetro (cache-buster, tag de analytics) recebe o estado simples de sempre
+        if 'since' in self.query or 'timeout' in self.query or self.requested_state_format() != 'json':
+            self.handle_state_poll()
             return
-        elif self.path == '/api/start-game':
-            # Verificar se todos os jogadores estão prontos
-            if not game_state['game_can_start']:
-                ready_count = sum(game_state['players_ready'])
-                print(f"❌ Jogo não pode ser iniciado. Apenas {ready_count}/4 jogadores estão prontos.")
-                self.send_response(400)  # Bad Request
-                self.send_header('Content-Type', 'application/json')
-                self.end_headers()
-                response = {
-                    'success': False,
-                    'message': f'Jogo não pode ser iniciado. Apenas {ready_count}/4 jogadores estão prontos.',
-                    'players_ready': game_state['players_ready'],
-                    'ready_count': ready_count
-                }
-                self.wfile.write(json.dumps(response).encode())
-                return
-            
-            # Iniciar jogo
-            game_state['game_active'] = True
-            # Resetar energia de todos os jogadores
-            for i in range(4):
-                game_state[f'player{i+1}_energy'] = 0
-                game_state['pedal_count'][i] = 0
-                game_state['is_pedaling'][i] = False
-                game_state['inactivity_count'][i] = 0
-                game_state['last_pedal_time'][i] = 0
-                game_state['inactivity_timer'][i] = 0
-                game_state['players_ready'][i] = False  # Resetar após iniciar
-            game_state['game_can_start'] = False  # Resetar após iniciar
-            print("🎮 Jogo iniciado para 4 jogadores")
-            self.send_response(200)
-            self.end_headers()
-            self.wfile.write(json.dumps({'success': True, 'message': 'Jogo iniciado!'}).encode())
+        print(f"📊 Retornando estado do jogo: {game_state}")
+        state_versions.refresh()
+        self.send_json(200, game_state, {'X-State-Version': str(state_versions.version)})
+
+    @route('GET', '/api/start-game')
+    def get_start_game(self):
+        """Verificar se todos os jogadores estão prontos"""
+        if not game_state['game_can_start']:
+            ready_count = sum(game_state['players_ready'])
+            print(f"❌ Jogo não pode ser iniciado. Apenas {ready_count}/4 jogadores estão prontos.")
+            response = {
+                'success': False,
+                'message': f'Jogo não pode ser iniciado. Apenas {ready_count}/4 jogadores estão prontos.',
+                'players_ready': game_state['players_ready'],
+                'ready_count': ready_count
+            }
+            self.send_json(400, response)  # Bad Request
             return
-        elif self.path == '/api/reset-game':
-            # Resetar jogo
+        
+        # Iniciar jogo
+        with game_lock:
+            game_state['game_active'] = True
+            # Resetar energia de todos os jogadores (e prontidão/flag de início após iniciar)
+            reset_players()
+        print("🎮 Jogo iniciado para 4 jogadores")
+        self.send_json(200, {'success': True, 'message': 'Jogo iniciado!'})
+
+    @route('GET', '/api/reset-game')
+    def get_reset_game(self):
+        """Resetar jogo"""
+        with game_lock:
             game_state['game_active'] = False
             game_state['game_frozen'] = False  # Descongelar o jogo
             game_state['winner_player'] = 0  # Resetar vencedor
-            # Resetar energia de todos os jogadores
-            for i in range(4):
-                game_state[f'player{i+1}_energy'] = 0
-                game_state['pedal_count'][i] = 0
-                game_state['is_pedaling'][i] = False
-                game_state['inactivity_count'][i] = 0
-                game_state['last_pedal_time'][i] = 0
-                game_state['inactivity_timer'][i] = 0
-                game_state['players_ready'][i] = False  # Resetar jogadores prontos
-            game_state['game_can_start'] = False  # Resetar flag de início
-            
-            # Enviar mensagem de reset via UDP
-            send_udp_message('reset', 0)
-            
-            print("🔄 Jogo resetado e descongelado para 4 jogadores")
-            self.send_response(200)
-            self.end_headers()
-            self.wfile.write(b"OK")
-            return
-        elif self.path == '/api/serial/ports':
-            # Listar portas seriais disponíveis
-            self.send_response(200)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
-            ports = list_available_ports()
+            # Resetar energia de todos os jogadores, jogadores prontos e flag de início
+            reset_players()
+        
+        # Enviar mensagem de reset via UDP
+        send_udp_message('reset', 0)
+        
+        print("🔄 Jogo resetado e descongelado para 4 jogadores")
+        self.send_body(200, b"OK", 'text/plain')
+
+    @route('GET', '/api/serial/ports')
+    def get_serial_ports(self):
+        """Listar portas seriais disponíveis (direto do inventário em memória)"""
+        ports, version = port_inventory.snapshot()
+        response = {
+            'ports': ports,
+            'version': version,
+            'current_port': SERIAL_PORT,
+            'connected': arduino_reader.connected if arduino_reader else False
+        }
+        self.send_json(200, response)
+
+    @route('GET', '/api/serial/ports/events')
+    def get_serial_port_events(self):
+        """Stream (Server-Sent Events) com a lista de portas a cada hotplug"""
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.close_connection = True  # Corpo sem tamanho: termina quando a conexão fecha
+        self.end_headers()
+        version = None
+        try:
+            while port_inventory.running:
+                ports, new_version = port_inventory.wait_for_change(version, timeout=15)
+                if new_version != version:
+                    version = new_version
+                    payload = {
+                        'ports': ports,
+                        'version': version,
+                        'current_port': SERIAL_PORT,
+                        'connected': arduino_reader.connected if arduino_reader else False
+                    }
+                    self.wfile.write(f"event: ports\ndata: {json.dumps(payload)}\n\n".encode())
+                else:
+                    self.wfile.write(b": keepalive\n\n")
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    @route('GET', '/api/serial/status')
+    def get_serial_status(self):
+        """Status da conexão serial"""
+        status = {
+            'current_port': SERIAL_PORT,
+            'connected': arduino_reader.connected if arduino_reader else False,
+            'baudrate': SERIAL_BAUDRATE
+        }
+        if arduino_reader:
+            status.update(arduino_reader.status())
+        status['tap'] = serial_tap.status()
+        self.send_json(200, status)
+
+    @route('GET', '/api/serial/connect')
+    def get_serial_connect(self):
+        """Conectar à porta serial selecionada no frontend"""
+        
+        # O frontend deveria enviar a porta selecionada, mas por agora vamos usar a última configurada
+        if SERIAL_PORT:
+            try:
+                # Tentar conectar
+                if arduino_reader:
+                    success = arduino_reader.start()
+                    if success:
+                        response = {'success': True, 'message': f'Conectado à porta {SERIAL_PORT}'}
+                    else:
+                        response = {'success': False, 'message': f'Falha ao conectar à porta {SERIAL_PORT}'}
+                else:
+                    response = {'success': False, 'message': 'Arduino reader não inicializado'}
+            except Exception as e:
+                response = {'success': False, 'message': f'Erro ao conectar: {str(e)}'}
+        else:
+            response = {'success': False, 'message': 'Nenhuma porta configurada. Selecione uma porta primeiro.'}
+        
+        self.send_json(200, response)
+
+    @route('GET', '/api/config')
+    def get_config(self):
+        """Retornar configurações atuais do jogo"""
+        response = {
+            'config': game_config,
+            'file_exists': os.path.exists(GAME_CONFIG_FILE),
+            'file_path': GAME_CONFIG_FILE
+        }
+        self.send_json(200, response)
+
+    @route('GET', '/api/config/reload')
+    def get_config_reload(self):
+        """Recarregar configurações do arquivo"""
+        try:
+            load_game_config()
             response = {
-                'ports': ports,
-                'current_port': SERIAL_PORT,
-                'connected': arduino_reader.running if arduino_reader else False
+                'success': True, 
+                'message': 'Configurações recarregadas do arquivo', 
+                'config': game_config
             }
-            self.wfile.write(json.dumps(response).encode())
-            return
-        elif self.path == '/api/serial/status':
-            # Status da conexão serial
-            self.send_response(200)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
-            status = {
-                'current_port': SERIAL_PORT,
-                'connected': arduino_reader.running if arduino_reader else False,
-                'baudrate': SERIAL_BAUDRATE
+            print(f"🔄 Configurações recarregadas do arquivo {GAME_CONFIG_FILE}")
+        except Exception as e:
+            response = {
+                'success': False, 
+                'message': f'Erro ao recarregar: {str(e)}', 
+                'config': game_config
             }
-            self.wfile.write(json.dumps(status).encode())
+            print(f"❌ Erro ao recarregar configurações: {e}")
+        
+        self.send_json(200, response)
+
+    @route('GET', '/healthz')
+    def get_healthz(self):
+        """Liveness/readiness para o watchdog (503 se alguma thread travou ou ainda iniciando)"""
+        health = health_status()
+        self.send_json(200 if health['ready'] else 503, health)
+
+    @route('GET', '/api/leaderboard')
+    def get_leaderboard(self):
+        """Ranking do dia e geral (resposta pré-codificada, custo igual ao de /api/state)"""
+        self.send_body(200, leaderboard.response_body())
+
+    @route('GET', '/api/debug/memory')
+    def get_debug_memory(self):
+        """Relatório de memória (tracemalloc, objetos por tipo, pilhas das threads)"""
+        self.send_json(200, memory_diagnostics.report())
+
+    @route('GET', '/api/debug/memory/start', '/api/debug/memory/stop')
+    def get_debug_memory_toggle(self):
+        """Ligar/desligar o tracemalloc em tempo de execução"""
+        if self.route_path.endswith('/start'):
+            changed = memory_diagnostics.start()
+        else:
+            changed = memory_diagnostics.stop()
+        response = {'success': True, 'changed': changed, 'tracing': memory_diagnostics.running}
+        self.send_json(200, response)
+
+    @route('GET', '/api/debug/memory/dump')
+    def get_debug_memory_dump(self):
+        """Gravar um relatório em disco agora"""
+        try:
+            response = {'success': True, 'path': memory_diagnostics.dump()}
+        except Exception as e:
+            response = {'success': False, 'message': f'Erro ao gravar relatório: {str(e)}'}
+        self.send_json(200, response)
+
+    @route('GET', '/api/debug/profile/start', '/api/debug/profile/stop', '/api/debug/profile')
+    def get_debug_profile(self):
+        """Ligar/desligar o profiler por amostragem e consultar o estado"""
+        if self.route_path.endswith('/start'):
+            sampling_profiler.start()
+        elif self.route_path.endswith('/stop'):
+            sampling_profiler.stop()
+        self.send_json(200, sampling_profiler.status())
+
+    @route('GET', '/api/debug/profile/collapsed', '/api/debug/profile/stats')
+    def get_debug_profile_output(self):
+        """Resultado do profiler: pilhas para flamegraph ou tabela estilo pstats"""
+        if self.route_path.endswith('/collapsed'):
+            body = sampling_profiler.collapsed()
+        else:
+            body = sampling_profiler.stats()
+        self.send_body(200, body.encode('utf-8'), 'text/plain; charset=utf-8')
+
+    @route('GET', '/api/debug/routes')
+    def get_debug_routes(self):
+        """Latência, bytes e status por rota desde o início (ou o último reset)"""
+        self.send_json(200, route_stats.report())
+
+    @route('GET', '/api/debug/routes/reset')
+    def get_debug_routes_reset(self):
+        route_stats.reset()
+        self.send_json(200, {'success': True})
+
+    @route('GET', '/api/history/export')
+    def get_history_export(self):
+        """Histórico de partidas em CSV, NDJSON ou JSON, enviado conforme é lido
+
+        ?format=csv|ndjson|json&from=AAAA-MM-DD&to=AAAA-MM-DD&player=N&winner=N
+        """
+        query = {name: values[0] for name, values in self.query.items()}
+        export_format = query.get('format', 'json')
+        if export_format not in HISTORY_EXPORT_FORMATS:
+            self.send_json(400, {'success': False, 'message': f'Formato inválido: {export_format}'})
+            return
+        try:
+            since = parse_history_bound(query['from']) if query.get('from') else None
+            until = parse_history_bound(query['to'], end=True) if query.get('to') else None
+            player = int(query['player']) if query.get('player') else None
+            winner = int(query['winner']) if query.get('winner') else None
+        except ValueError:
+            self.send_json(400, {'success': False, 'message': 'from/to/player/winner inválidos'})
             return
-        elif self.path == '/api/serial/connect':
-            # Conectar à porta serial selecionada no frontend
-            self.send_response(200)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
+        
+        filename = f"bikejj_history_{local_day(time.time())}.{export_format}"
+        self.send_chunked(200, export_game_history(export_format, since, until, player, winner),
+                          HISTORY_EXPORT_FORMATS[export_format],
+                          {'Content-Disposition': f'attachment; filename="{filename}"',
+                           'Cache-Control': 'no-cache'})
+
+    @route('POST', '/api/pedal')
+    def post_pedal(self):
+        """Endpoint para simular pedaladas via teclado"""
+        try:
+            # Ler o corpo sempre (com keep-alive, corpo não lido quebraria a próxima requisição)
+            content_length = int(self.headers['Content-Length'])
+            post_data = self.rfile.read(content_length)
             
-            # O frontend deveria enviar a porta selecionada, mas por agora vamos usar a última configurada
-            if SERIAL_PORT:
-                try:
-                    # Tentar conectar
-                    if arduino_reader:
-                        success = arduino_reader.start()
-                        if success:
-                            response = {'success': True, 'message': f'Conectado à porta {SERIAL_PORT}'}
-                        else:
-                            response = {'success': False, 'message': f'Falha ao conectar à porta {SERIAL_PORT}'}
-                    else:
-                        response = {'success': False, 'message': 'Arduino reader não inicializado'}
-                except Exception as e:
-                    response = {'success': False, 'message': f'Erro ao conectar: {str(e)}'}
+            # Verificar se o jogo está congelado
+            if game_state['game_frozen']:
+                print(f"🧊 Jogo congelado - Jogador {game_state['winner_player']} venceu! Pedaladas via teclado ignoradas.")
+                response = {'success': False, 'message': f'Jogo congelado - Jogador {game_state["winner_player"]} venceu!'}
+                self.send_json(200, response)
+                return
+            
+            data = json.loads(post_data.decode('utf-8'))
+            
+            player_id = data.get('player', 1)
+            if 1 <= player_id <= 4:
+                player_idx = player_id - 1
+                
+                # Incrementar energia usando configuração
+                energy_gain = game_config['energy_gain_rate']
+                energy = register_pedal(player_idx, game_clock(), energy_gain)
+                state_versions.refresh()
+                
+                print(f"⌨️ TECLADO - Jogador {player_id}: Energia = {energy:.1f}% (+{energy_gain}%)")
+                
+                response = {'success': True, 'energy': energy}
+                self.send_json(200, response)
             else:
-                response = {'success': False, 'message': 'Nenhuma porta configurada. Selecione uma porta primeiro.'}
+                response = {'success': False, 'message': 'Player ID inválido'}
+                self.send_json(400, response)
+        except Exception as e:
+            print(f"❌ Erro ao processar pedalada: {e}")
+            response = {'success': False, 'message': 'Erro interno'}
+            self.send_json(500, response)
+
+    @route('POST', '/api/pedal/batch')
+    def post_pedal_batch(self):
+        """Várias pedaladas (teclado/simulador) em uma única requisição"""
+        try:
+            content_length = int(self.headers['Content-Length'])
+            data = json.loads(self.rfile.read(content_length).decode('utf-8'))
+            events = data.get('events', []) if isinstance(data, dict) else data
+            
+            if not isinstance(events, list) or len(events) > MAX_BATCH_EVENTS:
+                response = {'success': False, 'message': f'Envie uma lista com até {MAX_BATCH_EVENTS} eventos'}
+                self.send_json(400, response)
+                return
+            
+            applied, ignored = apply_pedal_batch(events)
+            state_versions.refresh()
+            energies = [game_state[f'player{i + 1}_energy'] for i in range(4)]
+            print(f"⌨️ LOTE - {applied} eventos aplicados, {ignored} ignorados - Energias = {[round(e, 1) for e in energies]}")
             
-            self.wfile.write(json.dumps(response).encode())
-            return
-        
-        elif self.path == '/api/config':
-            # Retornar configurações atuais do jogo
-            self.send_response(200)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
             response = {
-                'config': game_config,
-                'file_exists': os.path.exists(GAME_CONFIG_FILE),
-                'file_path': GAME_CONFIG_FILE
+                'success': True,
+                'applied': applied,
+                'ignored': ignored,
+                'energy': energies,
+                'game_frozen': game_state['game_frozen'],
+                'winner_player': game_state['winner_player']
             }
-            self.wfile.write(json.dumps(response).encode())
-            return
+            self.send_json(200, response)
+        except Exception as e:
+            print(f"❌ Erro ao processar lote de pedaladas: {e}")
+            response = {'success': False, 'message': 'Erro interno'}
+            self.send_json(500, response)
+
+    @route('POST', '/api/serial/change-port')
+    def post_serial_change_port(self):
+        """Alterar porta serial"""
+        try:
+            content_length = int(self.headers['Content-Length'])
+            post_data = self.rfile.read(content_length)
+            data = json.loads(post_data.decode('utf-8'))
+            
+            new_port = data.get('port')
+            print(f"🔧 Recebido pedido para alterar porta para: {new_port}")
+            
+            if new_port:
+                success = change_serial_port(new_port)
+                print(f"🔧 Resultado da alteração de porta: {success}")
+                response = {'success': success, 'port': new_port, 'message': f'Porta configurada para {new_port}'}
+            else:
+                print("❌ Porta não especificada na requisição")
+                response = {'success': False, 'error': 'Porta não especificada'}
+            
+            self.send_json(200, response)
+        except Exception as e:
+            print(f"❌ Erro ao processar mudança de porta: {e}")
+            response = {'success': False, 'error': f'Erro interno: {str(e)}'}
+            self.send_json(500, response)
+
+    @route('POST', '/api/config/save')
+    def post_config_save(self):
+        """Salvar configurações do jogo"""
+        content_length = int(self.headers['Content-Length'])
+        post_data = self.rfile.read(content_length)
+        data = json.loads(post_data.decode('utf-8'))
         
-        elif self.path == '/api/config/reload':
-            # Recarregar configurações do arquivo
-            try:
-                load_game_config()
+        try:
+            print(f"🔧 Recebendo configurações para salvar: {data}")
+            
+            # Validar uma cópia e trocar a configuração ativa de uma vez
+            old_config = game_config
+            set_game_config(validate_game_config({**old_config, **data}))
+            
+            if 'energy_gain_rate' in data:
+                print(f"📈 Ganho de energia: {old_config['energy_gain_rate']}% → {game_config['energy_gain_rate']}%")
+                
+            if 'energy_decay_rate' in data:
+                print(f"📉 Decaimento: {old_config['energy_decay_rate']}%/s → {game_config['energy_decay_rate']}%/s")
+                
+            if 'led_strobe_rate' in data:
+                print(f"💡 LED strobe: {old_config['led_strobe_rate']}ms → {game_config['led_strobe_rate']}ms")
+            
+            # Gravar no arquivo em background (agrupando alterações seguidas)
+            if config_writer.schedule():
                 response = {
                     'success': True, 
-                    'message': 'Configurações recarregadas do arquivo', 
+                    'message': 'Configurações salvas com sucesso!', 
                     'config': game_config
                 }
-                print(f"🔄 Configurações recarregadas do arquivo {GAME_CONFIG_FILE}")
-            except Exception as e:
+            else:
                 response = {
                     'success': False, 
-                    'message': f'Erro ao recarregar: {str(e)}', 
+                    'message': 'Erro ao salvar no arquivo', 
                     'config': game_config
                 }
-                print(f"❌ Erro ao recarregar configurações: {e}")
+                print(f"❌ Falha ao salvar configurações no arquivo")
             
-            self.send_response(200)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
-            self.wfile.write(json.dumps(response).encode())
-            return
+        except Exception as e:
+            response = {'success': False, 'message': f'Erro ao processar configurações: {str(e)}'}
+            print(f"❌ Erro ao processar configurações: {e}")
         
-        # Servir arquivos estáticos
+        self.send_json(200, response)
+
+    @route('POST', '/api/udp')
+    def post_udp(self):
+        """Endpoint para dados UDP (vitória, reset, etc.)"""
         try:
-            # Mapear rotas para arquivos
-            if self.path == '/':
-                self.path = '/index.html'
-            elif self.path == '/serial':
-                self.path = '/serial_config.html'
+            content_length = int(self.headers['Content-Length'])
+            post_data = self.rfile.read(content_length)
+            data = json.loads(post_data.decode('utf-8'))
+            
+            print(f"📡 UDP Data recebido: {data['type']} - Jogador {data['player_id']}")
+            
+            # Enviar mensagem UDP para o aparato
+            send_udp_message(data['type'], data['player_id'])
+            
+            response = {'success': True, 'message': 'Dados UDP processados e enviados'}
             
+        except Exception as e:
+            response = {'success': False, 'message': f'Erro ao processar dados UDP: {str(e)}'}
+            print(f"❌ Erro ao processar dados UDP: {e}")
+        
+        self.send_json(200, response)
+
+    def serve_static(self):
+        """Servir arquivos estáticos"""
+        try:
+            # Mapear rotas para arquivos
+            if self.route_path == '/':
+                self.route_path = '/index.html'
+            elif self.route_path == '/serial':
+                self.route_path = '/serial_config.html'
+
             # Verificar se o arquivo existe
-            file_path = os.path.join('.', self.path.lstrip('/'))
+            file_path = os.path.join('.', self.route_path.lstrip('/'))
             if os.path.exists(file_path) and os.path.isfile(file_path):
                 # Determinar tipo de conteúdo
                 if file_path.endswith('.html'):
@@ -838,209 +3731,62 @@ class BikeJJHTTPHandler(http.server.BaseHTTPRequestHandler):
                     content_type = 'application/json'
                 else:
                     content_type = 'application/octet-stream'
-                
+
                 # Ler e enviar arquivo
                 with open(file_path, 'rb') as f:
                     content = f.read()
-                
-                self.send_response(200)
-                self.send_header('Content-Type', content_type)
-                self.end_headers()
-                self.wfile.write(content)
+
+                self.send_body(200, content, content_type)
             else:
                 # Arquivo não encontrado
-                self.send_response(404)
-                self.send_header('Content-Type', 'text/plain')
-                self.end_headers()
-                self.wfile.write(b"File not found")
-                
+                self.send_body(404, b"File not found", 'text/plain')
+
         except Exception as e:
-            print(f"❌ Erro ao servir arquivo {self.path}: {e}")
-            self.send_response(500)
-            self.send_header('Content-Type', 'text/plain')
-            self.end_headers()
-            self.wfile.write(f"Internal server error: {str(e)}".encode())
-    
-    def do_POST(self):
-        if self.path == '/api/pedal':
-            # Endpoint para simular pedaladas via teclado
-            try:
-                # Verificar se o jogo está congelado
-                if game_state['game_frozen']:
-                    print(f"🧊 Jogo congelado - Jogador {game_state['winner_player']} venceu! Pedaladas via teclado ignoradas.")
-                    self.send_response(200)
-                    self.send_header('Content-Type', 'application/json')
-                    self.end_headers()
-                    response = {'success': False, 'message': f'Jogo congelado - Jogador {game_state["winner_player"]} venceu!'}
-                    self.wfile.write(json.dumps(response).encode())
-                    return
-                
-                content_length = int(self.headers['Content-Length'])
-                post_data = self.rfile.read(content_length)
-                data = json.loads(post_data.decode('utf-8'))
-                
-                player_id = data.get('player', 1)
-                if 1 <= player_id <= 4:
-                    player_idx = player_id - 1
-                    energy_key = f'player{player_id}_energy'
-                    
-                    # Incrementar energia usando configuração
-                    energy_gain = game_config['energy_gain_rate']
-                    game_state[energy_key] = min(100, game_state[energy_key] + energy_gain)
-                    game_state['is_pedaling'][player_idx] = True
-                    game_state['last_pedal_time'][player_idx] = time.time()
-                    game_state['pedal_count'][player_idx] += 1
-                    
-                    print(f"⌨️ TECLADO - Jogador {player_id}: Energia = {game_state[energy_key]:.1f}% (+{energy_gain}%)")
-                    
-                    # Verificar vitória
-                    if game_state[energy_key] >= 100:
-                        print(f"🏆 VITÓRIA! Jogador {player_id} chegou a 100% de energia!")
-                        # Congelar o jogo
-                        game_state['game_frozen'] = True
-                        game_state['winner_player'] = player_id
-                        game_state['game_active'] = False
-                        print(f"🧊 JOGO CONGELADO! Jogador {player_id} venceu!")
-                        
-                        # Enviar mensagem de vitória via UDP
-                        send_udp_message('winner', player_id)
-                    
-                    self.send_response(200)
-                    self.send_header('Content-Type', 'application/json')
-                    self.end_headers()
-                    response = {'success': True, 'energy': game_state[energy_key]}
-                    self.wfile.write(json.dumps(response).encode())
-                else:
-                    self.send_response(400)
-                    self.send_header('Content-Type', 'application/json')
-                    self.end_headers()
-                    response = {'success': False, 'message': 'Player ID inválido'}
-                    self.wfile.write(json.dumps(response).encode())
-            except Exception as e:
-                print(f"❌ Erro ao processar pedalada: {e}")
-                self.send_response(500)
-                self.send_header('Content-Type', 'application/json')
-                self.end_headers()
-                response = {'success': False, 'message': 'Erro interno'}
-                self.wfile.write(json.dumps(response).encode())
-            return
-                
-        elif self.path == '/api/serial/change-port':
-            # Alterar porta serial
-            try:
-                content_length = int(self.headers['Content-Length'])
-                post_data = self.rfile.read(content_length)
-                data = json.loads(post_data.decode('utf-8'))
-                
-                new_port = data.get('port')
-                print(f"🔧 Recebido pedido para alterar porta para: {new_port}")
-                
-                if new_port:
-                    success = change_serial_port(new_port)
-                    print(f"🔧 Resultado da alteração de porta: {success}")
-                    response = {'success': success, 'port': new_port, 'message': f'Porta configurada para {new_port}'}
-                else:
-                    print("❌ Porta não especificada na requisição")
-                    response = {'success': False, 'error': 'Porta não especificada'}
-                
-                self.send_response(200)
-                self.send_header('Content-Type', 'application/json')
-                self.end_headers()
-                self.wfile.write(json.dumps(response).encode())
-            except Exception as e:
-                print(f"❌ Erro ao processar mudança de porta: {e}")
-                self.send_response(500)
-                self.send_header('Content-Type', 'application/json')
-                self.end_headers()
-                response = {'success': False, 'error': f'Erro interno: {str(e)}'}
-                self.wfile.write(json.dumps(response).encode())
-            
-        elif self.path == '/api/config/save':
-            # Salvar configurações do jogo
-            content_length = int(self.headers['Content-Length'])
-            post_data = self.rfile.read(content_length)
-            data = json.loads(post_data.decode('utf-8'))
-            
-            try:
-                print(f"🔧 Recebendo configurações para salvar: {data}")
-                
-                # Validar e atualizar configurações com range maior para sensibilidade
-                if 'energy_gain_rate' in data:
-                    old_value = game_config['energy_gain_rate']
-                    game_config['energy_gain_rate'] = max(0.1, min(50.0, float(data['energy_gain_rate'])))
-                    print(f"📈 Ganho de energia: {old_value}% → {game_config['energy_gain_rate']}%")
-                    
-                if 'energy_decay_rate' in data:
-                    old_value = game_config['energy_decay_rate']
-                    game_config['energy_decay_rate'] = max(0.1, min(100.0, float(data['energy_decay_rate'])))
-                    print(f"📉 Decaimento: {old_value}%/s → {game_config['energy_decay_rate']}%/s")
-                    
-                if 'led_strobe_rate' in data:
-                    old_value = game_config['led_strobe_rate']
-                    game_config['led_strobe_rate'] = max(50, min(2000, int(data['led_strobe_rate'])))
-                    print(f"💡 LED strobe: {old_value}ms → {game_config['led_strobe_rate']}ms")
-                
-                # Salvar no arquivo
-                if save_game_config():
-                    response = {
-                        'success': True, 
-                        'message': 'Configurações salvas com sucesso!', 
-                        'config': game_config
-                    }
-                    print(f"✅ Configurações salvas com sucesso no arquivo {GAME_CONFIG_FILE}")
-                else:
-                    response = {
-                        'success': False, 
-                        'message': 'Erro ao salvar no arquivo', 
-                        'config': game_config
-                    }
-                    print(f"❌ Falha ao salvar configurações no arquivo")
-                
-            except Exception as e:
-                response = {'success': False, 'message': f'Erro ao processar configurações: {str(e)}'}
-                print(f"❌ Erro ao processar configurações: {e}")
-            
-            self.send_response(200)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
-            self.wfile.write(json.dumps(response).encode())
-            
-        elif self.path == '/api/udp':
-            # Endpoint para dados UDP (vitória, reset, etc.)
-            try:
-                content_length = int(self.headers['Content-Length'])
-                post_data = self.rfile.read(content_length)
-                data = json.loads(post_data.decode('utf-8'))
-                
-                print(f"📡 UDP Data recebido: {data['type']} - Jogador {data['player_id']}")
-                
-                # Enviar mensagem UDP para o aparato
-                send_udp_message(data['type'], data['player_id'])
-                
-                response = {'success': True, 'message': 'Dados UDP processados e enviados'}
-                
-            except Exception as e:
-                response = {'success': False, 'message': f'Erro ao processar dados UDP: {str(e)}'}
-                print(f"❌ Erro ao processar dados UDP: {e}")
-            
-            self.send_response(200)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
-            self.wfile.write(json.dumps(response).encode())
-            
-        else:
-            self.send_response(404)
-            self.end_headers()
+            print(f"❌ Erro ao servir arquivo {self.route_path}: {e}")
+            self.send_body(500, f"Internal server error: {str(e)}".encode(), 'text/plain')
 
-def main():
-    print("🚀 Iniciando servidor BikeJJ...")
-    
-    # Inicializar UDP
-    init_udp_socket()
-    
-    # Carregar configurações
+class BikeJJHTTPServer(socketserver.ThreadingTCPServer):
+    """Servidor HTTP com uma thread por conexão (streams não bloqueiam o polling)"""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def service_actions(self):
+        # Chamado a cada volta do serve_forever: batimento do loop HTTP
+        global http_heartbeat
+        http_heartbeat = time.monotonic()
+
+def autodetect_arduino():
+    """Procurar o Arduino nas portas válidas do inventário; conecta e salva a porta encontrada"""
+    global arduino_reader, SERIAL_PORT
+    ports, _ = port_inventory.snapshot()
+    for port in ports:
+        if not port['valid']:
+            continue  # Mesmo filtro do configurador (Bluetooth, ttyS, modem...)
+        try:
+            print(f"🔍 Testando porta: {port['port']}")
+            test_reader = ArduinoMegaReader(port['port'])
+            if test_reader.start():
+                arduino_reader = test_reader
+                SERIAL_PORT = port['port']
+                save_serial_config(SERIAL_PORT)
+                print(f"✅ Arduino encontrado e conectado em: {port['port']}")
+                return True
+            print(f"❌ Falha ao conectar em {port['port']}")
+        except Exception as test_e:
+            print(f"❌ Erro em {port['port']}: {test_e}")
+    print("⚠️ Arduino não encontrado - sistema funcionará sem sensores")
+    return False
+
+def connect_serial_on_startup():
+    """Testar a porta configurada (ou procurar o Arduino) com o servidor já no ar
+
+    O teste de conexão leva alguns segundos; rodando em background, um restart
+    volta a responder e retoma a partida sem esperar pela serial.
+    """
+    global arduino_reader
     load_serial_config()
-    load_game_config()
+    if arduino_reader and arduino_reader.running:
+        return  # Conectado pelo configurador enquanto a porta era testada
     
     # Conectar automaticamente no Arduino
     if SERIAL_PORT:
@@ -1049,76 +3795,88 @@ def main():
         
         # Tentar conectar automaticamente
         try:
-            global arduino_reader
             arduino_reader = ArduinoMegaReader(SERIAL_PORT)
             arduino_reader.start()
             print("✅ Arduino conectado e funcionando!")
         except Exception as e:
             print(f"❌ Erro ao conectar no Arduino: {e}")
             print("🔄 Tentando detectar Arduino automaticamente...")
-            
-            # Tentar detectar Arduino automaticamente
-            from serial.tools import list_ports
-            ports = list_ports.comports()
-            
-            for port in ports:
-                try:
-                    print(f"🔍 Testando porta: {port.device}")
-                    test_reader = ArduinoMegaReader(port.device)
-                    if test_reader.start():
-                        arduino_reader = test_reader
-                        print(f"✅ Arduino encontrado e conectado em: {port.device}")
-                        break
-                    else:
-                        print(f"❌ Falha ao conectar em {port.device}")
-                except Exception as test_e:
-                    print(f"❌ Erro em {port.device}: {test_e}")
-                    continue
-            else:
-                print("⚠️ Arduino não encontrado - sistema funcionará sem sensores")
+            autodetect_arduino()
     else:
         print("⚠️ Nenhuma porta serial configurada")
         print("🔄 Tentando detectar Arduino automaticamente...")
-        
-        # Tentar detectar Arduino automaticamente
-        from serial.tools import list_ports
-        ports = list_ports.comports()
-        
-        for port in ports:
-            try:
-                print(f"🔍 Testando porta: {port.device}")
-                test_reader = ArduinoMegaReader(port.device)
-                if test_reader.start():
-                    arduino_reader = test_reader
-                    print(f"✅ Arduino encontrado e conectado em: {port.device}")
-                    break
-                else:
-                    print(f"❌ Falha ao conectar em {port.device}")
-            except Exception as test_e:
-                print(f"❌ Erro em {port.device}: {test_e}")
-                continue
-        else:
-            print("⚠️ Arduino não encontrado - sistema funcionará sem sensores")
+        autodetect_arduino()
+
+def main():
+    print("🚀 Iniciando servidor BikeJJ...")
+    
+    # Inicializar UDP
+    init_udp_socket()
+    
+    # Carregar configurações (serial_config.json é testado depois, em background)
+    load_game_config()
+    leaderboard.load()
+    
+    # Retomar a partida interrompida (restart/crash)
+    restore_state_snapshot()
+    
+    # Abrir a porta HTTP antes de tudo o que pode demorar
+    httpd = BikeJJHTTPServer(("", HTTP_PORT), BikeJJHTTPHandler)
+    
+    # Inventário de portas em background (configurador responde da memória)
+    port_inventory.start()
+    
+    # Tap local das linhas da serial (serial_monitor.py --tap)
+    serial_tap.start()
+    
+    # Hot reload de game_config.json e serial_config.json
+    config_watcher.start()
+    
+    # Gravação em background de /api/config/save
+    config_writer.start()
+    
+    # Diagnóstico de memória (BIKEJJ_MEMORY_DIAGNOSTICS=1 ou /api/debug/memory/start)
+    if MEMORY_DIAGNOSTICS:
+        memory_diagnostics.start()
+    
+    # Motor de energia (Python por padrão, NumPy opcional)
+    init_energy_engine()
+    
+    # Snapshots periódicos do estado do jogo
+    state_snapshotter.start()
     
     # INICIAR THREAD DE DECAIMENTO INDEPENDENTE
     print("⏰ Iniciando sistema de decaimento de energia...")
     start_decay_thread()
     
+    # Conectar no Arduino sem bloquear a subida
+    threading.Thread(target=connect_serial_on_startup, name='serial-startup', daemon=True).start()
+    
     # Iniciar servidor HTTP
-    with socketserver.TCPServer(("", HTTP_PORT), BikeJJHTTPHandler) as httpd:
+    with httpd:
         print(f"✅ Servidor HTTP rodando em http://localhost:{HTTP_PORT}")
         print(f"📡 Servidor UDP ativo na porta {UDP_PORT}")
         print(f"🎮 Acesse o jogo em: http://localhost:{HTTP_PORT}")
         print(f"🔧 Configurador serial em: http://localhost:{HTTP_PORT}/serial_config.html")
         print("🛑 Pressione Ctrl+C para parar")
         
+        global server_ready, http_heartbeat
+        http_heartbeat = time.monotonic()
+        server_ready = True
         try:
             httpd.serve_forever()
         except KeyboardInterrupt:
             print("\n🛑 Parando servidor...")
             stop_decay_thread()  # Parar thread de decaimento
+            port_inventory.stop()
+            config_watcher.stop()
+            config_writer.stop()  # Gravar alterações pendentes
+            memory_diagnostics.stop()
+            sampling_profiler.stop()
             if arduino_reader and arduino_reader.running:
                 arduino_reader.stop()
+            serial_tap.stop()
+            state_snapshotter.stop()  # Gravar o estado final (depois de parar a serial)
             if udp_socket:
                 udp_socket.close()
 
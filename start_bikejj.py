@@ -4,23 +4,47 @@ BikeJJ - Script de Inicialização Automática
 Verifica conexão Arduino, inicia servidor e abre Chrome
 """
 
+import argparse
 import subprocess
+import shlex
+import socket
+import struct
 import time
 import json
 import os
 import sys
-import serial
-import serial.tools.list_ports
 import webbrowser
 import threading
+import urllib.request
+import urllib.error
 from pathlib import Path
 
 # Configurações
-CONFIG_FILE = 'serial_config.json'
 GAME_URL = 'http://localhost:9000'
 CONFIG_URL = 'http://localhost:9000/serial_config.html'
+HEALTH_URL = 'http://localhost:9000/healthz'
+SERIAL_STATUS_URL = 'http://localhost:9000/api/serial/status'
 CHROME_PATH = None
-SERIAL_BAUDRATE = 115200
+
+# Watchdog do servidor
+SERVER_READY_TIMEOUT = 30.0  # Tempo máximo para o servidor ficar pronto
+SERIAL_LINK_TIMEOUT = 20.0  # Espera pela conexão da serial feita pelo servidor (só para o relatório)
+HEALTH_POLL_INTERVAL = 0.1  # Consulta ao /healthz enquanto o servidor inicia
+HEALTH_REQUEST_TIMEOUT = 3.0  # Resposta lenta não é travamento (GC, disco, muitos clientes)
+WATCHDOG_INTERVAL = 1.0  # Consulta ao /healthz com o servidor rodando
+WATCHDOG_FAILURES = 3  # Falhas seguidas antes de reiniciar
+WATCHDOG_STOP_TIMEOUT = 2.0  # Espera após o terminate antes do kill
+
+# Apps externos (NDI/Resolume/Chrome só existem no Windows do evento)
+RESOLUME_SETTLE_TIME = 5.0  # Resolume abre a janela e carrega a composição antes do OSC
+USE_STAND_INS = False  # --stand-ins: processos de teste no lugar dos apps ausentes
+DEFAULT_STAND_INS = {
+    'ndi': [sys.executable, '-c', 'import time; time.sleep(86400)'],
+    'resolume': [sys.executable, '-c', 'import time; time.sleep(86400)'],
+    # Substituto do Chrome: baixa a página do jogo (prova que está no ar) e fica aberto
+    'chrome': [sys.executable, '-c', 'import sys, time, urllib.request; urllib.request.urlopen(sys.argv[1]).read(); time.sleep(86400)']
+}
+stand_in_processes = []
 
 def find_chrome():
     """Encontrar o executável do Chrome"""
@@ -53,205 +77,142 @@ def find_chrome():
     
     return None
 
-def get_available_ports():
-    """Obter portas COM disponíveis"""
-    ports = []
-    try:
-        for port in serial.tools.list_ports.comports():
-            if port.device.startswith('COM'):
-                ports.append({
-                    'device': port.device,
-                    'description': port.description,
-                    'manufacturer': getattr(port, 'manufacturer', 'N/A')
-                })
-    except Exception as e:
-        print(f"❌ Erro ao listar portas: {e}")
-    return ports
+def stand_in_command(name):
+    """Comando substituto para um app que não existe nesta máquina (ex.: Linux)
 
-def test_arduino_connection(port, timeout=5):
-    """Testar conexão com Arduino"""
-    try:
-        print(f"🔌 Testando conexão com {port}...")
-        ser = serial.Serial(port, SERIAL_BAUDRATE, timeout=timeout)
-        time.sleep(3)  # Aguardar inicialização mais tempo
-        
-        # Tentar ler dados do Arduino
-        data_received = False
-        start_time = time.time()
-        attempts = 0
-        
-        while time.time() - start_time < timeout and attempts < 10:
-            if ser.in_waiting > 0:
-                line = ser.readline().decode('utf-8', errors='ignore').strip()
-                if line and ('🔍' in line or '📊' in line or '📈' in line or 'J1:' in line or 'J2:' in line or 'J3:' in line or 'J4:' in line):
-                    data_received = True
-                    print(f"✅ Arduino respondendo: {line[:50]}...")
-                    break
-            time.sleep(0.2)
-            attempts += 1
-        
-        ser.close()
-        return data_received
-    except Exception as e:
-        print(f"❌ Erro ao testar {port}: {e}")
-        return False
+    BIKEJJ_STANDIN_<NOME> define o comando; com --stand-ins usa-se um processo
+    Python parado no lugar do app.
+    """
+    command = os.environ.get(f'BIKEJJ_STANDIN_{name.upper()}')
+    if command:
+        return shlex.split(command)
+    if USE_STAND_INS:
+        return list(DEFAULT_STAND_INS[name])
+    return None
 
-def find_arduino_port():
-    """Encontrar porta do Arduino automaticamente"""
-    print("🔍 Procurando Arduino...")
-    ports = get_available_ports()
-    
-    if not ports:
-        print("❌ Nenhuma porta COM encontrada")
-        return None
-    
-    print(f"📡 {len(ports)} porta(s) encontrada(s):")
-    for port in ports:
-        print(f"   {port['device']} - {port['description']}")
-    
-    # Testar cada porta
-    for port in ports:
-        if test_arduino_connection(port['device']):
-            print(f"✅ Arduino encontrado em {port['device']}")
-            return port['device']
-    
-    print("❌ Arduino não encontrado em nenhuma porta")
+def launch_app(name, path, label, extra_args=()):
+    """Abrir um app externo (ou seu substituto); retorna o processo ou None"""
+    if os.path.exists(path):
+        print(f"{label} Abrindo {name}...")
+        return subprocess.Popen([path, *extra_args], shell=False)
+    
+    command = stand_in_command(name)
+    if command:
+        print(f"🎭 {name} substituído por: {' '.join(command)}")
+        process = subprocess.Popen([*command, *extra_args], shell=False)
+        stand_in_processes.append(process)
+        return process
+    
+    print(f"❌ {name} não encontrado em:", path)
     return None
 
-def save_serial_config(port):
-    """Salvar configuração da porta serial"""
+def open_ndi_screen_capture():
+    """Abrir NDI Screen Capture"""
+    ndi_path = r"C:\Program Files\NDI\NDI 6 Tools\Screen Capture\Application.Network.ScanConverter2.x64.exe"
     try:
-        config = {'serial_port': port}
-        with open(CONFIG_FILE, 'w') as f:
-            json.dump(config, f)
-        print(f"💾 Configuração salva: {port}")
-        return True
+        process = launch_app('ndi', ndi_path, "📡")
+        if process:
+            print("✅ NDI Screen Capture iniciado!")
+        return process
     except Exception as e:
-        print(f"❌ Erro ao salvar configuração: {e}")
-        return False
+        print(f"❌ Erro ao abrir NDI Screen Capture: {e}")
+        return None
 
-def load_serial_config():
-    """Carregar configuração da porta serial"""
+def open_resolume_arena():
+    """Abrir Resolume Arena"""
+    resolume_path = r"C:\Program Files\Resolume Arena\Arena.exe"
     try:
-        if os.path.exists(CONFIG_FILE):
-            with open(CONFIG_FILE, 'r') as f:
-                config = json.load(f)
-                return config.get('serial_port')
+        return launch_app('resolume', resolume_path, "🎬")
     except Exception as e:
-        print(f"❌ Erro ao carregar configuração: {e}")
-    return None
+        print(f"❌ Erro ao abrir Resolume Arena: {e}")
+        return None
 
-def open_ndi_screen_capture():
-    """Abrir NDI Screen Capture"""
-    ndi_path = r"C:\Program Files\NDI\NDI 6 Tools\Screen Capture\Application.Network.ScanConverter2.x64.exe"
+def position_resolume_window():
+    """Posicionar a janela do Resolume Arena no lado esquerdo (Windows)"""
+    if os.name != 'nt':
+        print("⏭️ Posicionamento de janela do Resolume só existe no Windows")
+        return True
     
-    if not os.path.exists(ndi_path):
-        print("❌ NDI Screen Capture não encontrado em:", ndi_path)
-        return False
+    # Usar PowerShell para posicionar a janela no lado esquerdo
+    ps_script = '''
+    Add-Type -TypeDefinition @"
+    using System;
+    using System.Runtime.InteropServices;
+    public class Win32 {
+        [DllImport("user32.dll")]
+        public static extern bool SetWindowPos(IntPtr hWnd, IntPtr hWndInsertAfter, int X, int Y, int cx, int cy, uint uFlags);
+        [DllImport("user32.dll")]
+        public static extern IntPtr FindWindow(string lpClassName, string lpWindowName);
+        [DllImport("user32.dll")]
+        public static extern bool SetForegroundWindow(IntPtr hWnd);
+        [DllImport("user32.dll")]
+        public static extern bool ShowWindow(IntPtr hWnd, int nCmdShow);
+    }
+"@
+    $arena = [Win32]::FindWindow($null, "Arena")
+    if ($arena -ne [IntPtr]::Zero) {
+        [Win32]::SetWindowPos($arena, [IntPtr]::Zero, 0, 0, 960, 1080, 0x0040)
+        [Win32]::SetForegroundWindow($arena)
+        [Win32]::ShowWindow($arena, 9)
+    }
+    '''
     
     try:
-        print("📡 Abrindo NDI Screen Capture...")
-        # Usar subprocess para abrir NDI Screen Capture
-        subprocess.Popen([ndi_path], shell=False)
-        
-        # Aguardar um pouco para o NDI inicializar
-        time.sleep(3)
-        print("✅ NDI Screen Capture iniciado!")
+        subprocess.run(['powershell', '-Command', ps_script], shell=True)
+        print("✅ Resolume Arena posicionado no lado esquerdo!")
         return True
-        
     except Exception as e:
-        print(f"❌ Erro ao abrir NDI Screen Capture: {e}")
+        print(f"❌ Erro ao posicionar Resolume Arena: {e}")
         return False
 
-def open_resolume_arena():
-    """Abrir Resolume Arena no lado esquerdo"""
-    resolume_path = r"C:\Program Files\Resolume Arena\Arena.exe"
+def send_resolume_play():
+    """Enviar OSC para o Resolume dar play na primeira coluna"""
+    # Comando OSC correto para Resolume: /composition/layers/1/clips/1/connect com valor 1
+    osc_address = "/composition/layers/1/clips/1/connect"
+    osc_value = 1  # 1 = conectar/play, 0 = desconectar/stop
     
-    if not os.path.exists(resolume_path):
-        print("❌ Resolume Arena não encontrado em:", resolume_path)
-        return False
+    # Construir mensagem OSC
+    # Endereço + padding para múltiplo de 4
+    address_padded = (osc_address + '\x00' * (4 - (len(osc_address) % 4))).encode('utf-8')
+    
+    # Tipo de dados: ,i (integer)
+    type_tag = ",i"
+    type_tag_padded = (type_tag + '\x00' * (4 - (len(type_tag) % 4))).encode('utf-8')
+    
+    # Valor inteiro (4 bytes)
+    value_bytes = struct.pack('>i', osc_value)
+    
+    # Montar mensagem completa
+    osc_message = address_padded + type_tag_padded + value_bytes
     
     try:
-        print("🎬 Abrindo Resolume Arena no lado esquerdo...")
-        # Usar subprocess para abrir Resolume Arena
-        subprocess.Popen([resolume_path], shell=False)
+        # Criar socket UDP
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.sendto(osc_message, ('127.0.0.1', 7000))
         
-        # Aguardar um pouco para o Resolume inicializar
+        # Aguardar um pouco e enviar comando de play novamente para garantir
         time.sleep(2)
+        sock.sendto(osc_message, ('127.0.0.1', 7000))
+        sock.close()
         
-        # Usar PowerShell para posicionar a janela no lado esquerdo
-        ps_script = '''
-        Add-Type -TypeDefinition @"
-        using System;
-        using System.Runtime.InteropServices;
-        public class Win32 {
-            [DllImport("user32.dll")]
-            public static extern bool SetWindowPos(IntPtr hWnd, IntPtr hWndInsertAfter, int X, int Y, int cx, int cy, uint uFlags);
-            [DllImport("user32.dll")]
-            public static extern IntPtr FindWindow(string lpClassName, string lpWindowName);
-            [DllImport("user32.dll")]
-            public static extern bool SetForegroundWindow(IntPtr hWnd);
-            [DllImport("user32.dll")]
-            public static extern bool ShowWindow(IntPtr hWnd, int nCmdShow);
-        }
-"@
-        $arena = [Win32]::FindWindow($null, "Arena")
-        if ($arena -ne [IntPtr]::Zero) {
-            [Win32]::SetWindowPos($arena, [IntPtr]::Zero, 0, 0, 960, 1080, 0x0040)
-            [Win32]::SetForegroundWindow($arena)
-            [Win32]::ShowWindow($arena, 9)
-        }
-        '''
-        
-        subprocess.run(['powershell', '-Command', ps_script], shell=True)
-        print("✅ Resolume Arena posicionado no lado esquerdo!")
-        
-        # Aguardar um pouco para o Resolume estabilizar
-        time.sleep(3)
-        
-        # Enviar mensagem OSC para ativar primeira coluna
-        try:
-            import socket
-            import struct
-            
-            # Comando OSC correto para Resolume: /composition/layers/1/clips/1/connect com valor 1
-            osc_address = "/composition/layers/1/clips/1/connect"
-            osc_value = 1  # 1 = conectar/play, 0 = desconectar/stop
-            
-            # Construir mensagem OSC
-            # Endereço + padding para múltiplo de 4
-            address_padded = (osc_address + '\x00' * (4 - (len(osc_address) % 4))).encode('utf-8')
-            
-            # Tipo de dados: ,i (integer)
-            type_tag = ",i"
-            type_tag_padded = (type_tag + '\x00' * (4 - (len(type_tag) % 4))).encode('utf-8')
-            
-            # Valor inteiro (4 bytes)
-            value_bytes = struct.pack('>i', osc_value)
-            
-            # Montar mensagem completa
-            osc_message = address_padded + type_tag_padded + value_bytes
-            
-            # Criar socket UDP
-            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            sock.sendto(osc_message, ('127.0.0.1', 7000))
-            sock.close()
-            
-            print("✅ Mensagem OSC enviada: /composition/layers/1/clips/1/connect = 1 na porta 7000")
-        except Exception as e:
-            print(f"⚠️ Erro ao enviar mensagem OSC: {e}")
+        print("✅ Comando OSC enviado: /composition/layers/1/clips/1/connect = 1 na porta 7000")
         return True
-        
     except Exception as e:
-        print(f"❌ Erro ao abrir Resolume Arena: {e}")
+        print(f"⚠️ Erro ao enviar comando OSC: {e}")
         return False
 
 def open_chrome_with_layout():
-    """Abrir Chrome com layout específico (lado direito, zoom 50%)"""
+    """Abrir Chrome com layout específico (lado direito, zoom 75%); retorna o processo"""
     if not CHROME_PATH:
+        command = stand_in_command('chrome')
+        if command:
+            print(f"🎭 Chrome substituído por: {' '.join(command)}")
+            process = subprocess.Popen([*command, GAME_URL], shell=False)
+            stand_in_processes.append(process)
+            return process
         print("❌ Chrome não encontrado, abrindo navegador padrão...")
         webbrowser.open(GAME_URL)
-        return
+        return None
     
     try:
         # Comando para abrir Chrome no lado direito com zoom 75%
@@ -267,49 +228,270 @@ def open_chrome_with_layout():
         ]
         
         print("🌐 Abrindo Chrome no lado direito...")
-        subprocess.Popen(cmd, shell=False)
+        process = subprocess.Popen(cmd, shell=False)
         print("✅ Chrome aberto com sucesso!")
+        return process
         
     except Exception as e:
         print(f"❌ Erro ao abrir Chrome: {e}")
         print("🔄 Tentando abrir navegador padrão...")
         webbrowser.open(GAME_URL)
+        return None
+
+def check_server_health(timeout=HEALTH_REQUEST_TIMEOUT):
+    """Consultar /healthz; retorna o dicionário de saúde ou None se o servidor não respondeu"""
+    try:
+        with urllib.request.urlopen(HEALTH_URL, timeout=timeout) as response:
+            return json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        # 503 também traz o relatório (iniciando ou thread travada)
+        try:
+            return json.loads(e.read())
+        except ValueError:
+            return None
+    except (OSError, ValueError):
+        return None
+
+def is_own_server_ready(process, health):
+    """/healthz pronto e respondido pelo processo que abrimos (não por um servidor antigo na porta)"""
+    return bool(health and health.get('ready') and health.get('pid') == process.pid)
+
+def wait_for_server_ready(process, timeout=SERVER_READY_TIMEOUT):
+    """Aguardar o /healthz responder pronto (em vez de um sleep fixo)"""
+    start_time = time.time()
+    while time.time() - start_time < timeout:
+        if process.poll() is not None:
+            print(f"❌ Servidor terminou durante a inicialização (código {process.returncode})")
+            return False
+        health = check_server_health()
+        if is_own_server_ready(process, health):
+            print(f"✅ Servidor pronto em {time.time() - start_time:.1f}s (status: {health['status']})")
+            return True
+        time.sleep(HEALTH_POLL_INTERVAL)
+    print(f"❌ Servidor não ficou pronto em {timeout:.0f}s")
+    return False
+
+def stop_process(process, timeout=2):
+    """Encerrar um processo filho (terminate e, se não sair, kill; timeout=0 mata direto)"""
+    if process.poll() is not None:
+        return
+    if timeout:
+        process.terminate()
+    try:
+        process.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+def launch_server():
+    """Abrir o processo do servidor BikeJJ (sem esperar ficar pronto)"""
+    print("🚀 Iniciando servidor BikeJJ...")
+    # Usar subprocess para manter o servidor rodando em background
+    env = os.environ.copy()
+    env['PYTHONIOENCODING'] = 'utf-8'
+    
+    # Executar em background sem capturar stdout/stderr
+    return subprocess.Popen([sys.executable, 'server.py'], 
+                            env=env,
+                            creationflags=subprocess.CREATE_NEW_CONSOLE if os.name == 'nt' else 0)
 
 def start_server():
-    """Iniciar servidor BikeJJ"""
+    """Iniciar servidor BikeJJ e aguardar o /healthz ficar pronto"""
     try:
-        print("🚀 Iniciando servidor BikeJJ...")
-        # Usar subprocess para manter o servidor rodando em background
-        env = os.environ.copy()
-        env['PYTHONIOENCODING'] = 'utf-8'
-        
-        # Executar em background sem capturar stdout/stderr
-        process = subprocess.Popen([sys.executable, 'server.py'], 
-                                 env=env,
-                                 creationflags=subprocess.CREATE_NEW_CONSOLE if os.name == 'nt' else 0)
+        process = launch_server()
         
-        # Aguardar um pouco para o servidor inicializar
-        time.sleep(2)
-        
-        # Verificar se o processo ainda está rodando
-        if process.poll() is None:
+        if wait_for_server_ready(process):
             print("✅ Servidor iniciado com sucesso!")
             return process
         else:
             print("❌ Servidor falhou ao iniciar")
+            stop_process(process)
             return None
             
     except Exception as e:
         print(f"❌ Erro ao iniciar servidor: {e}")
         return None
 
+def describe_health_failure(health):
+    if health is None:
+        return f"sem resposta do /healthz em {HEALTH_REQUEST_TIMEOUT:.0f}s"
+    failing = [f"{name} (heartbeat há {check.get('age')}s)"
+               for name, check in health.get('checks', {}).items() if not check.get('ok')]
+    return f"verificações falhando: {', '.join(failing) or health.get('status')}"
+
+def watch_server(process):
+    """Watchdog: consultar o /healthz e reiniciar o servidor se ele cair ou travar"""
+    print(f"🐕 Watchdog ativo ({HEALTH_URL} a cada {WATCHDOG_INTERVAL * 1000:.0f}ms)")
+    failures = 0
+    restarts = 0
+    while True:
+        time.sleep(WATCHDOG_INTERVAL)
+        if process is not None:
+            if process.poll() is not None:
+                reason = f"processo terminou (código {process.returncode})"
+            else:
+                # Quem decide é a idade dos heartbeats (live), não a latência da resposta
+                health = check_server_health()
+                if health and health.get('live'):
+                    failures = 0
+                    continue
+                failures += 1
+                if failures < WATCHDOG_FAILURES:
+                    continue
+                reason = describe_health_failure(health)
+                stop_process(process, timeout=WATCHDOG_STOP_TIMEOUT)
+            print(f"🚨 Servidor com problema: {reason} - reiniciando...")
+        
+        failures = 0
+        process = start_server()
+        if process is None:
+            time.sleep(1)  # Tentar de novo no próximo ciclo
+            continue
+        restarts += 1
+        print(f"♻️ Servidor reiniciado (reinício #{restarts})")
+
+# Inicialização em grafo de dependências (passos independentes em paralelo)
+READY_POLL_INTERVAL = 0.05  # Intervalo entre testes de prontidão
+SHOW_STEP = 'chrome'  # Passo que coloca o jogo na tela
+
+def probe_port_open(host, port, timeout=0.2):
+    """Prontidão: porta TCP aceitando conexões"""
+    try:
+        with socket.create_connection((host, port), timeout=timeout):
+            return True
+    except OSError:
+        return False
+
+def probe_process_alive(process):
+    """Prontidão: processo iniciado e ainda rodando"""
+    return process is not None and process.poll() is None
+
+class LaunchStep:
+    """Passo da inicialização: ação, dependências e teste de prontidão
+
+    A ação retorna o resultado do passo (processo, porta...) ou False em caso
+    de falha; o teste de prontidão recebe esse resultado e é repetido até
+    passar ou estourar o timeout.
+    """
+
+    def __init__(self, name, action, deps=(), probe=None, timeout=30.0, settle=0.0):
+        self.name = name
+        self.action = action
+        self.deps = tuple(deps)
+        self.probe = probe
+        self.timeout = timeout
+        self.settle = settle  # Espera mínima após a ação (apps sem teste melhor que "processo vivo")
+        self.status = 'pending'
+        self.result = None
+        self.error = None
+        self.started = None
+        self.finished = None
+        self.done = threading.Event()
+
+def run_step(step, steps, t0):
+    for dep in step.deps:
+        steps[dep].done.wait()
+    failed = [dep for dep in step.deps if steps[dep].status != 'ready']
+    if failed:
+        step.status = 'skipped'
+        step.error = f"dependência falhou: {', '.join(failed)}"
+        step.done.set()
+        return
+    
+    step.started = time.monotonic() - t0
+    try:
+        step.result = step.action()
+        if step.result is False:
+            raise RuntimeError("ação falhou")
+        if step.settle:
+            time.sleep(step.settle)
+        if step.probe:
+            deadline = time.monotonic() + step.timeout
+            while not step.probe(step.result):
+                if time.monotonic() >= deadline:
+                    raise RuntimeError(f"não ficou pronto em {step.timeout:.0f}s")
+                time.sleep(READY_POLL_INTERVAL)
+        step.status = 'ready'
+    except Exception as e:
+        step.status = 'failed'
+        step.error = str(e)
+    finally:
+        step.finished = time.monotonic() - t0
+        step.done.set()
+
+def run_launch_graph(step_list):
+    """Executar os passos respeitando as dependências; retorna {nome: passo}"""
+    steps = {step.name: step for step in step_list}
+    for step in step_list:
+        missing = [dep for dep in step.deps if dep not in steps]
+        if missing:
+            raise ValueError(f"Passo {step.name} depende de passos inexistentes: {', '.join(missing)}")
+    
+    t0 = time.monotonic()
+    threads = [threading.Thread(target=run_step, args=(step, steps, t0), name=f'launch-{step.name}', daemon=True)
+               for step in step_list]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return steps
+
+def critical_path(steps, name):
+    """Cadeia de dependências que determinou quando o passo terminou"""
+    path = [name]
+    step = steps[name]
+    while step.deps:
+        step = max((steps[dep] for dep in step.deps), key=lambda dep: dep.finished or 0)
+        path.append(step.name)
+    return list(reversed(path))
+
+def print_launch_timeline(steps):
+    """Tempo de cada passo e o caminho crítico até o jogo aparecer na tela"""
+    icons = {'ready': '✅', 'failed': '❌', 'skipped': '⏭️', 'pending': '⏳'}
+    print("\n⏱️ Linha do tempo da inicialização:")
+    for step in sorted(steps.values(), key=lambda s: (s.started is None, s.started or 0)):
+        if step.started is None:
+            print(f"   {icons[step.status]} {step.name:<16} {'-':>15}           {step.error or ''}")
+            continue
+        duration = step.finished - step.started
+        print(f"   {icons[step.status]} {step.name:<16} {step.started:6.2f}s → {step.finished:6.2f}s "
+              f"({duration:5.2f}s) {step.error or ''}")
+    show = steps.get(SHOW_STEP)
+    if show and show.status == 'ready':
+        sequential = sum(s.finished - s.started for s in steps.values() if s.started is not None)
+        print(f"🏁 Jogo na tela em {show.finished:.2f}s (em sequência seriam {sequential:.2f}s)")
+        print(f"   Caminho crítico: {' → '.join(critical_path(steps, SHOW_STEP))}")
+
+def stop_stand_ins():
+    for process in stand_in_processes:
+        stop_process(process)
+
+def build_launch_steps():
+    """Grafo da inicialização do evento"""
+    return [
+        LaunchStep('requirements', check_system_requirements),
+        LaunchStep('chrome_lookup', find_chrome, deps=['requirements']),
+        LaunchStep('server', launch_server, deps=['requirements'], timeout=SERVER_READY_TIMEOUT,
+                   probe=lambda process: probe_process_alive(process)
+                   and is_own_server_ready(process, check_server_health())),
+        LaunchStep('ndi', lambda: open_ndi_screen_capture() or False, deps=['requirements'],
+                   probe=probe_process_alive),
+        LaunchStep('resolume', lambda: open_resolume_arena() or False, deps=['requirements'],
+                   probe=probe_process_alive, settle=RESOLUME_SETTLE_TIME),
+        LaunchStep('resolume_layout', position_resolume_window, deps=['resolume']),
+        LaunchStep(SHOW_STEP, open_chrome_with_layout, deps=['server', 'chrome_lookup'],
+                   probe=lambda process: process is None or probe_process_alive(process)),
+        LaunchStep('resolume_play', send_resolume_play, deps=['resolume_layout', SHOW_STEP]),
+        # Só informativo: o servidor conecta a serial em background, fora do caminho crítico
+        LaunchStep('serial', wait_for_serial_link, deps=['server']),
+    ]
+
 def check_system_requirements():
     """Verificar requisitos do sistema"""
     print("🔍 Verificando requisitos do sistema...")
     
     # 1. Verificar Python
     try:
-        import sys
         python_version = sys.version_info
         if python_version.major >= 3 and python_version.minor >= 8:
             print(f"✅ Python {python_version.major}.{python_version.minor}.{python_version.micro} - OK")
@@ -330,196 +512,73 @@ def check_system_requirements():
             return False
     
     # 3. Verificar portas disponíveis
-    try:
-        import socket
-        # Testar porta 9000
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        result = sock.connect_ex(('localhost', 9000))
-        sock.close()
-        if result == 0:
-            print("⚠️ Porta 9000 já está em uso - será necessário parar o processo")
-        else:
-            print("✅ Porta 9000 - Disponível")
-    except Exception as e:
-        print(f"❌ Erro ao verificar porta 9000: {e}")
-        return False
-    
-    # 4. Verificar Arduino
-    print("🔍 Verificando Arduino...")
-    arduino_found = False
-    ports = get_available_ports()
-    
-    if ports:
-        print(f"📡 {len(ports)} porta(s) encontrada(s):")
-        for port in ports:
-            print(f"   {port['device']} - {port['description']}")
-        
-        # Testar primeiro a porta configurada se existir
-        configured_port = load_serial_config()
-        if configured_port:
-            print(f"🔌 Testando primeiro a porta configurada: {configured_port}")
-            if test_arduino_connection(configured_port):
-                print(f"✅ Arduino funcionando em {configured_port}")
-                arduino_found = True
-            else:
-                print(f"❌ Arduino não responde em {configured_port}")
-                # Se não funcionar, testar outras portas
-                for port in ports:
-                    if port['device'] != configured_port:
-                        if test_arduino_connection(port['device']):
-                            print(f"✅ Arduino funcionando em {port['device']}")
-                            arduino_found = True
-                            break
-        else:
-            # Se não há porta configurada, testar todas
-            for port in ports:
-                if test_arduino_connection(port['device']):
-                    print(f"✅ Arduino funcionando em {port['device']}")
-                    arduino_found = True
-                    break
+    if probe_port_open('localhost', 9000):
+        print("⚠️ Porta 9000 já está em uso - será necessário parar o processo")
     else:
-        print("❌ Nenhuma porta COM encontrada")
-    
-    if not arduino_found:
-        print("⚠️ Arduino não encontrado - sistema funcionará sem sensores")
+        print("✅ Porta 9000 - Disponível")
     
     return True
 
+def wait_for_serial_link(timeout=SERIAL_LINK_TIMEOUT):
+    """Acompanhar a conexão que o próprio servidor faz (porta configurada ou autodetecção)
+
+    O launcher não abre a porta: testar em paralelo com o servidor disputaria o
+    dispositivo. Retorna a porta conectada ou None (jogo segue com o teclado).
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(SERIAL_STATUS_URL, timeout=HEALTH_REQUEST_TIMEOUT) as response:
+                status = json.loads(response.read())
+            if status.get('connected'):
+                return status.get('current_port')
+        except (OSError, ValueError):
+            pass
+        time.sleep(0.5)
+    return None
+
 def main():
     """Função principal"""
+    global USE_STAND_INS
+    parser = argparse.ArgumentParser(description="Inicialização automática do BikeJJ")
+    parser.add_argument('--stand-ins', action='store_true',
+                        help="substituir NDI, Resolume e Chrome ausentes por processos de teste")
+    args = parser.parse_args()
+    USE_STAND_INS = args.stand_ins
+    
     print("=" * 60)
     print("🚴 BikeJJ - Sistema de Inicialização Automática")
     print("=" * 60)
     
-    # 1. Verificar requisitos do sistema
-    if not check_system_requirements():
-        print("❌ Verificação de requisitos falhou!")
-        input("Pressione Enter para sair...")
-        return
-    
-    print("\n✅ Todos os requisitos verificados!")
-    print("🚀 Iniciando sistema...")
-    
-    # 2. Verificar se estamos no diretório correto
+    # Verificar se estamos no diretório correto
     if not os.path.exists('server.py'):
         print("❌ Arquivo server.py não encontrado!")
         print("💡 Execute este script no diretório do projeto BikeJJ")
         input("Pressione Enter para sair...")
         return
     
-    # 2. Encontrar Chrome
-    print("🔍 Procurando Google Chrome...")
-    chrome_path = find_chrome()
-    if chrome_path:
-        print(f"✅ Chrome encontrado: {chrome_path}")
-    else:
-        print("⚠️ Chrome não encontrado, será usado navegador padrão")
-    
-    # 3. Verificar configuração da porta serial
-    print("\n📡 Verificando configuração da porta serial...")
-    configured_port = load_serial_config()
-    
-    if configured_port:
-        print(f"📁 Porta configurada: {configured_port}")
-        if test_arduino_connection(configured_port):
-            print("✅ Arduino conectado e funcionando!")
-        else:
-            print("❌ Arduino não responde na porta configurada")
-            configured_port = None
-    
-    # 4. Se não há porta configurada ou não funciona, procurar automaticamente
-    if not configured_port:
-        print("\n🔍 Procurando Arduino automaticamente...")
-        arduino_port = find_arduino_port()
-        
-        if arduino_port:
-            if save_serial_config(arduino_port):
-                configured_port = arduino_port
-            else:
-                print("❌ Erro ao salvar configuração da porta")
-        else:
-            print("❌ Arduino não encontrado!")
-            print("🔧 Abrindo configurador serial...")
-            time.sleep(2)
-    
-    # 5. Iniciar servidor
-    print("\n🚀 Iniciando servidor...")
-    server_process = start_server()
+    # Requisitos, Arduino, servidor, NDI, Resolume e Chrome em paralelo onde possível
+    print("🚀 Iniciando sistema...")
+    steps = run_launch_graph(build_launch_steps())
+    print_launch_timeline(steps)
     
-    if not server_process:
-        print("❌ Falha ao iniciar servidor!")
+    if steps['requirements'].status != 'ready':
+        print("❌ Verificação de requisitos falhou!")
+        stop_stand_ins()
         input("Pressione Enter para sair...")
         return
     
-    # 5.1. Aguardar servidor conectar com Arduino
-    if configured_port:
-        print(f"⏳ Aguardando servidor conectar com Arduino em {configured_port}...")
-        time.sleep(5)  # Aguardar mais tempo para conectar
-    
-    # 6. Aguardar servidor ficar pronto
-    print("⏳ Aguardando servidor ficar pronto...")
-    time.sleep(3)
-    
-    # 7. Abrir NDI Screen Capture
-    print("\n📡 Abrindo NDI Screen Capture...")
-    open_ndi_screen_capture()
-    
-    # 8. Abrir Resolume Arena (lado esquerdo)
-    print("\n🎬 Abrindo Resolume Arena...")
-    open_resolume_arena()
-    
-    # 9. Abrir Chrome (lado direito)
-    print("\n🌐 Abrindo interface do jogo...")
-    open_chrome_with_layout()
-    
-    # 10. Aguardar estabilização e dar play na primeira coluna do Resolume
-    print("\n⏳ Aguardando estabilização do sistema...")
-    time.sleep(5)  # Aguardar 5 segundos para tudo estabilizar
-    
-    print("🎬 Ativando primeira coluna do Resolume Arena...")
-    try:
-        import socket
-        import struct
-        
-        # Comando OSC correto para Resolume: /composition/layers/1/clips/1/connect com valor 1
-        osc_address = "/composition/layers/1/clips/1/connect"
-        osc_value = 1  # 1 = conectar/play, 0 = desconectar/stop
-        
-        # Construir mensagem OSC
-        # Endereço + padding para múltiplo de 4
-        address_padded = (osc_address + '\x00' * (4 - (len(osc_address) % 4))).encode('utf-8')
-        
-        # Tipo de dados: ,i (integer)
-        type_tag = ",i"
-        type_tag_padded = (type_tag + '\x00' * (4 - (len(type_tag) % 4))).encode('utf-8')
-        
-        # Valor inteiro (4 bytes)
-        value_bytes = struct.pack('>i', osc_value)
-        
-        # Montar mensagem completa
-        osc_message = address_padded + type_tag_padded + value_bytes
-        
-        # Criar socket UDP
-        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        sock.sendto(osc_message, ('127.0.0.1', 7000))
-        sock.close()
-        
-        print("✅ Comando OSC enviado: /composition/layers/1/clips/1/connect = 1")
-        
-        # Aguardar um pouco e enviar comando de play novamente
-        time.sleep(2)
-        
-        # Enviar comando de play novamente para garantir
-        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        sock.sendto(osc_message, ('127.0.0.1', 7000))
-        sock.close()
-        
-        print("✅ Comando de play enviado para primeira coluna!")
-        
-    except Exception as e:
-        print(f"⚠️ Erro ao enviar comando OSC: {e}")
+    server_step = steps['server']
+    if server_step.status != 'ready':
+        print(f"❌ Falha ao iniciar servidor! ({server_step.error})")
+        if server_step.result:
+            stop_process(server_step.result)
+        stop_stand_ins()
+        input("Pressione Enter para sair...")
+        return
     
-    # 11. Verificar status final da conexão
+    # Verificar status final da conexão (feita pelo servidor)
+    configured_port = steps['serial'].result
     if configured_port:
         print(f"\n✅ Arduino configurado na porta: {configured_port}")
         print("🎯 Sistema pronto para receber mensagens do Arduino!")
@@ -535,10 +594,14 @@ def main():
     print("\n✅ Sistema inicializado com sucesso!")
     print("💡 O servidor está rodando em background")
     print("=" * 60)
-    
-    # Aguardar um pouco para garantir que tudo foi iniciado
-    time.sleep(2)
     print("🎯 Pronto para o evento!")
+    
+    # Manter o servidor no ar (reinicia automaticamente se cair ou travar)
+    try:
+        watch_server(server_step.result)
+    except KeyboardInterrupt:
+        stop_stand_ins()
+        print("\n🛑 Watchdog parado - o servidor continua rodando")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,37 @@
+"""Fixtures compartilhadas: o server.py é importado como módulo (main() não roda)"""
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import server  # noqa: E402
+
+
+@pytest.fixture
+def game(tmp_path, monkeypatch):
+    """Jogo zerado e ativo, sem decaimento, com histórico/ranking/snapshot num diretório temporário"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(server, 'udp_socket', None)
+    monkeypatch.setattr(server, 'energy_engine', None)
+    monkeypatch.setattr(server, 'game_config', dict(server.game_config, energy_gain_rate=1.0,
+                                                    energy_decay_rate=0.0, partial_energy=False))
+    monkeypatch.setattr(server, 'leaderboard', server.Leaderboard())
+    server.reset_players()
+    server.game_state.update(game_active=True, game_frozen=False, winner_player=0)
+    yield server.game_state
+    server.energy_engine = None
+    server.reset_players()
+    server.game_state.update(game_active=False, game_frozen=False, winner_player=0)
+
+
+@pytest.fixture
+def http_server(game):
+    """BikeJJHTTPServer de verdade numa porta livre; retorna a porta"""
+    httpd = server.BikeJJHTTPServer(('127.0.0.1', 0), server.BikeJJHTTPHandler)
+    thread = threading.Thread(target=httpd.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True)
+    thread.start()
+    yield httpd.server_address[1]
+    httpd.shutdown()
+    httpd.server_close()
@@ -0,0 +1,66 @@
+"""Pedaladas de várias threads (uma por conexão HTTP) contra o mesmo game_state"""
+import sys
+import threading
+
+import server
+
+
+def test_concurrent_batches_declare_one_winner(game, monkeypatch):
+    winners = []
+    monkeypatch.setattr(server, 'send_udp_message',
+                        lambda message_type, player_id=0: winners.append(player_id) if message_type == 'winner' else None)
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)  # Trocar de thread o tempo todo para expor a corrida
+    try:
+        for round_ in range(20):
+            server.reset_players()
+            game.update(game_active=True, game_frozen=False, winner_player=0)
+            for i in range(4):
+                game[f'player{i + 1}_energy'] = 95
+            barrier = threading.Barrier(8)
+
+            def post(player_id):
+                barrier.wait()
+                for _ in range(10):
+                    server.apply_pedal_batch([{'player': player_id, 'count': 1}])
+
+            threads = [threading.Thread(target=post, args=(i % 4 + 1,)) for i in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            assert game['game_frozen']
+            assert len(winners) == round_ + 1
+            assert winners[-1] == game['winner_player']
+            winner_energy = game[f"player{game['winner_player']}_energy"]
+            assert winner_energy == 100
+            assert all(game[f'player{i + 1}_energy'] < 100 for i in range(4) if i + 1 != game['winner_player'])
+    finally:
+        sys.setswitchinterval(switch_interval)
+
+    with open(server.GAME_HISTORY_FILE, encoding='utf-8') as f:
+        assert sum(1 for _ in f) == 20
+
+
+def test_reset_waits_for_a_batch_in_progress(game):
+    started = threading.Event()
+    original = server.register_pedal
+
+    def slow_register(*args, **kwargs):
+        started.set()
+        return original(*args, **kwargs)
+
+    server.register_pedal = slow_register
+    try:
+        worker = threading.Thread(target=server.apply_pedal_batch, args=([{'player': 1, 'count': 50}],))
+        worker.start()
+        started.wait(1)
+        server.reset_players()
+        worker.join()
+    finally:
+        server.register_pedal = original
+
+    # O reset entrou antes ou depois do lote inteiro, nunca no meio
+    assert game['pedal_count'][0] in (0, 50)
+    assert game['player1_energy'] == game['pedal_count'][0] * 1.0
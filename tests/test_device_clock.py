@@ -0,0 +1,102 @@
+"""Relógio da placa: sufixo @millis, volta do millis(), reinício da placa e deriva"""
+import random
+
+import pytest
+
+import server
+
+
+def feed(clock, samples):
+    """(millis, chegada) -> instantes alinhados"""
+    return [clock.align(millis, arrival) for millis, arrival in samples]
+
+
+def steady_samples(start_millis, seconds, offset, drift=0.0, step=0.1, seed=0):
+    """Linhas a cada step segundos com atraso de 2 a 22ms; retorna (millis, chegada, evento real)"""
+    rng = random.Random(seed)
+    samples = []
+    for i in range(int(seconds / step)):
+        device = i * step
+        event = offset + device * (1 + drift)
+        millis = (start_millis + round(device * 1000)) % server.DEVICE_MILLIS_WRAP
+        samples.append((millis, event + 0.002 + rng.random() * 0.02, event))
+    return samples
+
+
+@pytest.mark.parametrize('line, expected', [
+    ("🔍 J1:5 @123456", ("🔍 J1:5", 123456)),
+    ("📈 J2: 9 pedaladas total @0", ("📈 J2: 9 pedaladas total", 0)),
+    ("🔍 J1:5", ("🔍 J1:5", None)),
+    ("e-mail a@b", ("e-mail a@b", None)),
+    ("valor @12a", ("valor @12a", None))
+])
+def test_split_device_timestamp(line, expected):
+    assert server.split_device_timestamp(line) == expected
+
+
+def test_aligned_time_follows_the_board_with_minimum_delay():
+    clock = server.DeviceClock()
+    samples = steady_samples(5000, 20.0, offset=100.0)
+
+    aligned = feed(clock, [(millis, arrival) for millis, arrival, _ in samples])
+
+    assert all(a <= arrival for a, (_, arrival, _) in zip(aligned, samples))
+    assert aligned == sorted(aligned)
+    # Depois do primeiro balde, o erro fica perto do atraso mínimo (2ms), não do atraso de cada linha (até 22ms)
+    for a, (_, _, event) in list(zip(aligned, samples))[40:]:
+        assert a - event == pytest.approx(0.002, abs=0.006)
+    assert clock.status()['synced']
+
+
+def test_millis_wrap_keeps_time_going_forward():
+    clock = server.DeviceClock()
+    samples = steady_samples(server.DEVICE_MILLIS_WRAP - 3000, 10.0, offset=50.0)
+
+    aligned = feed(clock, [(millis, arrival) for millis, arrival, _ in samples])
+
+    assert clock.wraps == 1
+    assert clock.board_resets == 0
+    assert aligned == sorted(aligned)
+    assert aligned[-1] - samples[-1][2] == pytest.approx(0.002, abs=0.006)
+
+
+def test_board_reset_restarts_the_estimate():
+    clock = server.DeviceClock()
+    before = steady_samples(600000, 10.0, offset=20.0)
+    feed(clock, [(millis, arrival) for millis, arrival, _ in before])
+
+    # Placa reiniciou: millis() recomeça perto de zero, o relógio do jogo segue
+    after = steady_samples(0, 10.0, offset=31.0, seed=1)
+    aligned = feed(clock, [(millis, arrival) for millis, arrival, _ in after])
+
+    assert clock.board_resets == 1
+    assert clock.wraps == 0
+    for a, (_, _, event) in list(zip(aligned, after))[40:]:
+        assert a - event == pytest.approx(0.002, abs=0.006)
+
+
+def test_small_step_back_does_not_move_time_backwards():
+    clock = server.DeviceClock()
+    first = clock.align(5000, 10.0)
+
+    assert clock.align(4990, 10.001) == first
+    assert clock.board_resets == 0
+
+
+def test_drift_between_clocks_is_estimated():
+    clock = server.DeviceClock()
+    samples = steady_samples(0, 60.0, offset=10.0, drift=0.005)
+
+    aligned = feed(clock, [(millis, arrival) for millis, arrival, _ in samples])
+
+    assert clock.drift == pytest.approx(0.005, abs=0.0005)
+    assert aligned[-1] - samples[-1][2] == pytest.approx(0.002, abs=0.005)
+
+
+def test_drift_is_capped():
+    clock = server.DeviceClock()
+    samples = steady_samples(0, 60.0, offset=10.0, drift=0.05)
+
+    feed(clock, [(millis, arrival) for millis, arrival, _ in samples])
+
+    assert clock.drift == server.DEVICE_CLOCK_MAX_DRIFT
@@ -0,0 +1,128 @@
+"""Motor NumPy x motor Python: a mesma sequência de pedaladas deve dar o mesmo resultado"""
+import os
+import random
+import sys
+import threading
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import server  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def isolated_game(tmp_path, monkeypatch):
+    """Jogo zerado, sem decaimento, com histórico/ranking/snapshot num diretório temporário"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(server, 'udp_socket', None)
+    monkeypatch.setitem(server.game_config, 'energy_decay_rate', 0.0)
+    monkeypatch.setattr(server, 'energy_engine', None)
+    server.reset_players()
+    server.game_state.update(game_active=True, game_frozen=False, winner_player=0)
+    yield
+    server.energy_engine = None
+    server.reset_players()
+    server.game_state.update(game_active=False, game_frozen=False, winner_player=0)
+
+
+def play(sequence, engine=None, tick_every=None):
+    """Aplicar (jogador, ganho) como os leitores fazem: nada entra com o jogo congelado"""
+    server.energy_engine = engine
+    for i, (player_idx, gain) in enumerate(sequence):
+        if not server.game_state['game_frozen']:
+            server.register_pedal(player_idx, server.game_clock(), gain)
+        if engine is not None and tick_every and i % tick_every == tick_every - 1:
+            server.apply_engine_tick()
+    if engine is not None:
+        server.apply_engine_tick()
+    return {
+        'energy': [round(server.game_state[f'player{i + 1}_energy'], 6) for i in range(4)],
+        'pedal_count': list(server.game_state['pedal_count']),
+        'winner': server.game_state['winner_player'],
+        'frozen': server.game_state['game_frozen']
+    }
+
+
+def reset_game():
+    server.energy_engine = None
+    server.reset_players()
+    server.game_state.update(game_active=True, game_frozen=False, winner_player=0)
+
+
+@pytest.mark.parametrize('seed', range(5))
+@pytest.mark.parametrize('tick_every', [1, 7, 1000])
+def test_same_result_as_python_engine(seed, tick_every):
+    rng = random.Random(seed)
+    sequence = [(rng.randrange(4), rng.choice([0.5, 1.0, 2.5])) for _ in range(400)]
+
+    expected = play(sequence)
+    reset_game()
+    result = play(sequence, server.NumpyEnergyEngine(4), tick_every)
+
+    assert result == expected
+
+
+def test_no_win_keeps_counting():
+    sequence = [(player_idx, 0.1) for player_idx in range(4)] * 50
+
+    expected = play(sequence)
+    reset_game()
+    result = play(sequence, server.NumpyEnergyEngine(4), tick_every=3)
+
+    assert result == expected
+    assert result['winner'] == 0
+    assert result['pedal_count'] == [50, 50, 50, 50]
+
+
+def test_pedals_after_win_are_ignored_before_tick():
+    engine = server.NumpyEnergyEngine(4)
+    for _ in range(150):
+        engine.pedal(0, server.game_clock(), 1.0)
+    engine.pedal(1, server.game_clock(), 1.0)
+
+    winner, _ = engine.tick(server.game_clock(), 0.0, False)
+
+    assert winner == 0
+    assert engine.pedal_count.tolist() == [100, 0, 0, 0]
+    assert engine.energy.tolist() == [100.0, 0.0, 0.0, 0.0]
+
+
+def test_concurrent_credits_survive_ticks():
+    engine = server.NumpyEnergyEngine(4)
+    stop = threading.Event()
+
+    def ticker():
+        while not stop.is_set():
+            engine.tick(server.game_clock(), 0.0, False)
+
+    def credit(player_idx):
+        for _ in range(20000):
+            engine.add_energy(player_idx, 0.001)
+
+    tick_thread = threading.Thread(target=ticker)
+    tick_thread.start()
+    workers = [threading.Thread(target=credit, args=(player_idx,)) for player_idx in (0, 0, 1)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    stop.set()
+    tick_thread.join()
+    engine.tick(server.game_clock(), 0.0, False)
+
+    assert engine.energy[0] == pytest.approx(40.0)
+    assert engine.energy[1] == pytest.approx(20.0)
+
+
+def test_credited_pedals_do_not_mark_pedaling():
+    engine = server.NumpyEnergyEngine(4)
+    engine.pedal(0, 1.0, 1.0, 2)
+    engine.credit_pedals(0, 3.0, 5)
+
+    engine.tick(1.1, 0.0, False)
+
+    assert engine.pedal_count.tolist() == [5, 0, 0, 0]
+    assert engine.energy.tolist() == [4.0, 0.0, 0.0, 0.0]
+    assert engine.last_pedal_time.tolist() == [1.0, 0.0, 0.0, 0.0]
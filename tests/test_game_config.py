@@ -0,0 +1,28 @@
+"""validate_game_config: limites dos números e partial_energy estrito"""
+import pytest
+
+import server
+
+
+def test_values_are_clamped_and_defaults_filled():
+    config = server.validate_game_config({'energy_gain_rate': 500, 'energy_decay_rate': '0'})
+
+    assert config == {
+        'energy_gain_rate': 50.0,
+        'energy_decay_rate': 0.1,
+        'led_strobe_rate': server.DEFAULT_LED_STROBE,
+        'partial_energy': server.DEFAULT_PARTIAL_ENERGY
+    }
+
+
+@pytest.mark.parametrize('value, expected', [
+    (True, True), (False, False), ('true', True), ('false', False), (' False ', False)
+])
+def test_partial_energy_accepts_booleans(value, expected):
+    assert server.validate_game_config({'partial_energy': value})['partial_energy'] is expected
+
+
+@pytest.mark.parametrize('value', ['0', '1', 'no', '', 0, 1, None, []])
+def test_partial_energy_rejects_anything_else(value):
+    with pytest.raises(ValueError):
+        server.validate_game_config({'partial_energy': value})
@@ -0,0 +1,156 @@
+"""Exportação do histórico: filtros, formatos e envio em pedaços"""
+import csv
+import http.client
+import io
+import json
+import time
+
+import pytest
+
+import server
+
+
+def game_record(finished_at, winner, pedals):
+    return {
+        'finished_at': finished_at,
+        'started_at': finished_at - 30,
+        'duration': 30.0,
+        'winner_player': winner,
+        'players': [{'player': i + 1, 'energy': 100 if i + 1 == winner else 50, 'total_pedals': pedals[i],
+                     'peak_rpm': 80, 'average_rpm': 60, 'peak_watts': 200} for i in range(4)]
+    }
+
+
+def day_start(day):
+    return server.parse_history_bound(day)
+
+
+@pytest.fixture
+def history(game):
+    records = [
+        game_record(day_start('2024-03-01') + 3600, 1, (40, 20, 0, 0)),
+        game_record(day_start('2024-03-02') + 7200, 2, (10, 45, 30, 0)),
+        game_record(day_start('2024-03-02') + 80000, 4, (0, 0, 12, 44)),
+        game_record(day_start('2024-03-05') + 60, 3, (5, 5, 50, 5))
+    ]
+    for record in records:
+        server.append_game_history(record)
+    return records
+
+
+def export(export_format, **filters):
+    return b''.join(server.export_game_history(export_format, **filters)).decode('utf-8')
+
+
+def winners(records):
+    return [record['winner_player'] for record in records]
+
+
+def test_parse_history_bound():
+    start = server.parse_history_bound('2024-03-02')
+
+    assert time.localtime(start)[:6] == (2024, 3, 2, 0, 0, 0)
+    assert time.localtime(server.parse_history_bound('2024-03-02', end=True))[:6] == (2024, 3, 3, 0, 0, 0)
+    assert server.parse_history_bound('1700000000.5') == 1700000000.5
+    with pytest.raises(ValueError):
+        server.parse_history_bound('02/03/2024')
+
+
+def test_date_filters_include_the_whole_end_day(history):
+    since = server.parse_history_bound('2024-03-02')
+    until = server.parse_history_bound('2024-03-02', end=True)
+
+    assert winners(server.iter_game_history(since=since, until=until)) == [2, 4]
+    assert winners(server.iter_game_history(since=since)) == [2, 4, 3]
+    assert winners(server.iter_game_history(until=since)) == [1]
+
+
+def test_player_and_winner_filters(history):
+    assert winners(server.iter_game_history(player=3)) == [2, 4, 3]  # Só quem pedalou
+    assert winners(server.iter_game_history(winner=2)) == [2]
+    assert winners(server.iter_game_history(player=1, winner=3)) == [3]
+
+
+def test_corrupt_lines_are_skipped(history):
+    with open(server.GAME_HISTORY_FILE, 'a', encoding='utf-8') as f:
+        f.write('{"finished_at": 1, "players": [\n')  # Última linha ainda sendo escrita
+        f.write('not json\n')
+
+    assert winners(server.iter_game_history()) == [1, 2, 4, 3]
+
+
+def test_missing_history_exports_empty(game):
+    assert json.loads(export('json')) == []
+    assert export('ndjson') == ''
+    assert export('csv') == ','.join(server.HISTORY_CSV_COLUMNS) + '\n'
+
+
+def test_json_and_ndjson_round_trip(history):
+    assert json.loads(export('json')) == history
+    assert [json.loads(line) for line in export('ndjson').splitlines()] == history
+
+
+def test_csv_has_one_row_per_player(history):
+    rows = list(csv.DictReader(io.StringIO(export('csv', winner=2))))
+
+    assert len(rows) == 4
+    assert [row['player'] for row in rows] == ['1', '2', '3', '4']
+    assert rows[1]['total_pedals'] == '45'
+    assert rows[0]['finished_at'] == server.format_history_time(history[1]['finished_at'])
+
+
+def test_csv_player_filter_keeps_only_that_player(history):
+    rows = list(csv.DictReader(io.StringIO(export('csv', player=4))))
+
+    assert [(row['winner_player'], row['player']) for row in rows] == [('4', '4'), ('3', '4')]
+
+
+def test_export_is_sent_in_chunks(game, monkeypatch):
+    for i in range(200):
+        server.append_game_history(game_record(1700000000 + i, 1, (10, 10, 10, 10)))
+    monkeypatch.setattr(server, 'HISTORY_EXPORT_CHUNK', 4096)
+
+    chunks = list(server.export_game_history('ndjson'))
+
+    assert len(chunks) > 10
+    assert all(len(chunk) < 4096 + 1024 for chunk in chunks)
+    assert len(b''.join(chunks).splitlines()) == 200
+
+
+def get(port, path):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    try:
+        conn.request('GET', path)
+        response = conn.getresponse()
+        return response, response.read()
+    finally:
+        conn.close()
+
+
+def test_http_export_streams_with_attachment(http_server, history):
+    response, body = get(http_server, '/api/history/export?format=csv&from=2024-03-02&to=2024-03-02')
+
+    assert response.status == 200
+    assert response.getheader('Content-Type') == 'text/csv; charset=utf-8'
+    assert response.getheader('Transfer-Encoding') == 'chunked'
+    assert 'attachment; filename="bikejj_history_' in response.getheader('Content-Disposition')
+    assert len(body.decode('utf-8').splitlines()) == 1 + 2 * 4
+
+
+def test_http_export_keeps_the_connection_usable(http_server, history):
+    conn = http.client.HTTPConnection('127.0.0.1', http_server, timeout=10)
+    conn.request('GET', '/api/history/export?format=ndjson')
+    sock = conn.sock
+    assert len(conn.getresponse().read().splitlines()) == 4
+    conn.request('GET', '/api/state')
+
+    assert conn.getresponse().status == 200
+    assert conn.sock is sock
+    conn.close()
+
+
+@pytest.mark.parametrize('query', ['format=xml', 'from=ontem', 'player=um', 'to=2024-13-01'])
+def test_http_export_rejects_bad_parameters(http_server, query):
+    response, _ = get(http_server, f'/api/history/export?{query}')
+
+    assert response.status == 400
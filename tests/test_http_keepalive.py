@@ -0,0 +1,122 @@
+"""HTTP/1.1 persistente: Content-Length em toda resposta, reuso da conexão e quando ela fecha"""
+import http.client
+import socket
+
+import server
+
+
+def read_response(sock):
+    """Ler uma resposta com Content-Length de um socket cru; retorna (linha de status, cabeçalhos, corpo)"""
+    data = b''
+    while b'\r\n\r\n' not in data:
+        chunk = sock.recv(4096)
+        assert chunk, 'conexão fechada antes do fim dos cabeçalhos'
+        data += chunk
+    head, body = data.split(b'\r\n\r\n', 1)
+    status, *lines = head.decode('latin-1').split('\r\n')
+    headers = {name.lower(): value.strip() for name, value in (line.split(':', 1) for line in lines)}
+    while len(body) < int(headers['content-length']):
+        body += sock.recv(4096)
+    return status, headers, body
+
+
+def is_closed_by_server(sock):
+    sock.settimeout(2)
+    try:
+        return sock.recv(1) == b''
+    except ConnectionResetError:
+        return True
+
+
+def test_requests_share_one_connection(http_server, tmp_path):
+    (tmp_path / 'index.html').write_text('<h1>BikeJJ</h1>')
+    conn = http.client.HTTPConnection('127.0.0.1', http_server, timeout=10)
+    paths = ['/api/state', '/', '/api/leaderboard', '/missing.png', '/healthz']
+    statuses = []
+    for path in paths:
+        conn.request('GET', path)
+        if path == '/api/state':
+            sock = conn.sock
+        response = conn.getresponse()
+        body = response.read()
+        statuses.append(response.status)
+        assert int(response.getheader('Content-Length')) == len(body)
+        assert response.getheader('Keep-Alive') is not None
+        assert conn.sock is sock  # Nenhuma reconexão
+    conn.close()
+
+    assert statuses[:4] == [200, 200, 200, 404]
+
+
+def test_post_reuses_the_connection(http_server):
+    conn = http.client.HTTPConnection('127.0.0.1', http_server, timeout=10)
+    conn.request('POST', '/api/pedal/batch', body=b'[{"player": 1}]', headers={'Content-Type': 'application/json'})
+    sock = conn.sock
+    assert conn.getresponse().read()
+    conn.request('GET', '/api/state')
+    response = conn.getresponse()
+
+    assert response.status == 200 and response.read()
+    assert conn.sock is sock
+    conn.close()
+
+
+def test_client_connection_close_is_honored(http_server):
+    with socket.create_connection(('127.0.0.1', http_server), timeout=5) as sock:
+        sock.sendall(b'GET /api/state HTTP/1.1\r\nHost: x\r\nConnection: close\r\n\r\n')
+        _, headers, _ = read_response(sock)
+
+        assert headers['connection'] == 'close'
+        assert is_closed_by_server(sock)
+
+
+def test_http_1_0_closes_after_response(http_server):
+    with socket.create_connection(('127.0.0.1', http_server), timeout=5) as sock:
+        sock.sendall(b'GET /api/state HTTP/1.0\r\n\r\n')
+        status, headers, body = read_response(sock)
+
+        assert status.endswith('200 OK')
+        assert int(headers['content-length']) == len(body)
+        assert is_closed_by_server(sock)
+
+
+def test_unknown_post_closes_because_body_was_not_read(http_server):
+    with socket.create_connection(('127.0.0.1', http_server), timeout=5) as sock:
+        sock.sendall(b'POST /nope HTTP/1.1\r\nHost: x\r\nContent-Length: 3\r\n\r\nabc')
+        status, headers, _ = read_response(sock)
+
+        assert ' 404 ' in status
+        assert headers['connection'] == 'close'
+        assert is_closed_by_server(sock)
+
+
+def test_connection_closed_after_request_limit(http_server, monkeypatch):
+    monkeypatch.setattr(server, 'HTTP_MAX_REQUESTS_PER_CONNECTION', 3)
+    with socket.create_connection(('127.0.0.1', http_server), timeout=5) as sock:
+        connections = []
+        for _ in range(3):
+            sock.sendall(b'GET /healthz HTTP/1.1\r\nHost: x\r\n\r\n')
+            connections.append(read_response(sock)[1].get('connection'))
+
+        assert connections == [None, None, 'close']
+        assert is_closed_by_server(sock)
+
+
+def test_idle_connection_is_closed_after_timeout(http_server, monkeypatch):
+    monkeypatch.setattr(server.BikeJJHTTPHandler, 'timeout', 0.2)
+    with socket.create_connection(('127.0.0.1', http_server), timeout=5) as sock:
+        sock.sendall(b'GET /healthz HTTP/1.1\r\nHost: x\r\n\r\n')
+        read_response(sock)
+
+        assert is_closed_by_server(sock)
+
+
+def test_connection_stats_count_requests(http_server):
+    before = server.http_connection_stats.status()['opened']
+    conn = http.client.HTTPConnection('127.0.0.1', http_server, timeout=10)
+    for _ in range(4):
+        conn.request('GET', '/healthz')
+        conn.getresponse().read()
+    conn.close()
+
+    assert server.http_connection_stats.status()['opened'] == before + 1
@@ -0,0 +1,113 @@
+"""Tabela de rotas: despacho pelo caminho exato (sem query string) e métricas por rota"""
+import http.client
+import json
+import time
+
+import pytest
+
+import server
+
+
+@pytest.fixture
+def stats(monkeypatch):
+    stats = server.RouteStats()
+    monkeypatch.setattr(server, 'route_stats', stats)
+    return stats
+
+
+def request(port, method, path, body=None):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    try:
+        conn.request(method, path, body=body)
+        response = conn.getresponse()
+        return response.status, response.read()
+    finally:
+        conn.close()
+
+
+def counts(stats, expected_total=None):
+    """Contagem por rota; a métrica é gravada depois da resposta, então espera chegar ao total"""
+    deadline = time.monotonic() + 5
+    while expected_total is not None and time.monotonic() < deadline:
+        if sum(route['count'] for route in stats.report()['routes']) >= expected_total:
+            break
+        time.sleep(0.01)
+    return {(route['method'], route['path']): route['count'] for route in stats.report()['routes']}
+
+
+def test_table_maps_exact_paths_to_handler_methods():
+    assert server.http_routes[('GET', '/api/state')] is server.BikeJJHTTPHandler.get_state
+    assert server.http_routes[('POST', '/api/pedal/batch')] is server.BikeJJHTTPHandler.post_pedal_batch
+    for method, path in server.http_routes:
+        assert method in ('GET', 'POST')
+        assert path.startswith('/') and '?' not in path
+
+
+def test_one_handler_can_serve_several_paths():
+    handler = server.http_routes[('GET', '/api/debug/memory/start')]
+
+    assert server.http_routes[('GET', '/api/debug/memory/stop')] is handler
+
+
+def test_query_string_does_not_change_the_route(http_server, stats):
+    status, body = request(http_server, 'GET', '/api/leaderboard?cache=123&x=%20y')
+
+    assert status == 200
+    assert 'all_time' in json.loads(body)
+    assert counts(stats, 1) == {('GET', '/api/leaderboard'): 1}
+
+
+def test_unrouted_paths_are_grouped(http_server, stats):
+    for path in ['/a.png', '/b/c.js', '/nope.html']:
+        assert request(http_server, 'GET', path)[0] == 404
+    assert request(http_server, 'POST', '/api/nope', b'{}')[0] == 404
+    assert request(http_server, 'POST', '/api/state', b'{}')[0] == 404  # Rota só existe para GET
+
+    assert counts(stats, 5) == {('GET', '<static>'): 3, ('POST', '<404>'): 2}
+
+
+def test_static_files_are_served_from_the_working_directory(http_server, tmp_path):
+    (tmp_path / 'index.html').write_text('<p>jogo</p>')
+    (tmp_path / 'serial_config.html').write_text('<p>serial</p>')
+
+    assert request(http_server, 'GET', '/?v=2') == (200, b'<p>jogo</p>')
+    assert request(http_server, 'GET', '/serial') == (200, b'<p>serial</p>')
+
+
+def test_route_report_has_status_and_bytes(http_server, stats):
+    request(http_server, 'GET', '/api/state')
+    request(http_server, 'GET', '/api/state?since=abc')
+    counts(stats, 2)
+
+    route = next(r for r in stats.report()['routes'] if r['path'] == '/api/state')
+
+    assert route['count'] == 2
+    assert route['status'] == {'200': 1, '400': 1}
+    assert route['bytes'] > 0
+    assert route['p50_ms'] <= route['p99_ms'] <= route['max_ms']
+
+
+def test_debug_routes_endpoint_reports_and_resets(http_server):
+    request(http_server, 'GET', '/api/debug/routes/reset')
+    request(http_server, 'GET', '/api/state')
+    counts(server.route_stats, 2)
+
+    report = json.loads(request(http_server, 'GET', '/api/debug/routes')[1])
+    paths = {route['path'] for route in report['routes']}
+
+    assert {'/api/debug/routes/reset', '/api/state'} <= paths
+
+
+def test_percentiles_come_from_the_histogram():
+    stats = server.RouteStats()
+    for _ in range(99):
+        stats.record('GET', '/x', 0.0003, 200, 10)
+    stats.record('GET', '/x', 2.0, 500, 10)
+
+    route = stats.report()['routes'][0]
+
+    assert route['p50_ms'] == 0.5  # Limite do balde de 0,5ms
+    assert route['p99_ms'] == 0.5
+    assert route['max_ms'] == 2000.0
+    assert route['status'] == {'200': 99, '500': 1}
+    assert route['avg_bytes'] == 10
@@ -0,0 +1,131 @@
+"""Ranking: ordem por métrica, limite de posições, virada do dia e recarga do disco"""
+import json
+import time
+
+import pytest
+
+import server
+
+DAY = 24 * 3600
+
+
+def game_record(finished_at, winner=1, duration=30.0, pedals=(10, 5, 0, 0), peak_rpm=(60, 40, 0, 0)):
+    return {
+        'finished_at': finished_at,
+        'winner_player': winner,
+        'duration': duration,
+        'players': [{'player': i + 1, 'total_pedals': pedals[i], 'peak_rpm': peak_rpm[i]} for i in range(4)]
+    }
+
+
+@pytest.fixture
+def board(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return server.Leaderboard(size=3)
+
+
+def values(ranking):
+    return [entry['value'] for entry in ranking]
+
+
+def test_metrics_ordered_best_first(board):
+    now = time.time()
+    for duration, pedals in [(40.0, 30), (25.0, 50), (60.0, 10)]:
+        board.add_game(game_record(now, duration=duration, pedals=(pedals, 0, 0, 0)))
+
+    data = board.to_dict()
+
+    assert values(data['all_time']['fastest_win']) == [25.0, 40.0, 60.0]
+    assert values(data['all_time']['most_pedals']) == [50, 30, 10]
+    assert data['today'] == data['all_time']
+
+
+def test_only_best_entries_are_kept(board):
+    now = time.time()
+    for duration in [50.0, 20.0, 70.0, 10.0, 30.0]:
+        board.add_game(game_record(now, duration=duration))
+
+    assert values(board.to_dict()['all_time']['fastest_win']) == [10.0, 20.0, 30.0]
+    assert board.games_total == 5
+
+
+def test_tie_goes_to_the_earlier_game(board):
+    now = time.time()
+    board.add_game(game_record(now, winner=2, duration=30.0))
+    board.add_game(game_record(now, winner=3, duration=30.0))
+
+    assert [entry['player'] for entry in board.to_dict()['all_time']['fastest_win']] == [2, 3]
+
+
+def test_game_without_winner_only_counts_pedals(board):
+    board.add_game(game_record(time.time(), winner=0))
+
+    data = board.to_dict()
+    assert data['all_time']['fastest_win'] == []
+    assert values(data['all_time']['most_pedals']) == [10, 5]
+
+
+def test_game_on_next_day_starts_a_new_today(board):
+    now = time.time()
+    board.add_game(game_record(now, duration=20.0))
+
+    board.add_game(game_record(now + 2 * DAY, duration=40.0))
+
+    data = board.to_dict()
+    assert values(data['today']['fastest_win']) == [40.0]
+    assert values(data['all_time']['fastest_win']) == [20.0, 40.0]
+    assert (data['games_today'], data['games_total']) == (1, 2)
+
+
+def test_response_body_rolls_over_at_midnight(board):
+    board.add_game(game_record(time.time()))
+    board.rollover_at = time.time() - 1  # Meia-noite passou sem nenhuma partida nova
+
+    data = json.loads(board.response_body())
+
+    assert data['games_today'] == 0
+    assert all(ranking == [] for ranking in data['today'].values())
+    assert data['games_total'] == 1
+
+
+def test_saved_ranking_reloads_the_same(board):
+    now = time.time()
+    for duration in [50.0, 20.0, 70.0, 10.0]:
+        board.add_game(game_record(now, duration=duration))
+    board.save()
+
+    reloaded = server.Leaderboard(size=3)
+    reloaded.load()
+
+    assert reloaded.to_dict() == board.to_dict()
+    assert reloaded.response_body() == board.response_body()
+
+
+def test_saved_ranking_from_another_day_keeps_only_all_time(board):
+    board.add_game(game_record(time.time(), duration=20.0))
+    data = board.to_dict()
+    data['day'] = '2000-01-01'
+    server.write_json_atomic(server.LEADERBOARD_FILE, data)
+
+    reloaded = server.Leaderboard(size=3)
+    reloaded.load()
+
+    assert reloaded.to_dict()['today']['fastest_win'] == []
+    assert values(reloaded.to_dict()['all_time']['fastest_win']) == [20.0]
+    assert reloaded.games_today == 0
+
+
+def test_missing_ranking_is_rebuilt_from_history(board):
+    now = time.time()
+    for duration in [50.0, 20.0]:
+        server.append_game_history(game_record(now - 3 * DAY, duration=duration))
+    server.append_game_history(game_record(now, duration=35.0))
+
+    board.load()
+
+    data = board.to_dict()
+    assert values(data['all_time']['fastest_win']) == [20.0, 35.0, 50.0]
+    assert values(data['today']['fastest_win']) == [35.0]
+    assert data['games_total'] == 3
+    with open(server.LEADERBOARD_FILE, encoding='utf-8') as f:
+        assert json.load(f)['games_total'] == 3
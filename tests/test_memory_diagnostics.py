@@ -0,0 +1,43 @@
+"""Diagnóstico de memória: só desliga o tracemalloc que ele mesmo ligou"""
+import tracemalloc
+
+import pytest
+
+import server
+
+
+@pytest.fixture
+def diagnostics(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    was_tracing = tracemalloc.is_tracing()
+    diagnostics = server.MemoryDiagnostics(dump_interval=3600)
+    yield diagnostics
+    diagnostics.stop()
+    if tracemalloc.is_tracing() and not was_tracing:
+        tracemalloc.stop()
+
+
+def test_stop_turns_off_tracing_it_started(diagnostics):
+    if tracemalloc.is_tracing():
+        pytest.skip('tracemalloc já ligado pelo ambiente')
+
+    assert diagnostics.start()
+    assert tracemalloc.is_tracing()
+    assert diagnostics.stop()
+    assert not tracemalloc.is_tracing()
+
+
+def test_stop_keeps_tracing_started_elsewhere(diagnostics):
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+    assert diagnostics.start()
+    assert diagnostics.stop()
+    assert tracemalloc.is_tracing()
+
+
+def test_start_and_stop_are_idempotent(diagnostics):
+    assert diagnostics.start()
+    assert not diagnostics.start()
+    assert diagnostics.stop()
+    assert not diagnostics.stop()
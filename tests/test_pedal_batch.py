@@ -0,0 +1,69 @@
+"""POST /api/pedal/batch: ordem dos eventos, limites de count/ts e parada na vitória"""
+import server
+
+
+def test_events_applied_in_order_with_client_intervals(game, monkeypatch):
+    calls = []
+    monkeypatch.setattr(server, 'register_pedal',
+                        lambda player_idx, timestamp, energy_gain: calls.append((player_idx, timestamp)))
+
+    applied, ignored = server.apply_pedal_batch([
+        {'player': 2, 'count': 1, 'ts': 1000},
+        {'player': 1, 'count': 2, 'ts': 1500},
+        {'player': 3, 'count': 1, 'ts': 1750}
+    ], now=100.0)
+
+    assert (applied, ignored) == (3, 0)
+    assert calls == [(1, 99.25), (0, 99.75), (0, 99.75), (2, 100.0)]
+
+
+def test_count_is_clamped_and_non_positive_ignored(game):
+    applied, ignored = server.apply_pedal_batch([
+        {'player': 1, 'count': 10000},
+        {'player': 2, 'count': 0},
+        {'player': 3, 'count': -5},
+        {'player': 5, 'count': 1},
+        {'player': 'x'}
+    ])
+
+    assert (applied, ignored) == (1, 4)
+    assert game['pedal_count'] == [server.MAX_EVENT_COUNT, 0, 0, 0]
+    assert game['player1_energy'] == server.MAX_EVENT_COUNT
+
+
+def test_old_ts_is_clamped_to_pedaling_timeout(game, monkeypatch):
+    calls = []
+    monkeypatch.setattr(server, 'register_pedal',
+                        lambda player_idx, timestamp, energy_gain: calls.append(timestamp))
+
+    server.apply_pedal_batch([{'player': 1, 'ts': -1e12}, {'player': 1, 'ts': 5000}], now=100.0)
+
+    assert calls == [100.0 - server.PEDALING_TIMEOUT, 100.0]
+
+
+def test_non_finite_ts_is_ignored(game):
+    applied, ignored = server.apply_pedal_batch([
+        {'player': 1, 'ts': float('nan')},
+        {'player': 1, 'ts': float('inf')},
+        {'player': 1, 'ts': '12'},
+        {'player': 1, 'ts': 1000}
+    ], now=100.0)
+
+    assert (applied, ignored) == (1, 3)
+    assert game['pedal_count'][0] == 1
+
+
+def test_batch_stops_at_the_win(game):
+    game['player2_energy'] = 98
+
+    applied, ignored = server.apply_pedal_batch([
+        {'player': 1, 'count': 1},
+        {'player': 2, 'count': 5},
+        {'player': 3, 'count': 1},
+        {'player': 4, 'count': 1}
+    ])
+
+    assert (applied, ignored) == (2, 2)
+    assert game['game_frozen'] and game['winner_player'] == 2
+    assert game['pedal_count'] == [1, 2, 0, 0]
+    assert game['player3_energy'] == 0
@@ -0,0 +1,106 @@
+"""Contador de pedaladas da placa: lacunas, repetições, reinício da placa e saltos impossíveis"""
+import pytest
+
+import server
+
+
+@pytest.fixture
+def reader():
+    return server.ArduinoMegaReader('/dev/null')
+
+
+def feed(reader, counts, start=0.0, step=0.5, player_idx=0):
+    """Linhas de pedalada espaçadas de step segundos; retorna o resultado de cada uma"""
+    return [reader._check_pedal_counter(player_idx, count, start + i * step) for i, count in enumerate(counts)]
+
+
+def test_gap_counts_missed_pedals(reader):
+    assert feed(reader, [1, 2, 5, 6]) == [0, 0, 2, 0]
+    assert reader.missed_pedals[0] == 2
+    assert reader.pedal_lines[0] == 4
+
+
+def test_repeated_or_older_pedal_is_duplicate(reader):
+    assert feed(reader, [1, 2, 3, 3, 2]) == [0, 0, 0, None, None]
+    assert reader.duplicate_pedals == 2
+    assert reader.last_pedal_counts[0] == 3
+
+
+def test_counter_back_to_one_is_board_reset(reader):
+    assert feed(reader, [7, 8, 1, 2]) == [0, 0, 0, 0]
+    assert reader.duplicate_pedals == 0
+    assert reader.missed_pedals[0] == 0
+    assert reader.last_pedal_counts[0] == 2
+
+
+def test_impossible_jump_resyncs_without_credit(reader):
+    assert feed(reader, [1, 500], step=0.1) == [0, 0]
+    assert reader.counter_jumps[0] == 1
+    assert reader.missed_pedals[0] == 0
+    # O contador saltado vira a nova referência
+    assert reader._check_pedal_counter(0, 503, 0.2) == 0
+    assert reader._check_pedal_counter(0, 505, 0.7) == 1
+
+
+def test_jump_limit_grows_with_elapsed_time(reader):
+    # 10s parado: até 15 pedaladas/s + 2 são plausíveis
+    assert reader._check_pedal_counter(0, 1, 0.0) == 0
+    assert reader._check_pedal_counter(0, 150, 10.0) == 148
+    assert reader.counter_jumps[0] == 0
+
+
+def test_repeated_line_after_reconnect_is_duplicate(reader):
+    feed(reader, [9, 10])
+    reader.counter_rebase = [True, True, True, True]  # Como após _reconnect
+
+    assert reader._check_pedal_counter(0, 10, 2.0) is None
+    assert reader.duplicate_pedals == 1
+
+
+def test_restarted_counter_after_reconnect_is_accepted(reader):
+    feed(reader, [9, 10])
+    reader.counter_rebase = [True, True, True, True]
+
+    # A placa reiniciou ao reabrir a porta: 3 < 10 não é repetição nem gera lacuna
+    assert feed(reader, [3, 4], start=2.0) == [0, 0]
+    assert reader.duplicate_pedals == 0
+    assert reader.missed_pedals[0] == 0
+
+
+def test_total_in_step_only_refreshes_reference_time(reader):
+    feed(reader, [1, 2])
+    assert reader._check_pedal_total(0, 2, 30.0) == 0
+    assert reader.last_count_time[0] == 30.0
+    # Com a referência renovada, um salto curto depois do total não é impossível
+    assert reader._check_pedal_counter(0, 5, 30.2) == 2
+
+
+def test_total_ahead_counts_every_lost_line(reader):
+    feed(reader, [1, 2])
+    assert reader._check_pedal_total(0, 5, 2.0) == 3
+    assert reader.last_pedal_counts[0] == 5
+    # A linha da pedalada 5 chegando atrasada é repetição
+    assert reader._check_pedal_counter(0, 5, 2.1) is None
+
+
+def test_total_line_credits_without_cadence_or_pedaling(reader, game):
+    reader._process_line("🔍 J1:1", 1.0)
+    reader._process_line("🔍 J1:2", 1.5)
+    samples = server.cadence_trackers[0].count
+
+    reader._process_line("📈 J1: 5 pedaladas total", 9.0)
+
+    assert game['player1_energy'] == pytest.approx(5.0)
+    assert game['pedal_count'][0] == 5
+    assert game['last_pedal_time'][0] == 1.5
+    assert server.cadence_trackers[0].count == samples
+
+
+def test_total_line_ignored_after_win(reader, game):
+    reader._process_line("🔍 J1:1", 1.0)
+    game['game_frozen'] = True
+
+    reader._process_line("📈 J1: 4 pedaladas total", 2.0)
+
+    assert game['player1_energy'] == pytest.approx(1.0)
+    assert game['pedal_count'][0] == 1
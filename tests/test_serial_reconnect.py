@@ -0,0 +1,87 @@
+"""Reconexão serial: usa o inventário em memória e acorda no hotplug em vez de esperar o backoff"""
+import threading
+import time
+
+import pytest
+import serial
+
+import server
+
+
+class FakeConnection:
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def inventory(monkeypatch):
+    inventory = server.SerialPortInventory()
+    inventory.running = True  # Como com a thread de hotplug rodando (sem iniciá-la)
+    monkeypatch.setattr(server, 'port_inventory', inventory)
+
+    def no_system_scan():
+        raise AssertionError('reconexão não deve listar as portas do sistema')
+
+    monkeypatch.setattr(server, 'list_available_ports', no_system_scan)
+    return inventory
+
+
+@pytest.fixture
+def reader(monkeypatch, game):
+    monkeypatch.setattr(server, 'SERIAL_PORT', '/dev/ttyACM0')
+    reader = server.ArduinoMegaReader('/dev/ttyACM0')
+    reader.device_identity = ('serial', 'MEGA1')
+    reader.disconnected_since = time.time()
+    return reader
+
+
+def plug(inventory, ports):
+    with inventory.condition:
+        inventory.ports = ports
+        inventory.version += 1
+        inventory.condition.notify_all()
+
+
+def test_board_on_new_path_is_found_from_inventory(inventory, reader, monkeypatch):
+    opened = []
+
+    def fake_serial(port, baudrate, timeout):
+        opened.append(port)
+        if port != '/dev/ttyACM1':
+            raise serial.SerialException('não existe')
+        return FakeConnection()
+
+    monkeypatch.setattr(server.serial, 'Serial', fake_serial)
+    monkeypatch.setattr(server, 'RECONNECT_BACKOFF_MIN', 10.0)  # Só o hotplug pode acordar a tempo
+    thread = threading.Thread(target=reader._reconnect, args=(threading.Event(),))
+    start = time.monotonic()
+    thread.start()
+    time.sleep(0.1)
+
+    plug(inventory, [{'port': '/dev/ttyACM1', 'serial_number': 'MEGA1'},
+                     {'port': '/dev/ttyUSB0', 'serial_number': 'OTHER'}])
+    thread.join(5)
+
+    assert not thread.is_alive()
+    assert time.monotonic() - start < 2
+    assert reader.connected and reader.port == '/dev/ttyACM1'
+    assert server.SERIAL_PORT == '/dev/ttyACM1'
+    assert '/dev/ttyUSB0' not in opened  # Outra placa não é candidata
+
+
+def test_identity_lookup_uses_inventory(inventory, reader):
+    plug(inventory, [{'port': '/dev/ttyACM0', 'vid': 0x2341, 'pid': 0x0042, 'serial_number': None}])
+
+    assert reader._lookup_identity('/dev/ttyACM0') == ('usb', 0x2341, 0x0042)
+    assert reader._lookup_identity('/dev/ttyACM9') is None
+
+
+def test_inventory_without_watcher_reads_the_system(monkeypatch):
+    inventory = server.SerialPortInventory()
+    monkeypatch.setattr(server, 'list_available_ports', lambda: [{'port': 'COM3', 'description': 'Mega',
+                                                                  'manufacturer': 'Arduino', 'valid': True}])
+
+    ports, version = inventory.current()
+
+    assert [port['port'] for port in ports] == ['COM3']
+    assert version == 1
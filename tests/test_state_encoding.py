@@ -0,0 +1,92 @@
+"""Codificações compactas do estado (binário de 52 bytes e MessagePack)"""
+import http.client
+
+import pytest
+
+import server
+
+
+def sample_state(game):
+    game.update(game_active=True, game_can_start=False, game_frozen=True, winner_player=3,
+                player1_energy=12.346, player2_energy=0, player3_energy=100, player4_energy=99.999)
+    game['is_pedaling'][:] = [True, False, True, False]
+    game['players_ready'][:] = [False, True, True, True]
+    game['pedal_count'][:] = [1, 0, 250, 99999]
+    game['rpm_avg'][:] = [61.26, 0, 120.04, 15.0]
+    game['power_watts'][:] = [180, 0, 410, 30]
+    return game
+
+
+def get(port, path, headers=None):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    try:
+        conn.request('GET', path, headers=headers or {})
+        response = conn.getresponse()
+        return response.status, response.getheader('Content-Type'), response.read()
+    finally:
+        conn.close()
+
+
+def test_binary_round_trip(game):
+    state = sample_state(game)
+
+    data = server.encode_state_binary(state, 1234567890123)
+    version, decoded = server.decode_state_binary(data)
+
+    assert len(data) == server.STATE_BINARY_STRUCT.size == 52
+    assert version == 1234567890123
+    assert decoded['player1_energy'] == 12.35  # Centésimos de %
+    assert decoded['player4_energy'] == 100.0
+    assert decoded['rpm_avg'] == [61.3, 0, 120.0, 15.0]  # Décimos de RPM
+    for key in ('game_active', 'game_can_start', 'game_frozen', 'winner_player',
+                'is_pedaling', 'players_ready', 'pedal_count', 'power_watts'):
+        assert decoded[key] == state[key]
+
+
+def test_binary_values_are_clamped_to_field_range(game):
+    state = sample_state(game)
+    state['player1_energy'] = -3
+    state['power_watts'][0] = 10 ** 6
+    state['rpm_avg'][0] = 10 ** 5
+
+    _, decoded = server.decode_state_binary(server.encode_state_binary(state, 1))
+
+    assert decoded['player1_energy'] == 0
+    assert decoded['power_watts'][0] == 0xFFFF
+    assert decoded['rpm_avg'][0] == 0xFFFF / server.STATE_RPM_SCALE
+
+
+def test_msgpack_has_the_binary_fields(game):
+    msgpack = pytest.importorskip('msgpack')
+    state = sample_state(game)
+
+    fields = msgpack.unpackb(server.encode_state_msgpack(state, 42))
+
+    expected = server.compact_state_fields(state, 42)
+    assert fields == [list(value) if isinstance(value, list) else value for value in expected]
+
+
+@pytest.mark.parametrize('path, headers', [
+    ('/api/state?format=binary', {}),
+    ('/api/state', {'Accept': server.STATE_BINARY_CONTENT_TYPE})
+])
+def test_http_binary_state(http_server, game, path, headers):
+    sample_state(game)
+
+    status, content_type, body = get(http_server, path, headers)
+    version, decoded = server.decode_state_binary(body)
+
+    assert status == 200
+    assert content_type == server.STATE_BINARY_CONTENT_TYPE
+    assert version == server.state_versions.version
+    assert decoded['pedal_count'] == game['pedal_count']
+
+
+def test_http_unknown_format_is_not_acceptable(http_server):
+    assert get(http_server, '/api/state?format=xml')[0] == 406
+
+
+def test_http_msgpack_without_library_is_not_acceptable(http_server, monkeypatch):
+    monkeypatch.setattr(server, 'msgpack', None)
+
+    assert get(http_server, '/api/state?format=msgpack')[0] == 406
@@ -0,0 +1,136 @@
+"""Long-poll de /api/state: versões, deltas e os cursores que pedem o estado completo"""
+import http.client
+import json
+import threading
+import time
+
+import pytest
+
+import server
+
+
+@pytest.fixture
+def versions(game):
+    versions = server.StateVersions()
+    versions.refresh()
+    return versions
+
+
+def get(port, path, headers=None):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    try:
+        conn.request('GET', path, headers=headers or {})
+        response = conn.getresponse()
+        return response.status, dict(response.getheaders()), response.read()
+    finally:
+        conn.close()
+
+
+def test_unchanged_state_keeps_the_version(versions):
+    version = versions.version
+
+    assert not versions.refresh()
+    assert versions.version == version
+    assert versions.changes_since(version) == (version, False, {})
+
+
+def test_delta_has_only_changed_fields(versions, game):
+    since = versions.version
+    game['player2_energy'] = 40
+    game['pedal_count'][1] += 1  # Lista alterada no lugar também conta
+
+    assert versions.refresh()
+    version, full, fields = versions.changes_since(since)
+
+    assert version == since + 1
+    assert not full
+    assert fields == {'player2_energy': 40, 'pedal_count': [0, 1, 0, 0]}
+
+
+def test_delta_accumulates_across_versions(versions, game):
+    since = versions.version
+    game['player1_energy'] = 10
+    versions.refresh()
+    game['player3_energy'] = 30
+    versions.refresh()
+
+    assert set(versions.changes_since(since)[2]) == {'player1_energy', 'player3_energy'}
+    assert set(versions.changes_since(since + 1)[2]) == {'player3_energy'}
+
+
+@pytest.mark.parametrize('cursor', [None, 0, -1, 'previous_run', 'future'])
+def test_unknown_cursor_gets_full_state(versions, game, cursor):
+    since = {
+        'previous_run': versions.base_version - 5,
+        'future': versions.version + 1
+    }.get(cursor, cursor)
+
+    version, full, fields = versions.changes_since(since)
+
+    assert full
+    assert version == versions.version
+    assert fields.keys() == game.keys()
+
+
+def test_wait_for_change_times_out_without_changes(versions):
+    start = time.monotonic()
+
+    assert not versions.wait_for_change(versions.version, 0.1)
+    assert time.monotonic() - start >= 0.1
+
+
+def test_wait_for_change_wakes_on_refresh(versions, game):
+    since = versions.version
+
+    def change():
+        time.sleep(0.05)
+        game['player4_energy'] = 5
+        versions.refresh()
+
+    threading.Thread(target=change).start()
+
+    assert versions.wait_for_change(since, 5.0)
+    assert versions.changes_since(since)[2] == {'player4_energy': 5}
+
+
+def test_http_poll_without_changes_returns_empty_delta(http_server):
+    server.state_versions.refresh()
+    since = server.state_versions.version
+
+    status, _, body = get(http_server, f'/api/state?since={since}&timeout=0')
+
+    assert status == 200
+    assert json.loads(body) == {'version': since, 'full': False, 'state': {}}
+
+
+def test_http_poll_returns_when_state_changes(http_server, game):
+    server.state_versions.refresh()
+    since = server.state_versions.version
+
+    def pedal():
+        time.sleep(0.2)
+        server.register_pedal(0, server.game_clock(), 1.0)
+        server.state_versions.refresh()
+
+    threading.Thread(target=pedal).start()
+    start = time.monotonic()
+    status, _, body = get(http_server, f'/api/state?since={since}&timeout=10')
+    data = json.loads(body)
+
+    assert status == 200
+    assert time.monotonic() - start < 5
+    assert data['version'] > since and not data['full']
+    assert data['state']['player1_energy'] == 1.0
+
+
+@pytest.mark.parametrize('query', ['since=abc', 'since=1&timeout=x'])
+def test_http_poll_rejects_bad_cursor(http_server, query):
+    assert get(http_server, f'/api/state?{query}')[0] == 400
+
+
+def test_http_other_query_gets_plain_state(http_server, game):
+    status, headers, body = get(http_server, '/api/state?_=1712345678')
+
+    assert status == 200
+    assert json.loads(body) == json.loads(json.dumps(game))
+    assert int(headers['X-State-Version']) == server.state_versions.version